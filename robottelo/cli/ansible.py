@@ -19,17 +19,14 @@ class Ansible(Base):
     @classmethod
     def roles_import(cls, options=None):
         """Import ansible roles"""
-        cls.command_sub = 'roles import'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('roles import', options))
 
     @classmethod
     def variables_import(cls, options=None):
         """Import ansible variables"""
-        cls.command_sub = 'variables import'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('variables import', options))
 
     @classmethod
     def roles_list(cls, options=None):
         """List ansible roles"""
-        cls.command_sub = 'roles list'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('roles list', options))
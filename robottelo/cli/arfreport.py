@@ -49,7 +49,6 @@ class Arfreport(Base):
              -h, --help                              Print help
 
         """
-        cls.command_sub = 'list'
 
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('list', options), output_format='csv')
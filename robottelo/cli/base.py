@@ -3,8 +3,9 @@
 import logging
 import re
 
-from robottelo import ssh
-from robottelo.cli import hammer
+from concurrent.futures import ThreadPoolExecutor
+from robottelo import ssh, ssh_metrics
+from robottelo.cli import cache, executor, hammer, hammer_session
 from robottelo.config import settings
 
 
@@ -61,6 +62,96 @@ class CLIDataBaseError(CLIBaseError):
     """
 
 
+def _loading(method):
+    """Make a :class:`LazyEntityRecord` method load the record first."""
+    def wrapper(self, *args, **kwargs):
+        self.load()
+        return getattr(dict, method)(self, *args, **kwargs)
+    wrapper.__name__ = method
+    return wrapper
+
+
+class LazyEntityRecord(dict):
+    """Entity returned by :meth:`Base.create` in lazy mode.
+
+    The record is filled with the fields of the ``create`` output, usually
+    ``id`` and ``name``, and runs ``info`` only when a field the ``create``
+    output lacks is accessed, or when the whole record is needed, like when
+    iterating, comparing or pickling it. Once loaded it has exactly the
+    ``info`` fields, like the records returned by :meth:`Base.create` in the
+    default mode.
+
+    As ``info`` is run later, it returns the entity as it is at that time,
+    and its errors are raised by the access which loads the record.
+
+    :param entity: the :class:`Base` subclass which created the entity.
+    :param dict info_options: the options of the ``info`` command.
+    :param dict fields: the fields already known.
+    """
+
+    def __init__(self, entity, info_options, fields):
+        super(LazyEntityRecord, self).__init__(fields)
+        self.entity = entity
+        self.info_options = info_options
+        self.loaded = False
+
+    def load(self):
+        """Run ``info`` and replace the fields with its result, once.
+
+        :return: the record itself.
+        """
+        if not self.loaded:
+            info = self.entity.info(self.info_options)
+            self.loaded = True
+            # stdout should be a dictionary containing the object
+            if len(info) > 0:
+                dict.clear(self)
+                dict.update(self, info)
+        return self
+
+    def fill(self, fields):
+        """Add ``fields`` without loading the record, for example from a
+        ``list`` output.
+        """
+        if not self.loaded:
+            for key, value in fields.items():
+                dict.setdefault(self, key, value)
+
+    def __missing__(self, key):
+        if self.loaded:
+            raise KeyError(key)
+        return self.load()[key]
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or (
+            not self.loaded and dict.__contains__(self.load(), key))
+
+    def get(self, key, default=None):
+        if not dict.__contains__(self, key):
+            self.load()
+        return dict.get(self, key, default)
+
+    def __reduce__(self):
+        return dict, (dict(self.load()),)
+
+    # anything else than reading a known field needs the whole record
+    __delitem__ = _loading('__delitem__')
+    __eq__ = _loading('__eq__')
+    __iter__ = _loading('__iter__')
+    __len__ = _loading('__len__')
+    __ne__ = _loading('__ne__')
+    __repr__ = _loading('__repr__')
+    __setitem__ = _loading('__setitem__')
+    copy = _loading('copy')
+    items = _loading('items')
+    keys = _loading('keys')
+    pop = _loading('pop')
+    popitem = _loading('popitem')
+    setdefault = _loading('setdefault')
+    update = _loading('update')
+    values = _loading('values')
+
+
 class Base(object):
     """
     @param command_base: base command of hammer.
@@ -124,7 +215,6 @@ class Base(object):
     @since: 27.Nov.2013
     """
     command_base = None  # each inherited instance should define this
-    command_sub = None  # specific to instance, like: create, update, etc
     command_requires_org = False  # True when command requires organization-id
 
     logger = logging.getLogger('robottelo')
@@ -133,7 +223,8 @@ class Base(object):
     )
 
     @classmethod
-    def _handle_response(cls, response, ignore_stderr=None):
+    def _handle_response(cls, response, ignore_stderr=None,
+                         command_sub=None):
         """Verify ``return_code`` of the CLI command.
 
         Check for a non-zero return code or any stderr contents.
@@ -142,6 +233,8 @@ class Base(object):
             :mod:`robottelo.ssh.command`.
         :param ignore_stderr: indicates whether to throw a warning in logs if
             ``stderr`` is not empty.
+        :param command_sub: the subcommand which was run, used in the error
+            message.
         :returns: contents of ``stdout``.
         :raises robottelo.cli.base.CLIReturnCodeError: If return code is
             different from zero.
@@ -151,7 +244,7 @@ class Base(object):
                 u'Command "{0} {1}" finished with return_code {2}\n'
                 'stderr contains following message:\n{3}'.format(
                     cls.command_base,
-                    cls.command_sub,
+                    command_sub,
                     response.return_code,
                     response.stderr
                 )
@@ -174,25 +267,27 @@ class Base(object):
         Adds OS to record.
         """
 
-        cls.command_sub = 'add-operatingsystem'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(
+            cls._construct_command('add-operatingsystem', options))
 
         return result
 
     @classmethod
-    def create(cls, options=None):
+    def create(cls, options=None, lazy=None):
         """
         Creates a new record using the arguments passed via dictionary.
-        """
 
-        cls.command_sub = 'create'
+        :param bool lazy: return a :class:`LazyEntityRecord`, which runs
+            ``info`` only when needed, instead of running ``info`` right
+            after ``create``. If it is ``None``
+            ``settings.performance.hammer_lazy_create`` is used.
+        """
 
         if options is None:
             options = {}
 
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('create', options), output_format='csv')
 
         # Extract new object ID if it was successfully created
         if len(result) > 0 and 'id' in result[0]:
@@ -207,6 +302,14 @@ class Base(object):
                     raise CLIError(tmpl.format(cls.__name__))
                 info_options[u'organization-id'] = options[u'organization-id']
 
+            if lazy is None:
+                lazy = bool(settings.performance and
+                            settings.performance.hammer_lazy_create)
+            if lazy:
+                fields = dict(result[0])
+                fields.pop('message', None)
+                return LazyEntityRecord(cls, info_options, fields)
+
             new_obj = cls.info(info_options)
             # stdout should be a dictionary containing the object
             if len(new_obj) > 0:
@@ -214,12 +317,41 @@ class Base(object):
 
         return result
 
+    @classmethod
+    def load_records(cls, records, options=None):
+        """Fill the not loaded :class:`LazyEntityRecord` ``records`` with
+        the fields of a single ``list --search "id ^ (...)"`` command instead
+        of one ``info`` per record.
+
+        The records are not marked as loaded, accessing a field only shown by
+        ``info`` still loads them.
+
+        :param list records: records created by :meth:`create`.
+        :param dict options: extra ``list`` options.
+        :return: the ``records``.
+        """
+        pending = [
+            record for record in records
+            if isinstance(record, LazyEntityRecord) and not record.loaded
+        ]
+        if not pending:
+            return records
+        options = dict(options or {})
+        options[u'search'] = u'id ^ ({0})'.format(u','.join(
+            str(dict.__getitem__(record, 'id')) for record in pending))
+        org_id = pending[0].info_options.get(u'organization-id')
+        if org_id is not None:
+            options.setdefault(u'organization-id', org_id)
+        rows = {row.get('id'): row for row in cls.list(options)}
+        for record in pending:
+            record.fill(rows.get(str(dict.__getitem__(record, 'id')), {}))
+        return records
+
     @classmethod
     def delete(cls, options=None):
         """Deletes existing record."""
-        cls.command_sub = 'delete'
         return cls.execute(
-            cls._construct_command(options),
+            cls._construct_command('delete', options),
             ignore_stderr=True,
         )
 
@@ -229,9 +361,8 @@ class Base(object):
         Deletes parameter from record.
         """
 
-        cls.command_sub = 'delete-parameter'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(
+            cls._construct_command('delete-parameter', options))
 
         return result
 
@@ -241,9 +372,7 @@ class Base(object):
         Displays the content for existing partition table.
         """
 
-        cls.command_sub = 'dump'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('dump', options))
 
         return result
 
@@ -273,40 +402,156 @@ class Base(object):
 
         return (username, password)
 
+    @staticmethod
+    def _hammer_args(command, user, password, output_format):
+        """Return the hammer arguments running ``command`` as ``user``."""
+        return u'-v {0} {1} {2} {3}'.format(
+            u'-u {0}'.format(user) if user is not None
+            else u'--interactive no',
+            u'-p {0}'.format(password) if password is not None else '',
+            u'--output={0}'.format(output_format) if output_format else u'',
+            command,
+        )
+
+    @classmethod
+    def _execute_in_session(cls, command, user, password, output_format,
+                            timeout, parse_stdout=None):
+        """Run ``command`` in the hammer session of ``user``.
+
+        :return: the command response or ``None`` if the command should be run
+            as a separate process instead.
+        :raises CLIReturnCodeError: if the session died after receiving a
+            command changing the server, as it may have been run already.
+        """
+        try:
+            response = hammer_session.execute(
+                u'-v {0} {1}'.format(
+                    u'--output={0}'.format(output_format)
+                    if output_format else u'',
+                    command,
+                ),
+                user,
+                password,
+                # keep the output lines for parse_stdout
+                output_format=None if parse_stdout else output_format,
+                timeout=timeout,
+                env={u'LANG': settings.locale},
+            )
+        except hammer_session.HammerSessionError as err:
+            if cache.is_read_only(cls.command_base, command):
+                # running a read only command again has no side effect
+                cls.logger.warning(
+                    u'%s, running the hammer command again as a separate '
+                    u'process', err)
+                return None
+            raise CLIReturnCodeError(
+                255,
+                u'{0}'.format(err),
+                u'Hammer session died while running the command, it may '
+                u'have been run already: {0} {1}'.format(
+                    cls.command_base, command)
+            )
+        if response is not None and parse_stdout:
+            response.stdout = parse_stdout(response.stdout or [])
+        return response
+
     @classmethod
     def execute(cls, command, user=None, password=None, output_format=None,
                 timeout=None, ignore_stderr=None, return_raw_response=None,
-                connection_timeout=None):
-        """Executes the cli ``command`` on the server via ssh"""
+                connection_timeout=None, parse_stdout=None):
+        """Executes the cli ``command`` on the server via ssh
+
+        When ``parse_stdout`` is given it receives an iterable of the stdout
+        lines and the response ``stdout`` is what it returns. Over ssh the
+        lines are parsed while they are received, the whole output is never
+        read into memory.
+        """
         user, password = cls._get_username_password(user, password)
+        command_sub = cls._get_command_sub(command)
         time_hammer = False
+        use_session = False
         if settings.performance:
             time_hammer = settings.performance.time_hammer
-
-        # add time to measure hammer performance
-        cmd = u'LANG={0} {1} hammer -v {2} {3} {4} {5}'.format(
-            settings.locale,
-            u'time -p' if time_hammer else '',
-            u'-u {0}'.format(user) if user is not None
-            else u'--interactive no',
-            u'-p {0}'.format(password) if password is not None else '',
-            u'--output={0}'.format(output_format) if output_format else u'',
-            command,
-        )
-        response = ssh.command(
-            cmd.encode('utf-8'),
-            output_format=output_format,
-            timeout=timeout,
-            connection_timeout=connection_timeout,
-        )
+            use_session = settings.performance.hammer_session
+
+        args = cls._hammer_args(command, user, password, output_format)
+        response = None
+        try:
+            with ssh_metrics.tags(command_base=cls.command_base,
+                                  command_sub=command_sub), \
+                    executor.command_slot():
+                # hammer sessions can not be timed, each command is a fork of
+                # the session process
+                if use_session and not time_hammer:
+                    response = cls._execute_in_session(
+                        command, user, password, output_format, timeout,
+                        parse_stdout)
+                if response is None:
+                    # add time to measure hammer performance
+                    cmd = u'LANG={0} {1} hammer {2}'.format(
+                        settings.locale,
+                        u'time -p' if time_hammer else '',
+                        args,
+                    )
+                    if parse_stdout:
+                        stream = ssh.stream_command(
+                            cmd.encode('utf-8'),
+                            output_format=output_format,
+                            timeout=timeout,
+                            connection_timeout=connection_timeout,
+                        )
+                        response = ssh.SSHCommandResult(
+                            parse_stdout(stream),
+                            stream.stderr,
+                            stream.return_code,
+                        )
+                    else:
+                        response = ssh.command(
+                            cmd.encode('utf-8'),
+                            output_format=output_format,
+                            timeout=timeout,
+                            connection_timeout=connection_timeout,
+                        )
+        finally:
+            if (cache.is_enabled() and
+                    not cache.is_read_only(cls.command_base, command)):
+                cache.invalidate(cls.command_base)
         if return_raw_response:
             return response
         else:
             return cls._handle_response(
                 response,
                 ignore_stderr=ignore_stderr,
+                command_sub=command_sub,
             )
 
+    @classmethod
+    def _cached_read(cls, command_sub, options, output_format, fetch,
+                     projection=None):
+        """Return the cached result of the ``command_sub`` read subcommand
+        with ``options``, calling ``fetch`` to get it when it is not cached.
+        ``projection`` tells apart the results of a command returned in
+        different shapes, like the projected records of :meth:`list`.
+
+        See :mod:`robottelo.cli.cache`.
+        """
+        if not cache.is_enabled():
+            return fetch()
+        key = cache.make_key(
+            cls.command_base,
+            command_sub,
+            options,
+            output_format,
+            cls._get_username_password()[0],
+            projection,
+        )
+        found, value = cache.get(key)
+        if found:
+            return value
+        result = fetch()
+        cache.put(key, result, value)
+        return result
+
     @classmethod
     def exists(cls, options=None, search=None):
         """Search for an entity using the query ``search[0]="search[1]"``
@@ -336,7 +581,6 @@ class Base(object):
     @classmethod
     def info(cls, options=None, output_format=None, return_raw_response=None):
         """Reads the entity information."""
-        cls.command_sub = 'info'
 
         if options is None:
             options = {}
@@ -348,24 +592,41 @@ class Base(object):
                 )
             )
 
-        result = cls.execute(
-            command=cls._construct_command(options),
-            output_format=output_format,
-            return_raw_response=return_raw_response,
-        )
-        if not return_raw_response and output_format != 'json':
-            result = hammer.parse_info(result)
-        return result
+        if return_raw_response:
+            return cls.execute(
+                command=cls._construct_command('info', options),
+                output_format=output_format,
+                return_raw_response=return_raw_response,
+            )
+
+        def fetch():
+            result = cls.execute(
+                command=cls._construct_command('info', options),
+                output_format=output_format,
+            )
+            if output_format != 'json':
+                result = hammer.parse_info(result)
+            return result
+
+        return cls._cached_read('info', options, output_format, fetch)
 
     @classmethod
-    def list(cls, options=None, per_page=True, output_format='csv'):
+    def list(cls, options=None, per_page=True, output_format='csv',
+             fields=None, where=None):
         """
         List information.
         @param options: ID (sometimes name works as well) to retrieve info.
+        @param fields: normalized names of the columns to return, like
+            ``['id', 'name']``.
+        @param where: dict mapping normalized column names to the value, or
+            a function receiving the value, the returned rows must match.
+
+        When ``fields`` or ``where`` are given the CSV output is parsed while
+        it is received and a list of ``namedtuple`` records with only the
+        ``fields`` columns is returned, see
+        :func:`robottelo.cli.hammer.iter_csv_records`.
         """
 
-        cls.command_sub = 'list'
-
         if options is None:
             options = {}
 
@@ -379,10 +640,86 @@ class Base(object):
                 )
             )
 
-        result = cls.execute(
-            cls._construct_command(options), output_format=output_format)
+        if fields is None and where is None:
+            def fetch():
+                return cls.execute(
+                    cls._construct_command('list', options),
+                    output_format=output_format)
+
+            return cls._cached_read('list', options, output_format, fetch)
+        if output_format != 'csv':
+            raise CLIError('fields and where require the csv output format')
+
+        def fetch():
+            return cls.execute(
+                cls._construct_command('list', options),
+                output_format='csv',
+                parse_stdout=lambda lines: hammer.parse_csv(
+                    lines, fields, where),
+            )
 
-        return result
+        return cls._cached_read(
+            'list',
+            options,
+            output_format,
+            fetch,
+            projection=(
+                tuple(fields) if fields is not None else None,
+                where,
+            ),
+        )
+
+    @classmethod
+    def iter_list(cls, options=None, page_size=100, prefetch=False,
+                  output_format='csv', fields=None):
+        """Lazily iterate over the ``list`` results, fetching one page of
+        ``page_size`` results at a time.
+
+        Pages are fetched only when the previous one is consumed, so
+        stopping the iteration early, for example after finding the first
+        matching entity, avoids listing the remaining ones. When
+        ``prefetch`` is set the next page is fetched in a background thread
+        while the current one is processed.
+
+        ``options`` and ``fields`` are passed to :meth:`list`, the
+        ``per-page`` and ``page`` options are set by this method. Entities
+        created or deleted while iterating may shift the pages.
+        """
+        options = dict(options or {})
+        options[u'per-page'] = page_size
+        # only pass the non default arguments, some entities override list
+        # without accepting them
+        kwargs = {}
+        if output_format != 'csv':
+            kwargs['output_format'] = output_format
+        if fields is not None:
+            kwargs['fields'] = fields
+
+        def fetch(page):
+            return cls.list(dict(options, page=page), **kwargs)
+
+        pool = ThreadPoolExecutor(max_workers=1) if prefetch else None
+        next_page = None
+        page = 1
+        try:
+            results = fetch(page)
+            while True:
+                if pool is not None and len(results) == page_size:
+                    next_page = pool.submit(fetch, page + 1)
+                for result in results:
+                    yield result
+                if len(results) < page_size:
+                    return
+                page += 1
+                if next_page is not None:
+                    results, next_page = next_page.result(), None
+                else:
+                    results = fetch(page)
+        finally:
+            if next_page is not None:
+                next_page.cancel()
+            if pool is not None:
+                pool.shutdown(wait=False)
 
     @classmethod
     def puppetclasses(cls, options=None):
@@ -390,10 +727,9 @@ class Base(object):
         Lists all puppet classes.
         """
 
-        cls.command_sub = 'puppet-classes'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('puppet-classes', options),
+            output_format='csv')
 
         return result
 
@@ -403,9 +739,8 @@ class Base(object):
         Removes OS from record.
         """
 
-        cls.command_sub = 'remove-operatingsystem'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(
+            cls._construct_command('remove-operatingsystem', options))
 
         return result
 
@@ -415,10 +750,8 @@ class Base(object):
         Lists all smart class parameters.
         """
 
-        cls.command_sub = 'sc-params'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('sc-params', options), output_format='csv')
 
         return result
 
@@ -428,9 +761,7 @@ class Base(object):
         Creates or updates parameter for a record.
         """
 
-        cls.command_sub = 'set-parameter'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('set-parameter', options))
 
         return result
 
@@ -440,10 +771,8 @@ class Base(object):
         Updates existing record.
         """
 
-        cls.command_sub = 'update'
-
         result = cls.execute(
-            cls._construct_command(options),
+            cls._construct_command('update', options),
             output_format='csv',
             return_raw_response=return_raw_response,
         )
@@ -465,8 +794,21 @@ class Base(object):
         return Wrapper
 
     @classmethod
-    def _construct_command(cls, options=None):
-        """Build a hammer cli command based on the options passed"""
+    def _get_command_sub(cls, command):
+        """Return the subcommand of a ``command`` built by
+        :meth:`_construct_command`, ``None`` if it is not run for
+        ``command_base``.
+        """
+        if not cls.command_base or not command.startswith(
+                cls.command_base + u' '):
+            return None
+        return command[len(cls.command_base):].split(u' --', 1)[0].strip()
+
+    @classmethod
+    def _construct_command(cls, command_sub, options=None):
+        """Build a hammer cli ``command_sub`` command based on the options
+        passed
+        """
         tail = u''
 
         if options is None:
@@ -483,7 +825,7 @@ class Base(object):
                 tail += u' --{0}="{1}"'.format(key, val)
         cmd = u'{0} {1} {2}'.format(
             cls.command_base,
-            cls.command_sub,
+            command_sub,
             tail.strip()
         )
 
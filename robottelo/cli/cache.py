@@ -0,0 +1,246 @@
+# -*- encoding: utf-8 -*-
+"""Read-through cache of the hammer ``info`` and ``list`` results.
+
+When ``settings.performance.hammer_cache`` is enabled,
+:meth:`robottelo.cli.base.Base.info`, :meth:`robottelo.cli.base.Base.list`
+and so :meth:`robottelo.cli.base.Base.exists` results are cached per
+``command_base``, subcommand, options, output format and user.
+
+Every other subcommand run through :meth:`robottelo.cli.base.Base.execute`
+is considered a write and invalidates the cached results of its
+``command_base`` and of the command bases depending on it, see
+:data:`DEPENDENT_COMMAND_BASES`. Writes made without the framework, for
+example running ``hammer`` with :func:`robottelo.ssh.command` or using the
+API, are not seen by the cache, :func:`clear` it after them.
+
+Results are kept at most ``hammer_cache_ttl`` seconds and the least recently
+used ones are evicted above ``hammer_cache_size`` entries.
+"""
+import copy
+import threading
+import time
+
+from collections import OrderedDict
+from robottelo.config import settings
+
+# subcommands which do not change anything on the server
+READ_ONLY_SUBCOMMANDS = frozenset((
+    'dump',
+    'info',
+    'list',
+    'ping',
+    'puppet-classes',
+    'sc-params',
+    'smart-variables',
+    'status',
+))
+
+# the info and list outputs of these command bases include entities of any
+# other command base, so any write invalidates them
+AGGREGATE_COMMAND_BASES = frozenset(('organization', 'location'))
+
+# command bases whose results change when the key command base is written,
+# writes to a command base also invalidate the command bases nested in it,
+# for example ``content-view filter`` for ``content-view``
+DEPENDENT_COMMAND_BASES = {
+    'activation-key': ('content-host', 'host', 'host-collection',
+                       'subscription'),
+    'capsule': ('lifecycle-environment', 'proxy'),
+    'content-host': ('host', 'host-collection', 'subscription'),
+    'content-view': ('activation-key', 'content-host', 'host',
+                     'lifecycle-environment', 'repository'),
+    'docker': ('content-view', 'repository'),
+    'domain': ('host', 'hostgroup', 'subnet'),
+    'environment': ('host', 'hostgroup', 'puppet-class', 'sc-param',
+                    'smart-variable'),
+    'filter': ('role', 'user', 'user-group'),
+    'gpg': ('product', 'repository'),
+    'host': ('content-host', 'erratum', 'fact', 'host-collection',
+             'hostgroup', 'report', 'subscription'),
+    'host-collection': ('activation-key', 'content-host', 'host'),
+    'hostgroup': ('host',),
+    'lifecycle-environment': ('activation-key', 'capsule', 'content-host',
+                              'content-view', 'host'),
+    'os': ('architecture', 'host', 'hostgroup', 'medium',
+           'partition-table', 'template'),
+    'product': ('activation-key', 'repository', 'repository-set',
+                'subscription', 'sync-plan'),
+    'proxy': ('capsule', 'domain', 'host', 'hostgroup', 'subnet'),
+    'puppet-module': ('content-view',),
+    'repository': ('content-view', 'docker', 'erratum', 'file',
+                   'module-stream', 'ostree-branch', 'package',
+                   'package-group', 'product', 'puppet-module',
+                   'repository-set'),
+    'repository-set': ('product', 'repository'),
+    'role': ('filter', 'user', 'user-group'),
+    'subnet': ('domain', 'host', 'hostgroup'),
+    'subscription': ('activation-key', 'content-host', 'host', 'product',
+                     'repository-set'),
+    'sync-plan': ('product',),
+    'user': ('role', 'user-group'),
+    'user-group': ('role', 'user'),
+}
+
+
+def _root(command_base):
+    """Return the top level command base, ``content-view`` for
+    ``content-view filter rule``.
+    """
+    return command_base.split()[0] if command_base else None
+
+
+def _freeze(value):
+    """Return a hashable version of an option value."""
+    if isinstance(value, dict):
+        return tuple(sorted(
+            (key, _freeze(val)) for key, val in value.items()))
+    if isinstance(value, (list, tuple, set)):
+        return tuple(_freeze(val) for val in value)
+    return value
+
+
+def is_enabled():
+    """Whether the hammer results should be cached."""
+    return bool(settings.performance and settings.performance.hammer_cache)
+
+
+def is_read_only(command_base, command):
+    """Whether ``command``, run for ``command_base``, does not change
+    anything on the server.
+
+    Commands not starting with ``command_base`` are considered writes.
+    """
+    if not command_base or not command.startswith(command_base + u' '):
+        return False
+    tail = command[len(command_base):].split(None, 1)
+    return bool(tail) and tail[0] in READ_ONLY_SUBCOMMANDS
+
+
+def make_key(command_base, command_sub, options, output_format, user,
+             projection=None):
+    """Return the cache key of a command, ``projection`` identifies the
+    columns and rows kept from its output.
+    """
+    return (command_base, command_sub, _freeze(options or {}),
+            output_format, user, _freeze(projection))
+
+
+class CLIResultCache(object):
+    """LRU cache of command results with a time to live.
+
+    Every invalidation increases :attr:`generation`, results fetched while
+    an invalidation happened are not stored as they may be stale.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.stats = dict.fromkeys(
+            ('hits', 'misses', 'invalidations', 'evictions', 'expirations'),
+            0
+        )
+
+    @property
+    def ttl(self):
+        return settings.performance.hammer_cache_ttl
+
+    @property
+    def size(self):
+        return settings.performance.hammer_cache_size
+
+    def get(self, key):
+        """Return ``(True, result)`` if ``key`` is cached and ``(False,
+        generation)`` otherwise, the generation must be passed to
+        :meth:`set`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self._entries[key]
+                self.stats['expirations'] += 1
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return False, self.generation
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return True, copy.deepcopy(entry[1])
+
+    def set(self, key, result, generation):
+        """Cache ``result`` unless something was invalidated since
+        ``generation``.
+        """
+        with self._lock:
+            if generation != self.generation:
+                return
+            self._entries[key] = (
+                time.time() + self.ttl, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.size, 0):
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def invalidate(self, command_base=None):
+        """Drop the results of ``command_base``, of the command bases nested
+        in it and of the ones depending on it, or all the results if
+        ``command_base`` is ``None``.
+        """
+        with self._lock:
+            self.generation += 1
+            self.stats['invalidations'] += 1
+            root = _root(command_base)
+            if root is None or root in AGGREGATE_COMMAND_BASES:
+                self._entries.clear()
+                return
+            roots = set(DEPENDENT_COMMAND_BASES.get(root, ()))
+            roots.update((root,), AGGREGATE_COMMAND_BASES)
+            for key in list(self._entries):
+                if _root(key[0]) in roots:
+                    del self._entries[key]
+
+    def clear(self):
+        """Drop all the results."""
+        self.invalidate()
+
+    def get_stats(self):
+        """Return the cache statistics with its ``hit_rate`` and number of
+        ``entries``.
+        """
+        with self._lock:
+            stats = dict(self.stats, entries=len(self._entries))
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = float(stats['hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_cache = CLIResultCache()
+
+
+def get(key):
+    """Look ``key`` up, see :meth:`CLIResultCache.get`."""
+    return _cache.get(key)
+
+
+def put(key, result, generation):
+    """Cache ``result``, see :meth:`CLIResultCache.set`."""
+    _cache.set(key, result, generation)
+
+
+def invalidate(command_base=None):
+    """Drop the results affected by a write to ``command_base``, see
+    :meth:`CLIResultCache.invalidate`.
+    """
+    _cache.invalidate(command_base)
+
+
+def clear():
+    """Drop all the cached results, for example after writes made without
+    the framework.
+    """
+    _cache.clear()
+
+
+def get_stats():
+    """Return the statistics of the cache."""
+    return _cache.get_stats()
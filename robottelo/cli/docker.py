@@ -156,8 +156,7 @@ class DockerContainer(Base):
                                                       Default: 100
 
         """
-        cls.command_sub = 'logs'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('logs', options))
 
     @classmethod
     def start(cls, options=None):
@@ -175,8 +174,7 @@ class DockerContainer(Base):
             --name NAME                               Name to search by
 
         """
-        cls.command_sub = 'start'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('start', options))
 
     @classmethod
     def status(cls, options=None):
@@ -194,8 +192,7 @@ class DockerContainer(Base):
             --name NAME                               Name to search by
 
         """
-        cls.command_sub = 'status'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('status', options))
 
     @classmethod
     def stop(cls, options=None):
@@ -213,8 +210,7 @@ class DockerContainer(Base):
             --name NAME                               Name to search by
 
         """
-        cls.command_sub = 'stop'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('stop', options))
 
 
 class DockerManifest(Base):
@@ -0,0 +1,289 @@
+# -*- encoding: utf-8 -*-
+"""Pools of pre-built entities for expensive test setups.
+
+Creating an organization and uploading a manifest, or synchronizing a
+repository into a content view, takes minutes. When
+``settings.shared_function.entity_pools`` is enabled, the items built by a
+pool template are prepared in advance by a background thread and handed out
+to the tests, the pool state is kept in the :mod:`shared function
+<robottelo.decorators.func_shared.shared>` storage so the pytest xdist
+workers share the pools::
+
+    from robottelo.cli import entity_pool
+
+    def test_positive_mutate(self):
+        with entity_pool.checkout('org_with_manifest') as item:
+            org = item['org']
+
+A checkout is exclusive by default, the item is given to a single test and
+is not returned to the pool, as the test may change it, then a refill is
+started. Tests which do not change the item can share one::
+
+    with entity_pool.checkout('org_with_custom_repo', shared=True) as item:
+        ActivationKey.info({'id': item['activationkey-id']})
+
+The ``tests/foreman`` tests get the items with the ``pooled_*`` fixtures of
+its ``conftest.py``, which also starts filling the pools used by the
+collected tests, see :func:`warm`.
+
+When pools are disabled, or a pool is empty, the item is built by the test
+itself. New templates are registered with :func:`template`, an item must be
+json compatible.
+"""
+import contextlib
+import logging
+import threading
+import time
+
+from robottelo import manifests
+from robottelo.cli.factory import make_org, setup_org_for_a_custom_repo
+from robottelo.config import settings
+from robottelo.constants import FAKE_1_YUM_REPO
+from robottelo.decorators import setting_is_set
+from robottelo.decorators.func_locker import (
+    get_stale_reason,
+    new_lease_holder,
+)
+from robottelo.decorators.func_shared.shared import (
+    _get_default_scope,
+    _get_default_storage_handler,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 2
+# builds not finished after this time, or whose process is dead, are
+# considered dead
+BUILD_TIMEOUT = 3600
+
+_NAMESPACE_KEY_TYPE = 'entity_pool'
+
+TEMPLATES = {}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class EntityPoolError(Exception):
+    """Indicates an unknown pool template."""
+
+
+def is_enabled():
+    """Whether the items are taken from the pools."""
+    return bool(
+        setting_is_set('shared_function') and
+        settings.shared_function.entity_pools
+    )
+
+
+def template(name, size=None):
+    """Register the decorated function as the builder of the items of the
+    pool ``name``, at most ``size`` items are prepared in advance.
+    """
+    def decorator(function):
+        TEMPLATES[name] = (function, size)
+        return function
+    return decorator
+
+
+class EntityPool(object):
+    """Pool of the items built by ``build``, see the module documentation.
+
+    :param str name: the pool name.
+    :param build: function returning a new json compatible item.
+    :param int size: number of items prepared in advance.
+    :param storage: a shared function storage handler, the default one if
+        not given.
+    :param str scope: the storage namespace, the shared function default
+        scope if not given.
+    :param int timeout: time in seconds after which an item is not used
+        anymore, the shared function ``share_timeout`` if not given.
+    """
+
+    def __init__(self, name, build, size=DEFAULT_POOL_SIZE, storage=None,
+                 scope=None, timeout=None):
+        # getting the scope reads the shared function settings, it must be
+        # done before getting the storage handler
+        if scope is None:
+            scope = _get_default_scope()
+        if storage is None:
+            storage = _get_default_storage_handler()
+        if timeout is None:
+            timeout = settings.shared_function.share_timeout
+        self.name = name
+        self.build = build
+        self.size = size
+        self.timeout = timeout
+        self.storage = storage
+        self.key = '.'.join([scope, _NAMESPACE_KEY_TYPE, name])
+        self._refill_thread = None
+
+    @contextlib.contextmanager
+    def _state(self):
+        """Lock the pool and yield its state, the state is saved when the
+        block exits without error.
+        """
+        with self.storage.lock(self.key) as data:
+            self.storage.when_lock_acquired(data)
+            state = self.storage.get(self.key) or {}
+            state.setdefault('items', [])
+            state.setdefault('builds', [])
+            state.setdefault('shared', None)
+            now = time.time()
+            state['items'] = [
+                item for item in state['items']
+                if now - item['created'] < self.timeout
+            ]
+            state['builds'] = [
+                build for build in state['builds']
+                if get_stale_reason(build) is None
+            ]
+            if (state['shared'] is not None and
+                    now - state['shared']['created'] >= self.timeout and
+                    not state['shared']['holders']):
+                state['shared'] = None
+            yield state
+            self.storage.set(self.key, state)
+
+    def _new_item(self):
+        return {'created': time.time(), 'value': self.build()}
+
+    def fill(self):
+        """Build items until the pool has ``size`` of them."""
+        while True:
+            build = new_lease_holder(BUILD_TIMEOUT)
+            with self._state() as state:
+                if len(state['items']) + len(state['builds']) >= self.size:
+                    return
+                state['builds'].append(build)
+            item = None
+            try:
+                item = self._new_item()
+            except Exception as err:
+                logger.warning(
+                    'Failed to build an item of pool %s: %s', self.name, err)
+            with self._state() as state:
+                state['builds'] = [
+                    other for other in state['builds']
+                    if other['id'] != build['id']
+                ]
+                if item is not None:
+                    state['items'].append(item)
+            if item is None:
+                return
+
+    def refill(self):
+        """Start filling the pool in a background thread, unless this
+        process is already filling it.
+        """
+        if self._refill_thread is not None and self._refill_thread.is_alive():
+            return
+        self._refill_thread = threading.Thread(
+            target=self.fill, name='entity-pool-{0}'.format(self.name))
+        self._refill_thread.daemon = True
+        self._refill_thread.start()
+
+    def _checkout_exclusive(self):
+        with self._state() as state:
+            item = state['items'].pop(0) if state['items'] else None
+        self.refill()
+        if item is None:
+            logger.info('Pool %s is empty, building an item', self.name)
+            return self.build()
+        return item['value']
+
+    def _checkout_shared(self):
+        with self._state() as state:
+            if state['shared'] is None and state['items']:
+                state['shared'] = dict(state['items'].pop(0), holders=0)
+                self.refill()
+            if state['shared'] is not None:
+                state['shared']['holders'] += 1
+                return state['shared']['value']
+        item = self._new_item()
+        with self._state() as state:
+            if state['shared'] is None:
+                state['shared'] = dict(item, holders=1)
+                return item['value']
+            # an other worker published a shared item meanwhile
+            state['items'].append(item)
+            state['shared']['holders'] += 1
+            return state['shared']['value']
+
+    def _release_shared(self):
+        with self._state() as state:
+            if state['shared'] is not None:
+                state['shared']['holders'] = max(
+                    state['shared']['holders'] - 1, 0)
+
+    @contextlib.contextmanager
+    def checkout(self, shared=False):
+        """Yield an item of the pool, exclusively or, if ``shared``, shared
+        with the other tests which do not change it.
+        """
+        if not shared:
+            yield self._checkout_exclusive()
+            return
+        value = self._checkout_shared()
+        try:
+            yield value
+        finally:
+            self._release_shared()
+
+
+def get_pool(name):
+    """Return the pool of the template ``name``.
+
+    :raises robottelo.cli.entity_pool.EntityPoolError: if there is no
+        template ``name``.
+    """
+    if name not in TEMPLATES:
+        raise EntityPoolError(u'Unknown entity pool {0}'.format(name))
+    with _pools_lock:
+        if name not in _pools:
+            build, size = TEMPLATES[name]
+            if size is None:
+                size = settings.shared_function.entity_pool_size
+            _pools[name] = EntityPool(name, build, size)
+        return _pools[name]
+
+
+@contextlib.contextmanager
+def checkout(name, shared=False):
+    """Yield an item of the pool ``name``, built by the test itself when the
+    pools are disabled, see :meth:`EntityPool.checkout`.
+    """
+    if not is_enabled():
+        if name not in TEMPLATES:
+            raise EntityPoolError(u'Unknown entity pool {0}'.format(name))
+        yield TEMPLATES[name][0]()
+        return
+    with get_pool(name).checkout(shared=shared) as value:
+        yield value
+
+
+def warm(*names):
+    """Start filling the pools ``names``, all of them if no name is given,
+    for example at the start of the test session.
+    """
+    if not is_enabled():
+        return
+    for name in names or sorted(TEMPLATES):
+        get_pool(name).refill()
+
+
+@template('org_with_manifest')
+def org_with_manifest():
+    """An organization with a cloned manifest uploaded."""
+    org = make_org()
+    manifests.upload_manifest_locked(
+        org['id'], manifests.clone(), interface=manifests.INTERFACE_CLI)
+    return {'org': org}
+
+
+@template('org_with_custom_repo')
+def org_with_custom_repo():
+    """An organization with a synchronized custom repository, published and
+    promoted in a content view, and an activation key.
+    """
+    return setup_org_for_a_custom_repo({u'url': FAKE_1_YUM_REPO})
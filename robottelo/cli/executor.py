@@ -0,0 +1,144 @@
+# -*- encoding: utf-8 -*-
+"""Run hammer commands concurrently.
+
+:class:`CLIExecutor` runs the methods of the :class:`robottelo.cli.base.Base`
+entity classes in a thread pool and returns
+:class:`concurrent.futures.Future` objects, so independent hammer commands
+of a test setup do not wait for each other::
+
+    with CLIExecutor() as executor:
+        orgs = [
+            executor.submit(Org, 'create', {'name': name})
+            for name in names
+        ]
+        repo = executor.submit(Repository, 'synchronize', {'id': repo_id})
+        orgs = [future.result() for future in orgs]
+
+The errors raised by the commands, like
+:class:`robottelo.cli.base.CLIReturnCodeError`, are raised by
+:meth:`concurrent.futures.Future.result`. The number of commands running at
+the same time on a Satellite is bounded by ``max_per_server``, even across
+executors of the same process. Only the hammer commands themselves take a
+slot, see :func:`command_slot`, so a scheduled function can schedule and wait
+for other jobs of the executor without holding a slot while waiting. The
+waiting function still occupies its pool thread, nested jobs need free
+threads in ``max_workers``.
+"""
+import contextlib
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from robottelo.config import settings
+
+MAX_COMMANDS_PER_SERVER = 4
+
+_server_semaphores = {}
+_server_semaphores_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_server_semaphore(hostname, max_per_server):
+    """Return the semaphore bounding the hammer commands run on
+    ``hostname``.
+    """
+    with _server_semaphores_lock:
+        key = (hostname, max_per_server)
+        if key not in _server_semaphores:
+            _server_semaphores[key] = threading.BoundedSemaphore(
+                max_per_server)
+        return _server_semaphores[key]
+
+
+@contextlib.contextmanager
+def command_slot():
+    """Wait for a free command slot on the server of the executor job run by
+    the current thread, and hold it until the block exits.
+
+    :meth:`robottelo.cli.base.Base.execute` runs its hammer command in this
+    block. It does nothing outside of executor jobs, and in a block nested in
+    another one of the same thread, which already holds a slot.
+    """
+    limit = getattr(_local, 'limit', None)
+    if limit is None or getattr(_local, 'holding', False):
+        yield
+        return
+    with _get_server_semaphore(*limit):
+        _local.holding = True
+        try:
+            yield
+        finally:
+            _local.holding = False
+
+
+class CLIExecutor(object):
+    """Thread pool running hammer entity class methods.
+
+    :param int max_workers: number of threads of the pool.
+    :param int max_per_server: maximum number of hammer commands running at
+        the same time on the Satellite.
+    """
+
+    def __init__(self, max_workers=8, max_per_server=MAX_COMMANDS_PER_SERVER):
+        self.max_per_server = max_per_server
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _run(self, hostname, method, args, kwargs):
+        previous = getattr(_local, 'limit', None)
+        _local.limit = (hostname, self.max_per_server)
+        try:
+            return method(*args, **kwargs)
+        finally:
+            _local.limit = previous
+
+    def submit(self, entity, subcommand, options=None, **kwargs):
+        """Schedule ``entity`` ``subcommand`` with ``options``.
+
+        :param entity: a :class:`robottelo.cli.base.Base` subclass, for
+            example ``Org`` or ``Org.with_user(login, password)``.
+        :param str subcommand: the hammer subcommand, its method is looked up
+            replacing dashes by underscores, ``add-user`` calls
+            ``entity.add_user``.
+        :param dict options: the subcommand options.
+        :param kwargs: extra keyword arguments of the method, like
+            ``output_format`` or ``timeout``.
+        :return: a :class:`concurrent.futures.Future` of the method result.
+        :raises AttributeError: if ``entity`` has no method for
+            ``subcommand``.
+        """
+        method = getattr(entity, subcommand.replace('-', '_'))
+        args = (options,) if options is not None else ()
+        return self._pool.submit(
+            self._run, settings.server.hostname, method, args, kwargs)
+
+    def call(self, function, *args, **kwargs):
+        """Schedule ``function`` with ``args`` and ``kwargs``, for example a
+        :mod:`robottelo.cli.factory` ``make_*`` function.
+
+        :return: a :class:`concurrent.futures.Future` of the function result.
+        """
+        return self._pool.submit(
+            self._run, settings.server.hostname, function, args, kwargs)
+
+    def map(self, entity, subcommand, options_list, **kwargs):
+        """Schedule ``entity`` ``subcommand`` once for every options of
+        ``options_list``.
+
+        :return: a list of :class:`concurrent.futures.Future`, in the order
+            of ``options_list``.
+        """
+        return [
+            self.submit(entity, subcommand, options, **kwargs)
+            for options in options_list
+        ]
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and, if ``wait``, wait for the scheduled ones
+        to finish.
+        """
+        self._pool.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
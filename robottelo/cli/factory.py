@@ -10,6 +10,7 @@ import os
 import random
 import time
 
+from collections import OrderedDict
 from fauxfactory import (
     gen_alphanumeric,
     gen_choice,
@@ -35,6 +36,7 @@ from robottelo.cli.discoveryrule import DiscoveryRule
 from robottelo.cli.docker import DockerContainer, DockerRegistry
 from robottelo.cli.domain import Domain
 from robottelo.cli.environment import Environment
+from robottelo.cli.executor import CLIExecutor
 from robottelo.cli.filter import Filter
 from robottelo.cli.gpgkey import GPGKey
 from robottelo.cli.host import Host
@@ -164,6 +166,199 @@ def _entity_with_credentials(credentials, cli_entity_cls):
     return cli_entity_cls
 
 
+def _entity_exists(cli_entity_cls):
+    """Return a function telling whether the entity of a record still exists,
+    used to validate the cached entities.
+
+    :param cli_entity_cls: Cli Entity Class
+    """
+    def exists(record):
+        try:
+            cli_entity_cls.info({u'id': record['id']})
+        except CLIReturnCodeError:
+            return False
+        return True
+    return exists
+
+
+class Ref(object):
+    """Reference to the ``field`` of the entity ``name`` of an
+    :class:`EntityBuilder`, replaced by its value once that entity is created.
+    """
+
+    def __init__(self, name, field='id'):
+        self.name = name
+        self.field = field
+
+    def __repr__(self):
+        return 'Ref({0!r}, {1!r})'.format(self.name, self.field)
+
+
+class EntityBuilder(object):
+    """Create entities from a declarative description, concurrently when
+    they do not depend on each other.
+
+    Each entity is described by a factory function, usually a ``make_*``
+    one, and its options, which may contain :class:`Ref` to other entities.
+    The entities are created by levels of the dependency graph, all the
+    entities of a level at the same time through a
+    :class:`robottelo.cli.executor.CLIExecutor`::
+
+        builder = EntityBuilder()
+        builder.add('org', make_org)
+        builder.add('lce', make_lifecycle_environment,
+                    {'organization-id': Ref('org')})
+        builder.add('product', make_product, {'organization-id': Ref('org')},
+                    entity=Product)
+        builder.add('repo', make_repository, {'product-id': Ref('product')},
+                    entity=Repository)
+        entities = builder.build()
+        entities['repo']['id']
+
+    If a creation fails, the entities already created with an ``entity``
+    class are deleted, most recent first, and the error is raised.
+
+    :param int max_workers: maximum number of entities created at the same
+        time.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.records = {}
+        self._entities = OrderedDict()
+
+    def add(self, name, factory=None, options=None, entity=None,
+            record=None):
+        """Describe the entity ``name``.
+
+        :param factory: function creating the entity from its options.
+        :param dict options: options of ``factory``, :class:`Ref` values,
+            also inside lists, are resolved before calling it.
+        :param entity: CLI class deleting the entity on rollback.
+        :param dict record: an existing entity to use instead of creating
+            one, it can be referenced but is never deleted.
+        :return: a :class:`Ref` to the entity ``id``.
+        """
+        if name in self._entities:
+            raise CLIFactoryError(u'Entity {0} already added'.format(name))
+        if factory is None and record is None:
+            raise CLIFactoryError(
+                u'Entity {0} needs a factory or a record'.format(name))
+        self._entities[name] = {
+            'factory': factory,
+            'options': options or {},
+            'entity': entity,
+            'record': record,
+        }
+        return Ref(name)
+
+    @staticmethod
+    def _refs(value):
+        """Return the references in an option ``value``."""
+        if isinstance(value, Ref):
+            return [value]
+        if isinstance(value, (list, tuple)):
+            return [item for item in value if isinstance(item, Ref)]
+        return []
+
+    def levels(self):
+        """Return the names of the entities by level of the dependency graph,
+        the entities of a level only depend on the ones of previous levels.
+
+        :raises robottelo.cli.factory.CLIFactoryError: if an entity
+            references an unknown entity or the references form a cycle.
+        """
+        dependencies = {}
+        for name, description in self._entities.items():
+            dependencies[name] = set()
+            for value in description['options'].values():
+                for ref in self._refs(value):
+                    if ref.name not in self._entities:
+                        raise CLIFactoryError(
+                            u'Entity {0} references unknown entity {1}'
+                            .format(name, ref.name)
+                        )
+                    dependencies[name].add(ref.name)
+        levels = []
+        done = set()
+        while len(done) < len(dependencies):
+            level = [
+                name for name in self._entities
+                if name not in done and dependencies[name] <= done
+            ]
+            if not level:
+                raise CLIFactoryError(
+                    u'Circular references between entities {0}'.format(
+                        sorted(set(dependencies) - done))
+                )
+            levels.append(level)
+            done.update(level)
+        return levels
+
+    @staticmethod
+    def _resolve(value, records):
+        """Replace the references of an option ``value``."""
+        if isinstance(value, Ref):
+            return records[value.name][value.field]
+        if isinstance(value, (list, tuple)):
+            return type(value)(
+                records[item.name][item.field] if isinstance(item, Ref)
+                else item
+                for item in value
+            )
+        return value
+
+    def _rollback(self, created):
+        """Delete the ``created`` entities, most recent first."""
+        for name in reversed(created):
+            entity = self._entities[name]['entity']
+            if entity is None:
+                continue
+            try:
+                entity.delete({u'id': self.records[name]['id']})
+            except CLIReturnCodeError as err:
+                logger.warning(
+                    'Failed to delete entity %s on rollback: %s',
+                    name, err.msg)
+
+    def build(self):
+        """Create the entities and return a dictionary mapping their names to
+        their records.
+        """
+        levels = self.levels()
+        self.records = {
+            name: description['record']
+            for name, description in self._entities.items()
+            if description['record'] is not None
+        }
+        created = []
+        with CLIExecutor(max_workers=self.max_workers) as executor:
+            for level in levels:
+                futures = OrderedDict()
+                for name in level:
+                    description = self._entities[name]
+                    if description['record'] is not None:
+                        continue
+                    options = {
+                        key: self._resolve(value, self.records)
+                        for key, value in description['options'].items()
+                    }
+                    futures[name] = executor.call(
+                        description['factory'], options)
+                error = None
+                for name, future in futures.items():
+                    try:
+                        self.records[name] = future.result()
+                    except Exception as err:
+                        error = error or err
+                    else:
+                        created.append(name)
+                if error is not None:
+                    self._rollback(created)
+                    raise error
+        return dict(self.records)
+
+
 @cacheable
 def make_activation_key(options=None):
     """
@@ -629,7 +824,7 @@ def make_gpg_key(options=None):
     return create_object(GPGKey, args, options)
 
 
-@cacheable
+@cacheable(validate=_entity_exists(Location))
 def make_location(options=None):
     """Location CLI factory
 
@@ -2112,7 +2307,7 @@ def make_compute_resource(options=None):
     return create_object(ComputeResource, args, options)
 
 
-@cacheable
+@cacheable(validate=_entity_exists(Org))
 def make_org(options=None):
     return make_org_with_credentials(options)
 
@@ -3012,33 +3207,55 @@ def setup_org_for_a_custom_repo(options=None):
             not options or
             not options.get('url')):
         raise CLIFactoryError('Please provide valid custom repo URL.')
-    # Create new organization and lifecycle environment if needed
-    if options.get('organization-id') is None:
-        org_id = make_org()['id']
-    else:
-        org_id = options['organization-id']
-    if options.get('lifecycle-environment-id') is None:
-        env_id = make_lifecycle_environment({u'organization-id': org_id})['id']
-    else:
-        env_id = options['lifecycle-environment-id']
-    # Create custom product and repository
-    custom_product = make_product({u'organization-id': org_id})
-    custom_repo = make_repository({
+    # Create new organization, lifecycle environment and content view if
+    # needed, the custom product and repository. The entities which only
+    # depend on the organization are created at the same time
+    # the created entities are deleted if a creation fails, not the given ones
+    builder = EntityBuilder()
+    org = builder.add(
+        'org',
+        make_org,
+        entity=Org,
+        record=({u'id': options['organization-id']}
+                if options.get('organization-id') is not None else None),
+    )
+    builder.add(
+        'env',
+        make_lifecycle_environment,
+        {u'organization-id': org},
+        entity=LifecycleEnvironment,
+        record=({u'id': options['lifecycle-environment-id']}
+                if options.get('lifecycle-environment-id') is not None
+                else None),
+    )
+    builder.add(
+        'cv',
+        make_content_view,
+        {u'organization-id': org},
+        entity=ContentView,
+        record=({u'id': options['content-view-id']}
+                if options.get('content-view-id') is not None else None),
+    )
+    product = builder.add(
+        'product', make_product, {u'organization-id': org}, entity=Product)
+    builder.add('repo', make_repository, {
         u'content-type': 'yum',
-        u'product-id': custom_product['id'],
+        u'product-id': product,
         u'url': options.get('url'),
-    })
+    }, entity=Repository)
+    entities = builder.build()
+    org_id = entities['org']['id']
+    env_id = entities['env']['id']
+    cv_id = entities['cv']['id']
+    custom_product = entities['product']
+    custom_repo = entities['repo']
     # Synchronize custom repository
     try:
         Repository.synchronize({'id': custom_repo['id']})
     except CLIReturnCodeError as err:
         raise CLIFactoryError(
             u'Failed to synchronize repository\n{0}'.format(err.msg))
-    # Create CV if needed and associate repo with it
-    if options.get('content-view-id') is None:
-        cv_id = make_content_view({u'organization-id': org_id})['id']
-    else:
-        cv_id = options['content-view-id']
+    # Associate repo with the CV
     try:
         ContentView.add_repository({
             u'id': cv_id,
@@ -3347,11 +3564,20 @@ def configure_env_for_provision(org=None, loc=None):
     :return: List of created entities that can be re-used further in
         provisioning or validation procedure (e.g. hostgroup or subnet)
     """
-    # Create new organization and location in case they were not passed
-    if org is None:
-        org = make_org()
-    if loc is None:
-        loc = make_location()
+    # Create new organization and location in case they were not passed, at
+    # the same time, and the puppet environment associated to them. The
+    # created entities are deleted if a creation fails
+    builder = EntityBuilder()
+    builder.add('org', make_org, entity=Org, record=org)
+    builder.add('loc', make_location, entity=Location, record=loc)
+    builder.add('env', make_environment, {
+        'location-ids': Ref('loc'),
+        'organization-ids': Ref('org'),
+    }, entity=Environment)
+    entities = builder.build()
+    org = entities['org']
+    loc = entities['loc']
+    env = entities['env']
 
     # Get a Library Lifecycle environment and the default CV for the org
     lce = LifecycleEnvironment.info(
@@ -3361,12 +3587,6 @@ def configure_env_for_provision(org=None, loc=None):
         {u'name': u'Default Organization View', u'organization-id': org['id']}
     )
 
-    # Create puppet environment and associate organization and location
-    env = make_environment({
-        'location-ids': loc['id'],
-        'organization-ids': org['id'],
-    })
-
     # get default capsule and associate location
     puppet_proxy = Proxy.info({'id': Proxy.list({
         u'search': settings.server.hostname
@@ -3861,11 +4081,9 @@ def setup_cdn_and_custom_repos_content(
             u'lifecycle-environment-id': lce_id,
             u'content-view-id': content_view['id'],
         })
-    # Get organization subscriptions
-    subscriptions = Subscription.list({
-        u'organization-id': org_id},
-        per_page=False
-    )
+    # Get organization subscriptions, pages are fetched until all the needed
+    # ones are found
+    subscriptions = Subscription.iter_list({u'organization-id': org_id})
     # Add subscriptions to activation-key
     needed_subscription_names = list(rh_subscriptions)
     if custom_product:
@@ -4144,10 +4362,7 @@ def virt_who_hypervisor_config(
     virt_who_hypervisor_host = org_hosts[0]
     subscription_id = None
     if hypervisor_hostname and subscription_name:
-        subscriptions = Subscription.list({
-            u'organization-id': org_id},
-            per_page=False
-        )
+        subscriptions = Subscription.iter_list({u'organization-id': org_id})
         for subscription in subscriptions:
             if subscription['name'] == subscription_name:
                 subscription_id = subscription['id']
@@ -4,8 +4,9 @@ import json
 
 import re
 import six
+from collections import namedtuple
+from operator import itemgetter
 from six import text_type
-from six.moves import cStringIO as StringIO
 from six.moves import zip
 
 
@@ -27,13 +28,17 @@ def _csv_reader(output):
     returns a unicode string each time its next() method is called.
     :return: generator that will yield a list of unicode string values.
 
+    Lines are consumed one at a time, so ``output`` can be a lazy iterator like
+    the one returned by :func:`robottelo.ssh.stream_command`.
+
     """
-    data = '\n'.join(output)
+    # the line terminator is put back so quoted values spanning several lines
+    # keep their line breaks
+    lines = (u'{0}\n'.format(line) for line in output)
     if six.PY2:
-        data = data.encode('utf8')
-    handler = StringIO(data)
+        lines = (line.encode('utf8') for line in lines)
 
-    for row in csv.reader(handler):  # pragma: no cover
+    for row in csv.reader(lines):  # pragma: no cover
         if six.PY2:
             yield [value.decode('utf8') for value in row]
         else:
@@ -68,13 +73,107 @@ def _normalize_obj(obj):
     return obj
 
 
-def parse_csv(output):
-    """Parse CSV output from Hammer CLI and convert it to python dictionary."""
+def iter_csv(output):
+    """Lazily parse CSV output from Hammer CLI yielding a python dictionary
+    for each row, only one line of ``output`` is read at a time.
+    """
     reader = _csv_reader(output)
     # Generate the key names, spaces will be converted to dashes "-"
-    keys = [_normalize(header) for header in next(reader)]
+    try:
+        keys = [_normalize(header) for header in next(reader)]
+    except StopIteration:
+        return
     # For each entry, create a dict mapping each key with each value
-    return [dict(zip(keys, values)) for values in reader if len(values) > 0]
+    for values in reader:
+        if len(values) > 0:
+            yield dict(zip(keys, values))
+
+
+_record_types = {}
+
+
+def _record_type(keys):
+    """Return the ``namedtuple`` class of the records with ``keys``, dashes
+    and other characters not allowed in identifiers are replaced by
+    underscores, ``content-view`` is the ``content_view`` attribute.
+    """
+    keys = tuple(keys)
+    if keys not in _record_types:
+        _record_types[keys] = namedtuple(
+            'CSVRecord',
+            [re.sub(r'\W', '_', key) or '_' for key in keys],
+            rename=True
+        )
+    return _record_types[keys]
+
+
+def _column_matcher(expected):
+    """Return a function telling if a column value matches ``expected``, a
+    value to compare with or a function receiving the value.
+    """
+    if callable(expected):
+        return expected
+    return lambda value: value == expected
+
+
+def iter_csv_records(output, fields=None, where=None):
+    """Lazily parse CSV output from Hammer CLI yielding a ``namedtuple`` for
+    each row, only one line of ``output`` is read at a time.
+
+    :param output: iterable of the output lines.
+    :param fields: the normalized names of the columns to keep, in the order
+        of the record attributes, for example ``['id', 'name']``. All the
+        columns are kept by default.
+    :param where: dict mapping normalized column names to a value or a
+        function receiving the column value, only the rows whose columns
+        match are parsed into records. The columns do not need to be in
+        ``fields``.
+    :raises ValueError: if a column of ``fields`` or ``where`` is not in the
+        output.
+    """
+    reader = _csv_reader(output)
+    try:
+        keys = [_normalize(header) for header in next(reader)]
+    except StopIteration:
+        return
+    fields = keys if fields is None else list(fields)
+    unknown = set(fields).union(where or ()).difference(keys)
+    if unknown:
+        raise ValueError(
+            'Unknown columns {0}, the output has {1}'.format(
+                sorted(unknown), keys)
+        )
+    record_type = _record_type(fields)
+    indexes = [keys.index(field) for field in fields]
+    conditions = [
+        (keys.index(key), _column_matcher(expected))
+        for key, expected in (where or {}).items()
+    ]
+    if len(indexes) > 1:
+        project = itemgetter(*indexes)
+    else:
+        # itemgetter returns a single value instead of a tuple for one index
+        def project(values):
+            return tuple(values[index] for index in indexes)
+    width = len(keys)
+    for values in reader:
+        if len(values) == 0:
+            continue
+        if len(values) < width:
+            values.extend([None] * (width - len(values)))
+        if all(match(values[index]) for index, match in conditions):
+            yield record_type._make(project(values))
+
+
+def parse_csv(output, fields=None, where=None):
+    """Parse CSV output from Hammer CLI and convert it to python dictionary.
+
+    When ``fields`` or ``where`` are given a list of ``namedtuple`` records
+    is returned instead, see :func:`iter_csv_records`.
+    """
+    if fields is not None or where is not None:
+        return list(iter_csv_records(output, fields, where))
+    return list(iter_csv(output))
 
 
 def parse_help(output):
@@ -185,8 +284,20 @@ def get_line_indentation_level(line, tab_spaces=4, indentation_spaces=4):
         line, tab_spaces=tab_spaces)//indentation_spaces
 
 
+_NUMBERED_VALUE_REGEX = re.compile(r'\d+\)\s+(.+)$')
+_VALUE_REGEX = re.compile(r'(.*)$')
+_NUMBERED_KEY_REGEX = re.compile(r'(\d+)\)')
+_NUMBER_REGEX = re.compile(r'\d+\)')
+
+
 def parse_info(output):
-    """Parse the info output and returns a dict mapping the values."""
+    """Parse the info output and returns a dict mapping the values.
+
+    The lines are parsed in a single pass, the state being the current
+    property (``sub_prop``), whether it is a numbered list (``sub_num``) and
+    the last second level key which may hold a third level
+    (``second_level_key``).
+    """
     # info dictionary
     contents = {}
     sub_prop = None  # stores name of the last group of sub-properties
@@ -197,96 +308,100 @@ def parse_info(output):
         # skip empty lines
         if line == '':
             continue
-        current_indent_level = get_line_indentation_level(line)
-        if current_indent_level <= 1:
+        stripped = line.lstrip()
+        # the indentation level, tabs count as 4 spaces and lines shorter
+        # than an indentation level are at level 0
+        level = 0
+        if line[0] in ' \t' and len(line) >= 4:
+            indentation = line[:len(line) - len(line.lstrip(' \t'))]
+            level = (len(indentation) + 3 * indentation.count('\t')) // 4
+        if level <= 1:
             # we are entering or leaving a second level from lower/upper levels
             # clear the second level key
             second_level_key = None
-        if line.startswith(' '):  # sub-properties are indented
-            # values are separated by ':' or '=>', but not by '::' which can be
-            # entity name like 'test::params::keys'
-            if line.find(':') != -1 and not line.find('::') != -1:
-                key, value = line.lstrip().split(":", 1)
-            elif line.find('=>') != -1 and len(
-                    line.lstrip().split(" =>", 1)) == 2:
-                key, value = line.lstrip().split(" =>", 1)
-            else:
-                key = value = None
-
-            if key is None and value is None:
-                # Parse single attribute collection properties
-                # Template
-                #  1) template1
-                #  2) template2
-                #
-                # or
-                # Template
-                #  template1
-                #  template2
-                match = re.match(r'\d+\)\s+(.+)$', line.lstrip())
-
-                if match is None:
-                    match = re.match(r'(.*)$', line.lstrip())
-
-                value = match.group(1)
-
-                if isinstance(contents[sub_prop], dict):
-                    contents[sub_prop] = []
 
-                contents[sub_prop].append(value)
-            else:
-                # some properties have many numbered values
-                # Example:
-                # Content:
-                #  1) Repo Name: repo1
-                #     URL:       /custom/4f84fc90-9ffa-...
-                #  2) Repo Name: puppet1
-                #     URL:       /custom/4f84fc90-9ffa-...
-                starts_with_number = re.match(r'(\d+)\)', key)
-                if starts_with_number:
-                    sub_num = int(starts_with_number.group(1))
-                    # no. 1) we need to change dict() to list()
-                    if sub_num == 1:
-                        contents[sub_prop] = []
-                    # remove number from key
-                    key = re.sub(r'\d+\)', '', key)
-                    # append empty dict to array
-                    contents[sub_prop].append({})
-
-                key = key.lstrip().replace(' ', '-').lower()
-                value = value.lstrip()
-                # add value to dictionary
-                if sub_num is not None:
-                    contents[sub_prop][-1][key] = value
-                else:
-                    # a third level is always represented as a dictionary and
-                    # we need to detect if we are at third level
-                    # example:
-                    # Content Information:
-                    #     Content View:
-                    #         ID:   10
-                    #         Name: Default Organization View
-                    # the "ID" and "Name" are located at third indent level
-                    # "content view" is located at second indent level
-                    if current_indent_level == 2 and second_level_key:
-                        # we are at third level indentation
-                        if not contents[sub_prop][second_level_key]:
-                            contents[sub_prop][second_level_key] = {}
-                        contents[sub_prop][second_level_key][key] = value
-                    else:
-                        contents[sub_prop][key] = value
-                    if current_indent_level == 1 and not value:
-                        # always set the last possible second level key
-                        # that can form a third level
-                        second_level_key = key
-        else:
-            sub_num = None  # new property implies no sub property
-            key, value = line.lstrip().split(":", 1)
-            key = key.lstrip().replace(' ', '-').lower()
-            if value.lstrip() == '':  # 'key:' no value, new sub-property
+        if line[0] != ' ':
+            # 'key: value' or 'key:' top level line, new property implies no
+            # sub property
+            sub_num = None
+            key, value = stripped.split(':', 1)
+            key = key.replace(' ', '-').lower()
+            value = value.lstrip()
+            if value == '':  # 'key:' no value, new sub-property
                 sub_prop = key
                 contents[sub_prop] = {}
             else:  # 'key: value' line
-                contents[key] = value.lstrip()
+                contents[key] = value
+            continue
+
+        # values are separated by ':' or '=>', but not by '::' which can be
+        # entity name like 'test::params::keys'
+        if ':' in line and '::' not in line:
+            key, value = stripped.split(':', 1)
+        elif ' =>' in stripped:
+            key, value = stripped.split(' =>', 1)
+        else:
+            # Parse single attribute collection properties
+            # Template
+            #  1) template1
+            #  2) template2
+            #
+            # or
+            # Template
+            #  template1
+            #  template2
+            match = _NUMBERED_VALUE_REGEX.match(stripped)
+            if match is None:
+                match = _VALUE_REGEX.match(stripped)
+            if isinstance(contents[sub_prop], dict):
+                contents[sub_prop] = []
+            contents[sub_prop].append(match.group(1))
+            continue
+
+        # some properties have many numbered values
+        # Example:
+        # Content:
+        #  1) Repo Name: repo1
+        #     URL:       /custom/4f84fc90-9ffa-...
+        #  2) Repo Name: puppet1
+        #     URL:       /custom/4f84fc90-9ffa-...
+        if key[:1].isdecimal():
+            starts_with_number = _NUMBERED_KEY_REGEX.match(key)
+            if starts_with_number:
+                sub_num = int(starts_with_number.group(1))
+                # no. 1) we need to change dict() to list()
+                if sub_num == 1:
+                    contents[sub_prop] = []
+                # remove number from key
+                key = _NUMBER_REGEX.sub('', key)
+                # append empty dict to array
+                contents[sub_prop].append({})
+
+        key = key.lstrip().replace(' ', '-').lower()
+        value = value.lstrip()
+        # add value to dictionary
+        if sub_num is not None:
+            contents[sub_prop][-1][key] = value
+            continue
+        # a third level is always represented as a dictionary and we need to
+        # detect if we are at third level
+        # example:
+        # Content Information:
+        #     Content View:
+        #         ID:   10
+        #         Name: Default Organization View
+        # the "ID" and "Name" are located at third indent level
+        # "content view" is located at second indent level
+        if level == 2 and second_level_key:
+            # we are at third level indentation
+            if not contents[sub_prop][second_level_key]:
+                contents[sub_prop][second_level_key] = {}
+            contents[sub_prop][second_level_key][key] = value
+        else:
+            contents[sub_prop][key] = value
+        if level == 1 and not value:
+            # always set the last possible second level key that can form a
+            # third level
+            second_level_key = key
 
     return contents
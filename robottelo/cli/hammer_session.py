@@ -0,0 +1,341 @@
+# -*- encoding: utf-8 -*-
+"""Long lived hammer sessions.
+
+Starting hammer loads ruby, all the hammer plugins and the apipie
+configuration, which takes longer than most of the commands themselves. When
+``settings.performance.hammer_session`` is enabled,
+:meth:`robottelo.cli.base.Base.execute` sends its commands to a session kept
+open on the server, one per process and user, over a single SSH channel.
+
+The session is a small ruby server, :data:`SESSION_SCRIPT`, which loads hammer
+once and then runs the real ``hammer`` executable in a forked child for every
+request. Each command therefore still gets its own process state, output and
+return code, only the loading is shared. Requests and responses are JSON
+documents, one per line.
+
+A session is bound to the user it was started for, the user credentials are
+sent once when the session starts and are added to the arguments of every
+command by the session itself. The command arguments are split by ``bash`` on
+the server, so quotes, variables, backticks and ``~`` are expanded the same
+way as when the command is run over SSH.
+
+If the session can not be started on the server, for example because
+``hammer`` is not a ruby script there, the commands are run as separate
+processes and no session is started on that server for
+:data:`SESSION_RETRY_INTERVAL` seconds.
+"""
+import json
+import logging
+import socket
+import threading
+import time
+
+import paramiko
+import six
+
+from robottelo import ssh, ssh_metrics
+from robottelo.config import settings
+
+logger = logging.getLogger(__name__)
+
+REMOTE_SCRIPT_PATH = '/tmp/robottelo_hammer_session.rb'
+
+SESSION_SCRIPT = u'''\
+require 'json'
+require 'tempfile'
+
+hammer = ARGV.shift
+ARGV.clear
+begin
+  require 'hammer_cli'
+  require 'hammer_cli/settings'
+  HammerCLI::Settings.load_from_defaults
+  HammerCLI::Modules.load_all
+rescue Exception => e
+  STDERR.puts("hammer preload failed: #{e}")
+end
+# the first line sent by the client holds the session user credentials
+user = JSON.parse(STDIN.gets || '{}')
+if user['user']
+  credentials = ['-u', user['user']]
+  credentials += ['-p', user['password']] if user['password']
+else
+  credentials = ['--interactive', 'no']
+end
+# split the command arguments with the shell, like a command run over ssh
+split = "set -- %s\\n" + '[ $# -eq 0 ] || printf "%%s\\\\0" "$@"'
+STDOUT.sync = true
+STDOUT.puts(JSON.generate('ready' => true))
+while (line = STDIN.gets)
+  request = JSON.parse(line)
+  out = Tempfile.new('hammer-out')
+  err = Tempfile.new('hammer-err')
+  pid = fork do
+    STDIN.reopen('/dev/null')
+    STDOUT.reopen(out.path, 'w')
+    STDERR.reopen(err.path, 'w')
+    request['env'].each { |key, value| ENV[key] = value }
+    args = IO.popen(['bash', '-c', split % request['command']], &:read)
+    exit($?.exitstatus) unless $?.success?
+    args = args.split("\\0", -1)
+    args.pop
+    ARGV.replace(credentials + args)
+    $0 = hammer
+    load hammer
+  end
+  Process.wait(pid)
+  STDOUT.puts(JSON.generate(
+    'return_code' => $?.exitstatus,
+    'stdout' => File.read(out.path).force_encoding('UTF-8').scrub,
+    'stderr' => File.read(err.path).force_encoding('UTF-8').scrub))
+  out.close!
+  err.close!
+end
+'''
+
+# run the session script with the interpreter of the hammer executable
+START_COMMAND = (
+    u'HAMMER=$(command -v hammer) && '
+    u'RUBY=$(head -n 1 "$HAMMER" | sed -n "s/^#! *//p") && '
+    u'exec $RUBY {0} "$HAMMER"'.format(REMOTE_SCRIPT_PATH)
+)
+
+# time in seconds during which no session is started on a server after a
+# session could not be started there
+SESSION_RETRY_INTERVAL = 300
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_unavailable = {}  # hostname: time after which a session can be started
+
+
+class HammerSessionError(Exception):
+    """Indicates that a hammer session could not be started or died while
+    running a command.
+
+    :param msg: explanation of the error
+    :param sent: whether the command was sent to the session before it died
+
+    """
+
+    def __init__(self, msg, sent=False):
+        self.sent = sent
+        super(HammerSessionError, self).__init__(msg)
+
+
+class HammerSession(object):
+    """A hammer session server running on ``hostname`` for ``user``.
+
+    Commands are run one at a time, concurrent callers wait for their turn.
+
+    :param str user: The hammer user the commands are run as, if it is
+        ``None`` hammer is run with ``--interactive no`` and the credentials
+        of its configuration.
+    :param str password: The password of ``user``.
+    :param str hostname: The server to run the session on. If it is ``None``
+        ``hostname`` from configuration's ``server`` section will be used.
+    """
+
+    def __init__(self, user=None, password=None, hostname=None):
+        self.user = user
+        self.password = password
+        self.hostname = hostname or settings.server.hostname
+        self._client = None
+        self._channel = None
+        self._stdin = None
+        self._stdout = None
+        self._lock = threading.Lock()
+
+    @property
+    def alive(self):
+        """Whether the session server is still running."""
+        return (
+            self._channel is not None and
+            not self._channel.closed and
+            not self._channel.exit_status_ready()
+        )
+
+    def start(self, timeout=None):
+        """Upload the session script, start it and wait until hammer is
+        loaded.
+
+        :raises HammerSessionError: if the session could not be started.
+        """
+        if timeout is None:
+            timeout = settings.ssh_client.command_timeout
+        try:
+            self._client = ssh.get_client(hostname=self.hostname)
+            sftp = self._client.open_sftp()
+            try:
+                sftp.putfo(
+                    six.BytesIO(SESSION_SCRIPT.encode('utf-8')),
+                    REMOTE_SCRIPT_PATH
+                )
+            finally:
+                sftp.close()
+            self._channel = self._client.get_transport().open_session()
+            self._channel.settimeout(timeout)
+            self._channel.exec_command(START_COMMAND)
+            self._stdin = self._channel.makefile('wb')
+            self._stdout = self._channel.makefile('rb')
+            self._write_line(
+                {'user': self.user, 'password': self.password})
+            ready = self._read_response()
+        except (socket.error, paramiko.SSHException, IOError,
+                HammerSessionError) as err:
+            self.close()
+            raise HammerSessionError(
+                'hammer session could not be started: {0}'.format(err))
+        if not isinstance(ready, dict) or not ready.get('ready'):
+            self.close()
+            raise HammerSessionError(
+                'hammer session could not be started: {0}'.format(ready))
+        logger.info('Started hammer session on [%s]', self.hostname)
+
+    def _write_line(self, data):
+        """Send a JSON line to the session server."""
+        self._stdin.write(json.dumps(data).encode('utf-8') + b'\n')
+        self._stdin.flush()
+
+    def _read_response(self):
+        """Read the next JSON response line sent by the session server."""
+        line = self._stdout.readline()
+        if not line:
+            stderr = b''
+            if self._channel.recv_stderr_ready():
+                stderr = self._channel.recv_stderr(4096)
+            raise HammerSessionError(
+                'hammer session exited: {0}'.format(
+                    ssh.decode_to_utf8(stderr)))
+        try:
+            return json.loads(ssh.decode_to_utf8(line))
+        except ValueError:
+            raise HammerSessionError(
+                'unexpected hammer session output: {0!r}'.format(line))
+
+    def execute(self, args, env=None, timeout=None):
+        """Run hammer with the ``args`` command line as the session user.
+
+        :param str args: hammer arguments, without the ``hammer`` executable
+            and the credentials, they are split by ``bash`` on the server.
+        :param dict env: environment variables to set for the command.
+        :param timeout: Time to wait for the command to finish.
+        :return: a tuple of return code, stdout and stderr.
+        :raises robottelo.ssh.SSHCommandTimeoutError: if the command did not
+            finish in time, the session is closed.
+        :raises HammerSessionError: if the session died, the session is
+            closed.
+        """
+        if timeout is None:
+            timeout = settings.ssh_client.command_timeout
+        with self._lock:
+            sent = False
+            if not self.alive:
+                raise HammerSessionError('hammer session is not running')
+            self._channel.settimeout(timeout)
+            try:
+                self._write_line({'command': args, 'env': env or {}})
+                sent = True
+                response = self._read_response()
+            except socket.timeout:
+                self.close()
+                raise ssh.SSHCommandTimeoutError(
+                    'hammer command: {0} \n did not respond in the predefined '
+                    'time (timeout={1})'.format(args, timeout)
+                )
+            except (socket.error, paramiko.SSHException, IOError) as err:
+                self.close()
+                raise HammerSessionError(
+                    'hammer session died: {0}'.format(err), sent)
+            except HammerSessionError as err:
+                self.close()
+                err.sent = sent
+                raise
+        return (
+            response['return_code'], response['stdout'], response['stderr'])
+
+    def close(self):
+        """Stop the session server and close its connection."""
+        if self._channel is not None:
+            self._channel.close()
+        if self._client is not None:
+            self._client.close()
+        self._channel = self._client = self._stdin = self._stdout = None
+
+
+def get_session(user, password, hostname=None):
+    """Return the running session of ``user`` on ``hostname`` for the
+    current process, starting it if needed.
+
+    :return: a :class:`HammerSession` or ``None`` if a session could not be
+        started on ``hostname`` during the last
+        :data:`SESSION_RETRY_INTERVAL` seconds.
+    """
+    hostname = hostname or settings.server.hostname
+    key = (hostname, user, password)
+    with _sessions_lock:
+        if _unavailable.get(hostname, 0) > time.time():
+            return None
+        session = _sessions.get(key)
+        if session is not None and session.alive:
+            return session
+        session = HammerSession(user, password, hostname)
+        try:
+            session.start()
+        except HammerSessionError as err:
+            logger.warning(
+                '%s, running hammer commands as separate processes for %s '
+                'seconds', err, SESSION_RETRY_INTERVAL)
+            _unavailable[hostname] = time.time() + SESSION_RETRY_INTERVAL
+            _sessions.pop(key, None)
+            return None
+        _unavailable.pop(hostname, None)
+        _sessions[key] = session
+        return session
+
+
+def close_sessions():
+    """Close all the sessions of the current process."""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _unavailable.clear()
+
+
+def execute(args, user, password, output_format=None, timeout=None,
+            env=None, hostname=None):
+    """Run hammer with the ``args`` string in the session of ``user``.
+
+    :param str args: hammer arguments without the credentials, the session
+        adds the ones of ``user``.
+    :return: SSHCommandResult or ``None`` if the command was not run because
+        there is no session available and it should be run as a separate
+        process instead.
+    :raises HammerSessionError: if the session died after receiving the
+        command, as the command may have been run already.
+    """
+    session = get_session(user, password, hostname)
+    if session is None:
+        return None
+    logger.info('>>> hammer %s', args)
+    with ssh_metrics.measure(u'hammer ' + args, session.hostname):
+        try:
+            with ssh_metrics.timer('execution'):
+                return_code, stdout, stderr = session.execute(
+                    args, env=env, timeout=timeout)
+        except HammerSessionError as err:
+            if err.sent:
+                raise
+            logger.warning(
+                '%s, running the hammer command as a separate process', err)
+            return None
+        ssh_metrics.add('bytes', len(stdout) + len(stderr))
+        with ssh_metrics.timer('parse'):
+            if stdout:
+                logger.info('<<< stdout\n%s', stdout)
+            if stderr:
+                stderr = ssh.COLOR_CODES_REGEX.sub('', stderr)
+                logger.info('<<< stderr\n%s', stderr)
+            return ssh._command_result(
+                stdout, stderr, return_code, output_format)
@@ -65,30 +65,29 @@ class Host(Base):
              --organization-title ORGANIZATION_TITLE Organization title
              -h, --help                              Print help
         """
-        cls.command_sub = 'enc-dump'
         return cls.execute(
-            cls._construct_command(options), output_format='yaml')
+            cls._construct_command('enc-dump', options), output_format='yaml')
 
     @classmethod
     def errata_apply(cls, options):
         """Schedule errata for installation"""
-        cls.command_sub = 'errata apply'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('errata apply', options),
+            output_format='csv')
 
     @classmethod
     def errata_info(cls, options):
         """Retrieve a single errata for a system"""
-        cls.command_sub = 'errata info'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('errata info', options),
+            output_format='csv')
 
     @classmethod
     def errata_list(cls, options):
         """List errata available for the content host."""
-        cls.command_sub = 'errata list'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('errata list', options),
+            output_format='csv')
 
     @classmethod
     def facts(cls, options=None):
@@ -109,10 +108,9 @@ class Host(Base):
             --search SEARCH               filter results
             -h, --help                    print help
         """
-        cls.command_sub = 'facts'
 
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('facts', options), output_format='csv')
 
         facts = []
 
@@ -124,51 +122,51 @@ class Host(Base):
     @classmethod
     def package_install(cls, options):
         """Install packages remotely."""
-        cls.command_sub = 'package install'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('package install', options),
+            output_format='csv')
 
     @classmethod
     def package_list(cls, options):
         """List packages installed on the host."""
-        cls.command_sub = 'package list'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('package list', options),
+            output_format='csv')
 
     @classmethod
     def package_remove(cls, options):
         """Uninstall packages remotely."""
-        cls.command_sub = 'package remove'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('package remove', options),
+            output_format='csv')
 
     @classmethod
     def package_upgrade(cls, options):
         """Update packages remotely."""
-        cls.command_sub = 'package upgrade'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('package upgrade', options),
+            output_format='csv')
 
     @classmethod
     def package_upgrade_all(cls, options):
         """Update all packages remotely."""
-        cls.command_sub = 'package upgrade-all'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('package upgrade-all', options),
+            output_format='csv')
 
     @classmethod
     def package_group_install(cls, options):
         """Install package groups remotely."""
-        cls.command_sub = 'package-group install'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('package-group install', options),
+            output_format='csv')
 
     @classmethod
     def package_group_remove(cls, options):
         """Uninstall package groups remotely."""
-        cls.command_sub = 'package-group remove'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('package-group remove', options),
+            output_format='csv')
 
     @classmethod
     def puppetrun(cls, options=None):
@@ -186,9 +184,7 @@ class Host(Base):
             -h, --help                    print help
         """
 
-        cls.command_sub = 'puppetrun'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('puppetrun', options))
 
         return result
 
@@ -208,9 +204,7 @@ class Host(Base):
             -h, --help                    print help
         """
 
-        cls.command_sub = 'reboot'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('reboot', options))
 
         return result
 
@@ -234,10 +228,8 @@ class Host(Base):
             -h, --help                    print help
         """
 
-        cls.command_sub = 'reports'
-
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('reports', options), output_format='csv')
 
         reports = []
 
@@ -262,9 +254,7 @@ class Host(Base):
             -h, --help                    print help
         """
 
-        cls.command_sub = 'start'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('start', options))
 
         return result
 
@@ -284,9 +274,7 @@ class Host(Base):
             -h, --help                    print help
         """
 
-        cls.command_sub = 'status'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('status', options))
 
         return result
 
@@ -307,9 +295,7 @@ class Host(Base):
             -h, --help                    print help
         """
 
-        cls.command_sub = 'stop'
-
-        result = cls.execute(cls._construct_command(options))
+        result = cls.execute(cls._construct_command('stop', options))
 
         return result
 
@@ -366,9 +352,9 @@ class Host(Base):
                                                                 generated if
                                                                 not provided
         """
-        cls.command_sub = 'subscription register'
         result = cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('subscription register', options),
+            output_format='csv')
         if isinstance(result, list):
             result = result[0]
         return result
@@ -386,8 +372,8 @@ class Host(Base):
             --host HOST_NAME              Name to search by
             --host-id HOST_ID             Host ID
         """
-        cls.command_sub = 'subscription unregister'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(
+            cls._construct_command('subscription unregister', options))
 
     @classmethod
     def subscription_attach(cls, options=None):
@@ -405,8 +391,8 @@ class Host(Base):
                                               add. Defaults to 1
             --subscription-id SUBSCRIPTION_ID ID of subscription
         """
-        cls.command_sub = 'subscription attach'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(
+            cls._construct_command('subscription attach', options))
 
     @classmethod
     def subscription_remove(cls, options=None):
@@ -425,8 +411,8 @@ class Host(Base):
                                                 and quantity
             --subscription-id SUBSCRIPTION_ID   ID of subscription
         """
-        cls.command_sub = 'subscription remove'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(
+            cls._construct_command('subscription remove', options))
 
     @classmethod
     def subscription_auto_attach(cls, options=None):
@@ -442,8 +428,8 @@ class Host(Base):
             --host-id HOST_ID
             -h, --help                    print help
         """
-        cls.command_sub = 'subscription auto-attach'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(
+            cls._construct_command('subscription auto-attach', options))
 
     @classmethod
     def sc_params(cls, options=None):
@@ -462,9 +448,8 @@ class Host(Base):
             --per-page PER_PAGE           number of entries per request
             --search SEARCH               filter results
         """
-        cls.command_sub = 'sc-params'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('sc-params', options), output_format='csv')
 
     @classmethod
     def smart_variables(cls, options=None):
@@ -483,9 +468,9 @@ class Host(Base):
             --per-page PER_PAGE           number of entries per request
             --search SEARCH               filter results
         """
-        cls.command_sub = 'smart-variables'
         return cls.execute(
-            cls._construct_command(options), output_format='csv')
+            cls._construct_command('smart-variables', options),
+            output_format='csv')
 
 
 class HostInterface(Base):
@@ -506,5 +491,5 @@ class HostInterface(Base):
     @classmethod
     def create(cls, options=None):
         """Create new network interface for host"""
-        cls.command_sub = 'create'
-        cls.execute(cls._construct_command(options), output_format='csv')
+        cls.execute(
+            cls._construct_command('create', options), output_format='csv')
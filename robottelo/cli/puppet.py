@@ -41,9 +41,8 @@ class Puppet(Base):
              --puppet-class-id PUPPET_CLASS_ID  ID of Puppet class
              --search SEARCH                    filter results
         """
-        cls.command_sub = 'sc-params'
         return cls.execute(
-                cls._construct_command(options),
+                cls._construct_command('sc-params', options),
                 output_format='csv'
         )
 
@@ -61,8 +60,7 @@ class Puppet(Base):
              --puppet-class-id PUPPET_CLASS_ID  ID of Puppet class
              --search SEARCH                    filter results
          """
-        cls.command_sub = 'smart-variables'
         return cls.execute(
-                cls._construct_command(options),
+                cls._construct_command('smart-variables', options),
                 output_format='csv'
         )
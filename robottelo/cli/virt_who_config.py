@@ -29,8 +29,7 @@ class VirtWhoConfig(Base):
     @classmethod
     def fetch(cls, options=None):
         """Renders a deploy script for the specified virt-who configuration"""
-        cls.command_sub = 'fetch'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('fetch', options))
 
     @classmethod
     def deploy(cls, options=None):
@@ -40,5 +39,4 @@ class VirtWhoConfig(Base):
         :param options: `id` required
         :return: Results of the command
         """
-        cls.command_sub = 'deploy'
-        return cls.execute(cls._construct_command(options))
+        return cls.execute(cls._construct_command('deploy', options))
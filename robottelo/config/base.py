@@ -837,11 +837,50 @@ class PerformanceSettings(FeatureSettings):
         self.sync_count = None
         self.sync_type = None
         self.repos = None
+        self.ssh_metrics = None
+        self.ssh_metrics_dir = None
+        self.lock_metrics = None
+        self.lock_metrics_dir = None
+        self.hammer_session = None
+        self.hammer_cache = None
+        self.hammer_cache_ttl = None
+        self.hammer_cache_size = None
+        self.hammer_lazy_create = None
+        self.factory_cache_size = None
+        self.factory_cache_ttl = None
+        self.factory_cache_validate_interval = None
+        self.factory_cache_shared = None
 
     def read(self, reader):
         """Read performance settings."""
         self.time_hammer = reader.get(
             'performance', 'time_hammer', False, bool)
+        self.ssh_metrics = reader.get(
+            'performance', 'ssh_metrics', False, bool)
+        self.ssh_metrics_dir = reader.get(
+            'performance', 'ssh_metrics_dir', 'ssh_metrics')
+        self.lock_metrics = reader.get(
+            'performance', 'lock_metrics', False, bool)
+        self.lock_metrics_dir = reader.get(
+            'performance', 'lock_metrics_dir', 'lock_metrics')
+        self.hammer_session = reader.get(
+            'performance', 'hammer_session', False, bool)
+        self.hammer_cache = reader.get(
+            'performance', 'hammer_cache', False, bool)
+        self.hammer_cache_ttl = reader.get(
+            'performance', 'hammer_cache_ttl', 300, int)
+        self.hammer_cache_size = reader.get(
+            'performance', 'hammer_cache_size', 1000, int)
+        self.hammer_lazy_create = reader.get(
+            'performance', 'hammer_lazy_create', False, bool)
+        self.factory_cache_size = reader.get(
+            'performance', 'factory_cache_size', 128, int)
+        self.factory_cache_ttl = reader.get(
+            'performance', 'factory_cache_ttl', 3600, int)
+        self.factory_cache_validate_interval = reader.get(
+            'performance', 'factory_cache_validate_interval', 60, int)
+        self.factory_cache_shared = reader.get(
+            'performance', 'factory_cache_shared', False, bool)
         self.cdn_address = reader.get(
             'performance', 'cdn_address')
         self.virtual_machines = reader.get(
@@ -902,6 +941,8 @@ class SSHClientSettings(FeatureSettings):
         super(SSHClientSettings, self).__init__(*args, **kwargs)
         self._command_timeout = None
         self._connection_timeout = None
+        self._connection_pool_size = None
+        self._connection_pool_idle_timeout = None
 
     @property
     def command_timeout(self):
@@ -913,12 +954,27 @@ class SSHClientSettings(FeatureSettings):
         return self._connection_timeout if (
             self._connection_timeout is not None) else 10
 
+    @property
+    def connection_pool_size(self):
+        return self._connection_pool_size if (
+            self._connection_pool_size is not None) else 4
+
+    @property
+    def connection_pool_idle_timeout(self):
+        return self._connection_pool_idle_timeout if (
+            self._connection_pool_idle_timeout is not None) else 60
+
     def read(self, reader):
         """Read SSHClient settings."""
         self._command_timeout = reader.get(
             'ssh_client', 'command_timeout', default=300, cast=int)
         self._connection_timeout = reader.get(
             'ssh_client', 'connection_timeout', default=10, cast=int)
+        self._connection_pool_size = reader.get(
+            'ssh_client', 'connection_pool_size', default=4, cast=int)
+        self._connection_pool_idle_timeout = reader.get(
+            'ssh_client', 'connection_pool_idle_timeout', default=60,
+            cast=int)
 
     def validate(self):
         """Validate SSHClient settings."""
@@ -1021,12 +1077,16 @@ class SharedFunctionSettings(FeatureSettings):
         self.scope = None
         self.enabled = None
         self.lock_timeout = None
+        self.lock_lease = None
         self.share_timeout = None
+        self.cache_size = None
         self.redis_host = None
         self.redis_port = None
         self.redis_db = None
         self.redis_password = None
         self.call_retries = None
+        self.entity_pools = None
+        self.entity_pool_size = None
 
     def read(self, reader):
         """Read shared settings."""
@@ -1036,8 +1096,12 @@ class SharedFunctionSettings(FeatureSettings):
             'shared_function', 'enabled', False, bool)
         self.lock_timeout = reader.get(
             'shared_function', 'lock_timeout', 7200, int)
+        self.lock_lease = reader.get(
+            'shared_function', 'lock_lease', 60, int)
         self.share_timeout = reader.get(
             'shared_function', 'share_timeout', self.MAX_SHARE_TIMEOUT, int)
+        self.cache_size = reader.get(
+            'shared_function', 'cache_size', 256, int)
         self.redis_host = reader.get(
             'shared_function', 'redis_host', 'localhost')
         self.redis_port = reader.get(
@@ -1048,6 +1112,10 @@ class SharedFunctionSettings(FeatureSettings):
             'shared_function', 'redis_password', None)
         self.call_retries = reader.get(
             'shared_function', 'call_retries', 2, int)
+        self.entity_pools = reader.get(
+            'shared_function', 'entity_pools', False, bool)
+        self.entity_pool_size = reader.get(
+            'shared_function', 'entity_pool_size', 2, int)
 
     def validate(self):
         """Validate the shared settings"""
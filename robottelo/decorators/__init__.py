@@ -16,10 +16,10 @@ from robozilla.decorators import (  # noqa
 
 from robottelo.config import settings
 from robottelo.constants import NOT_IMPLEMENTED
+from robottelo.decorators import factory_cache
 from robottelo.host_info import get_host_sat_version
 
 LOGGER = logging.getLogger(__name__)
-OBJECT_CACHE = {}
 
 # Test Tier Decorators
 # CRUD tests
@@ -175,8 +175,21 @@ def stubbed(reason=None):
     return wrapper
 
 
-def cacheable(func):
-    """Decorator that makes an optional object cache available"""
+def cacheable(func=None, validate=None):
+    """Decorator that makes an optional object cache available
+
+    The decorated function accepts a ``cached`` argument, when it is ``True``
+    the object created by a previous call with the same options is returned,
+    see :mod:`robottelo.decorators.factory_cache`. ``validate`` is called with
+    a cached object to check it can be returned::
+
+        @cacheable(validate=lambda org: org_exists(org['id']))
+        def make_org(options=None):
+            ...
+
+    """
+    if func is None:
+        return partial(cacheable, validate=validate)
 
     @wraps(func)
     def cacheable_function(options=None, cached=False):
@@ -184,13 +197,14 @@ def cacheable(func):
         This is the function being returned.
         Requires input function's name start with 'make_'
         """
-        object_key = func.__name__.replace('make_', '')
-        if cached is True and object_key in OBJECT_CACHE:
-            return OBJECT_CACHE[object_key]
-        new_object = func(options)
-        if cached is True:
-            OBJECT_CACHE[object_key] = new_object
-        return new_object
+        if cached is not True:
+            return func(options)
+        return factory_cache.get_or_create(
+            func.__name__.replace('make_', ''),
+            options,
+            lambda: func(options),
+            validate,
+        )
 
     return cacheable_function
 
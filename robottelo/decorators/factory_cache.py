@@ -0,0 +1,203 @@
+# -*- encoding: utf-8 -*-
+"""Memoization of the ``make_*`` factory functions.
+
+A factory decorated with :func:`robottelo.decorators.cacheable` and called
+with ``cached=True`` returns the entity created by a previous call with the
+same options, the options are part of the key::
+
+    org = make_org(cached=True)
+    assert make_org(cached=True) is org
+    other = make_org({'description': 'other'}, cached=True)
+
+Entities are kept in a per process LRU of
+``settings.performance.factory_cache_size`` entries for
+``settings.performance.factory_cache_ttl`` seconds. When
+``settings.performance.factory_cache_shared`` is enabled they are also
+stored in the :mod:`shared function <robottelo.decorators.func_shared>`
+storage, so the pytest xdist workers reuse the entities created by the other
+workers, the entities must then be json compatible.
+
+A factory can be given a ``validate`` function, called with the cached
+entity before returning it, for example to check it still exists. Invalid
+entities are dropped and a new one is created. The entities of the shared
+storage, which another process may have deleted, are validated on every hit.
+The entities of the process cache are validated at most once every
+``settings.performance.factory_cache_validate_interval`` seconds.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from collections import OrderedDict
+from robottelo.config import settings
+
+DEFAULT_SIZE = 128
+DEFAULT_TTL = 3600
+DEFAULT_VALIDATE_INTERVAL = 60
+
+_NAMESPACE_KEY_TYPE = 'factory_cache'
+
+_COUNTERS = ('hits', 'shared_hits', 'misses', 'expirations', 'invalidations')
+
+
+def make_key(name, options):
+    """Return the cache key of the factory ``name`` called with
+    ``options``, the options order does not matter.
+    """
+    text = json.dumps(options or {}, sort_keys=True, default=str)
+    return '{0}.{1}'.format(
+        name, hashlib.md5(text.encode('utf-8')).hexdigest())
+
+
+def _performance_setting(name, default):
+    value = None
+    if settings.performance:
+        value = getattr(settings.performance, name, None)
+    return default if value is None else value
+
+
+class FactoryCache(object):
+    """Two level cache of the factories results, see the module
+    documentation.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {}
+
+    @property
+    def size(self):
+        return _performance_setting('factory_cache_size', DEFAULT_SIZE)
+
+    @property
+    def ttl(self):
+        return _performance_setting('factory_cache_ttl', DEFAULT_TTL)
+
+    @property
+    def validate_interval(self):
+        return _performance_setting(
+            'factory_cache_validate_interval', DEFAULT_VALIDATE_INTERVAL)
+
+    @property
+    def shared(self):
+        return _performance_setting('factory_cache_shared', False)
+
+    def _count(self, name, counter):
+        with self._lock:
+            stats = self.stats.setdefault(name, dict.fromkeys(_COUNTERS, 0))
+            stats[counter] += 1
+
+    def _is_valid(self, name, created, value, validate):
+        """Whether an entity ``created`` at this time can be returned,
+        counting the expired and invalid ones.
+        """
+        if created + self.ttl < time.time():
+            self._count(name, 'expirations')
+            return False
+        if validate is not None and not validate(value):
+            self._count(name, 'invalidations')
+            return False
+        return True
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _set(self, key, created, value, validated):
+        with self._lock:
+            self._entries[key] = (created, value, validated)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(self.size, 0):
+                self._entries.popitem(last=False)
+
+    def _drop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _create_shared(self, name, key, create, validate):
+        """Return the entity of the shared storage or create and store it,
+        the other processes wait for the creation.
+        """
+        # the shared function imports robottelo.decorators
+        from robottelo.decorators.func_shared.shared import (
+            _get_default_scope,
+            _get_default_storage_handler,
+        )
+        scope = _get_default_scope()
+        storage = _get_default_storage_handler()
+        shared_key = '.'.join([scope, _NAMESPACE_KEY_TYPE, key])
+        with storage.lock(shared_key) as data:
+            storage.when_lock_acquired(data)
+            stored = storage.get(shared_key)
+            if stored is not None and self._is_valid(
+                    name, stored['created'], stored['value'], validate):
+                self._count(name, 'shared_hits')
+                return stored['created'], stored['value']
+            self._count(name, 'misses')
+            created, value = time.time(), create()
+            storage.set(shared_key, {'created': created, 'value': value})
+            return created, value
+
+    def get_or_create(self, name, options, create, validate=None):
+        """Return the cached entity of the factory ``name`` called with
+        ``options``, calling ``create`` to create it when it is not cached.
+        """
+        key = make_key(name, options)
+        entry = self._get(key)
+        if entry is not None:
+            created, value, validated = entry
+            now = time.time()
+            if validated + self.validate_interval > now:
+                # validated recently, not validated again
+                check = None
+            else:
+                check = validate
+            if self._is_valid(name, created, value, check):
+                if check is not None:
+                    self._set(key, created, value, now)
+                self._count(name, 'hits')
+                return value
+            self._drop(key)
+        if self.shared:
+            created, value = self._create_shared(name, key, create, validate)
+        else:
+            self._count(name, 'misses')
+            created, value = time.time(), create()
+        self._set(key, created, value, time.time())
+        return value
+
+    def clear(self):
+        """Drop all the entities of this process."""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Return the counters of each factory."""
+        with self._lock:
+            return {
+                name: dict(stats) for name, stats in self.stats.items()}
+
+
+_cache = FactoryCache()
+
+
+def get_or_create(name, options, create, validate=None):
+    """Return the cached entity, see :meth:`FactoryCache.get_or_create`."""
+    return _cache.get_or_create(name, options, create, validate)
+
+
+def clear():
+    """Drop all the entities cached by this process."""
+    _cache.clear()
+
+
+def get_stats():
+    """Return the hits, shared hits, misses, expirations and invalidations
+    of each factory.
+    """
+    return _cache.get_stats()
@@ -1,5 +1,20 @@
 # -*- encoding: utf-8 -*-
-"""Implements test function locking, using pytest_services file locking
+"""Implements test function locking, using blocking file locks
+
+The locks are ``flock`` locks on files of the temporary directory, a waiting
+process sleeps in the kernel and is woken as soon as the lock is released,
+the timeout is enforced by blocking on the lock in a waiter thread.
+
+A waiter thread given up by its caller releases the lock and closes its file
+as soon as it gets the lock, it never keeps it. Until then it is adopted by
+the next waiter of the same process on the same file, so the waiters given up
+on a busy lock do not pile up.
+
+A lock holder has a lease, written in a ``.lease`` file next to the locked
+file and renewed by a heartbeat thread. When the lease expires, because the
+holder process is frozen, or when the holder process of the same host is
+dead while a child process keeps the file locked, the waiters take over the
+lock instead of waiting for the timeout.
 
 Usage::
 
@@ -39,17 +54,38 @@ Usage::
        def test_that_conflict_with_test_to_lock(self)
             with locking_function(self.test_to_lock):
                 # do some operations that conflict with test_to_lock
+
+    # some resources can be used by a limited number of workers at the same
+    # time, or by many readers but a single writer
+    class SomeTestCase(TestCase):
+
+        @semaphore_function(n=4, scope_context='libvirt_vms')
+        def test_positive_provision(self):
+            pass
+
+        def test_positive_read(self):
+            with rw_lock(mode='read', scope_context='puppet_classes'):
+                # read the puppet classes
+
+The semaphores and reader/writer locks are stored in files like the function
+locks, or in redis when :func:`set_default_storage` is set to ``redis``.
 """
+import errno
+import fcntl
 import functools
 import inspect
+import json
 import logging
 import os
+import socket
 import tempfile
+import threading
+import time
+import uuid
 
 from contextlib import contextmanager
 
-from pytest_services.locks import file_lock
-
+from robottelo import lock_metrics
 from robottelo.config import settings
 
 logger = logging.getLogger(__name__)
@@ -58,8 +94,18 @@ TEMP_ROOT_DIR = 'robottelo'
 TEMP_FUNC_LOCK_DIR = 'lock_functions'
 LOCK_DIR = None
 LOCK_DEFAULT_TIMEOUT = 1800  # 30 minutes
+# the holder of a lock renews its lease every third of this time
+LOCK_DEFAULT_LEASE = 60
+# how often a waiter checks if the lock holder is stale
+LEASE_CHECK_INTERVAL = 1
 LOCK_FILE_NAME_EXT = 'lock'
+LEASE_FILE_NAME_EXT = 'lease'
+RW_LOCK_READ = 'read'
+RW_LOCK_WRITE = 'write'
+RW_LOCK_MODES = (RW_LOCK_READ, RW_LOCK_WRITE)
 LOCK_DEFAULT_SCOPE = None
+LOCK_DEFAULT_STORAGE = 'file'
+LOCK_STORAGES = ('file', 'redis')
 
 _DEFAULT_CLASS_NAME_DEPTH = 3
 
@@ -68,6 +114,13 @@ class FunctionLockerError(Exception):
     """the default function locker error"""
 
 
+class FunctionLockerTimeoutError(FunctionLockerError):
+    """the lock was not acquired before the timeout"""
+
+
+_TIMEOUT_ERRORS = (FunctionLockerTimeoutError,)
+
+
 def set_default_scope(value):
     """Set the default namespace scope
 
@@ -77,6 +130,15 @@ def set_default_scope(value):
     LOCK_DEFAULT_SCOPE = value
 
 
+def set_default_storage(value):
+    """Set the default storage of the semaphores and reader/writer locks
+
+    :type value: str
+    """
+    global LOCK_DEFAULT_STORAGE
+    LOCK_DEFAULT_STORAGE = value
+
+
 def _get_default_scope():
     # this is the default locking scope
     if LOCK_DEFAULT_SCOPE is None:
@@ -156,6 +218,25 @@ def _get_function_name(function, class_name=None):
     return '.'.join(names)
 
 
+def _get_caller_class_name():
+    """Return the name of the classes where the caller of the function
+    calling this one is defined, the class names are the names of the calling
+    frames up to the module
+    """
+    class_names = []
+    class_name = None
+    # the frame 1 is the function calling this one, the frame 2 its caller
+    index = 2
+    while class_name != '<module>' and index <= _DEFAULT_CLASS_NAME_DEPTH + 1:
+        if class_name:
+            class_names.append(class_name)
+        class_name = inspect.getouterframes(inspect.currentframe())[index][3]
+        index += 1
+
+    class_names.reverse()
+    return '.'.join(class_names)
+
+
 def _get_function_name_lock_path(function_name, scope=None, scope_kwargs=None,
                                  scope_context=None):
     """Return the path of the file to lock"""
@@ -166,6 +247,502 @@ def _get_function_name_lock_path(function_name, scope=None, scope_kwargs=None,
     )
 
 
+def _open_lock_file(file_path):
+    """Open the file to lock for reading and writing, without truncating its
+    content
+    """
+    return os.fdopen(os.open(file_path, os.O_RDWR | os.O_CREAT), 'r+')
+
+
+def _unlock_file(handler):
+    """Release the lock of the file handler and close it"""
+    try:
+        fcntl.flock(handler.fileno(), fcntl.LOCK_UN)
+    finally:
+        handler.close()
+
+
+def _try_lock(handler, operation=fcntl.LOCK_EX):
+    """Lock the file handler without waiting, return whether locked"""
+    try:
+        fcntl.flock(handler.fileno(), operation | fcntl.LOCK_NB)
+        return True
+    except (IOError, OSError) as err:
+        if err.errno not in (errno.EACCES, errno.EAGAIN):
+            handler.close()
+            raise
+    return False
+
+
+class _LockWaiter(threading.Thread):
+    """Block on the lock of a file, the caller waits for the acquisition
+    with a timeout, the ``notify`` event is set when done.
+
+    An abandoned waiter releases the lock as soon as it gets it, until then
+    it can be adopted by an other caller waiting on the same lock.
+    """
+
+    def __init__(self, file_path, operation, notify):
+        super(_LockWaiter, self).__init__(name='lock-waiter')
+        self.daemon = True
+        self.file_path = file_path
+        self.handler = _open_lock_file(file_path)
+        self.operation = operation
+        self.error = None
+        self._notify = notify
+        self._done = threading.Event()
+        self._abandoned = False
+        self._lock = threading.Lock()
+
+    def run(self):
+        try:
+            fcntl.flock(self.handler.fileno(), self.operation)
+        except (IOError, OSError) as err:
+            self.error = err
+        with self._lock:
+            self._done.set()
+            if self._abandoned:
+                _forget_waiter(self)
+                _unlock_file(self.handler)
+            notify = self._notify
+        notify.set()
+
+    def acquired(self):
+        """Return whether the lock was acquired"""
+        if not self._done.is_set():
+            return False
+        if self.error is not None:
+            self.handler.close()
+            raise self.error
+        return True
+
+    def abandon(self):
+        """Give up the lock, it is released by the waiter if acquired"""
+        with self._lock:
+            self._abandoned = True
+            if self._done.is_set():
+                _unlock_file(self.handler)
+                return
+            with _abandoned_waiters_lock:
+                _abandoned_waiters.setdefault(
+                    (self.file_path, self.operation), []).append(self)
+
+    def adopt(self, notify):
+        """Wait for the lock again for an other caller, return False if the
+        waiter is done or waits on a file removed by a takeover
+        """
+        with self._lock:
+            if (self._done.is_set() or not self._abandoned or
+                    not _is_current(self.handler, self.file_path)):
+                return False
+            self._abandoned = False
+            self._notify = notify
+        return True
+
+
+# the waiters given up by their callers and still blocked on a lock, by file
+# path and lock operation
+_abandoned_waiters = {}
+_abandoned_waiters_lock = threading.Lock()
+
+
+def _forget_waiter(waiter):
+    with _abandoned_waiters_lock:
+        key = (waiter.file_path, waiter.operation)
+        waiters = _abandoned_waiters.get(key, [])
+        if waiter in waiters:
+            waiters.remove(waiter)
+        if not waiters:
+            _abandoned_waiters.pop(key, None)
+
+
+def _get_waiter(file_path, operation, notify):
+    """Return a started waiter on the lock of file_path, an abandoned one if
+    there is one still waiting on the current file
+    """
+    while True:
+        with _abandoned_waiters_lock:
+            waiters = _abandoned_waiters.get((file_path, operation))
+            waiter = waiters.pop() if waiters else None
+            if not waiters:
+                _abandoned_waiters.pop((file_path, operation), None)
+        if waiter is None:
+            break
+        if waiter.adopt(notify):
+            return waiter
+        # a waiter on a file removed by a takeover stays on its own until it
+        # gets the lock of the removed file
+    waiter = _LockWaiter(file_path, operation, notify)
+    waiter.start()
+    return waiter
+
+
+def _get_lease_path(file_path):
+    return '{0}.{1}'.format(file_path, LEASE_FILE_NAME_EXT)
+
+
+def _is_current(handler, file_path):
+    """Whether the locked file was not removed by a takeover"""
+    try:
+        return os.stat(file_path).st_ino == os.fstat(handler.fileno()).st_ino
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            raise
+        return False
+
+
+def _remove_file(file_path):
+    try:
+        os.remove(file_path)
+    except OSError as err:
+        if err.errno != errno.ENOENT:
+            raise
+
+
+@contextmanager
+def _lease_guard(file_path):
+    """Serialize the changes of the lease of a file lock, it is only held for
+    the time of a file operation
+    """
+    handler = _open_lock_file('{0}.guard'.format(file_path))
+    try:
+        fcntl.flock(handler.fileno(), fcntl.LOCK_EX)
+        yield
+    finally:
+        _unlock_file(handler)
+
+
+def _read_lease(file_path):
+    try:
+        with open(_get_lease_path(file_path), 'r') as handler:
+            return json.load(handler)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def _write_lease(file_path, holder):
+    lease_path = _get_lease_path(file_path)
+    tmp_path = '{0}.{1}'.format(lease_path, holder['id'])
+    with open(tmp_path, 'w') as handler:
+        json.dump(holder, handler)
+    os.rename(tmp_path, lease_path)
+
+
+def new_lease_holder(lease):
+    """Return the identity of the current thread as a lock holder, its lease
+    expires in ``lease`` seconds
+    """
+    now = time.time()
+    return {
+        'id': uuid.uuid4().hex,
+        'host': socket.gethostname(),
+        'pid': os.getpid(),
+        'thread': threading.current_thread().name,
+        'acquired': now,
+        'expires': now + lease,
+    }
+
+
+def get_stale_reason(holder):
+    """Return why the lock holder is stale, None if it is not
+
+    :type holder: dict
+    """
+    if holder['expires'] < time.time():
+        return 'lease expired'
+    if holder['host'] == socket.gethostname():
+        try:
+            os.kill(holder['pid'], 0)
+        except OSError as err:
+            if err.errno == errno.ESRCH:
+                return 'process is dead'
+    return None
+
+
+def log_takeover(lock_name, holder, reason):
+    """Log the takeover of the lock held by a stale holder, and record it in
+    the lock metrics
+    """
+    lock_metrics.takeover(holder)
+    logger.warning(
+        'process id: {0} took over lock {1} held by process id: {2} on host '
+        '{3} (thread {4}) since {5}: {6}'.format(
+            os.getpid(), lock_name, holder['pid'], holder['host'],
+            holder['thread'], time.ctime(holder['acquired']), reason)
+    )
+
+
+class LeaseHeartbeat(threading.Thread):
+    """Renew a lock lease every ``interval`` seconds until stopped, or until
+    ``renew`` returns False because the lease was lost.
+    """
+
+    def __init__(self, renew, interval):
+        super(LeaseHeartbeat, self).__init__(name='lease-heartbeat')
+        self.daemon = True
+        self.renew = renew
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                if not self.renew():
+                    return
+            except Exception as err:
+                logger.warning('failed to renew a lock lease: %s', err)
+
+    def stop(self):
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+
+
+class _FileLease(object):
+    """The lease of a held file lock, written next to the locked file and
+    renewed by a heartbeat
+    """
+
+    def __init__(self, file_path, lease):
+        self.file_path = file_path
+        self.lease = lease
+        self.holder = None
+        self._heartbeat = None
+
+    def start(self):
+        with _lease_guard(self.file_path):
+            previous = _read_lease(self.file_path)
+            if previous is not None:
+                log_takeover(self.file_path, previous, 'lock not released')
+            self.holder = new_lease_holder(self.lease)
+            _write_lease(self.file_path, self.holder)
+        self._heartbeat = LeaseHeartbeat(self.renew, self.lease / 3.0)
+        self._heartbeat.start()
+
+    def _is_held(self):
+        current = _read_lease(self.file_path)
+        return current is not None and current['id'] == self.holder['id']
+
+    def renew(self):
+        with _lease_guard(self.file_path):
+            if not self._is_held():
+                logger.warning(
+                    'process id: {0} lost the lease of lock {1}'.format(
+                        os.getpid(), self.file_path))
+                return False
+            self.holder['expires'] = time.time() + self.lease
+            _write_lease(self.file_path, self.holder)
+        return True
+
+    def stop(self):
+        self._heartbeat.stop()
+        with _lease_guard(self.file_path):
+            if self._is_held():
+                _remove_file(_get_lease_path(self.file_path))
+
+
+def _take_over(file_path):
+    """Remove the locked file and the lease of a stale holder, return
+    whether it was taken over.
+
+    The stale holder keeps the lock of the removed file, the waiters lock the
+    new one.
+    """
+    with _lease_guard(file_path):
+        holder = _read_lease(file_path)
+        reason = None if holder is None else get_stale_reason(holder)
+        if reason is None:
+            return False
+        log_takeover(file_path, holder, reason)
+        _remove_file(file_path)
+        _remove_file(_get_lease_path(file_path))
+    return True
+
+
+def _try_lock_any(file_paths, operation):
+    """Lock the first free file of file_paths without waiting, return its
+    path and opened handler, None if they are all locked
+    """
+    for file_path in file_paths:
+        while True:
+            handler = _open_lock_file(file_path)
+            if not _try_lock(handler, operation):
+                handler.close()
+                break
+            if _is_current(handler, file_path):
+                return file_path, handler
+            _unlock_file(handler)
+    return None
+
+
+def _acquire_file_locks(file_paths, timeout, lease=None,
+                        operation=fcntl.LOCK_EX):
+    """Lock the first released file of file_paths and return its path and
+    opened handler, the lock of a stale holder is taken over when ``lease``
+    is set
+
+    :type file_paths: list
+    :type timeout: int or None
+    :type lease: int or None
+    :raises FunctionLockerTimeoutError: if no lock is acquired in ``timeout``
+        seconds
+    """
+    deadline = None if timeout is None else time.time() + timeout
+    while True:
+        acquired = _try_lock_any(file_paths, operation)
+        if acquired is not None:
+            return acquired
+        notify = threading.Event()
+        waiters = [
+            _get_waiter(file_path, operation, notify)
+            for file_path in file_paths
+        ]
+        try:
+            acquired = _wait_any(waiters, notify, deadline, timeout, lease)
+        finally:
+            for waiter in waiters:
+                if acquired is None or waiter.handler is not acquired[1]:
+                    waiter.abandon()
+        if acquired is not None:
+            return acquired
+
+
+def _wait_any(waiters, notify, deadline, timeout, lease):
+    """Wait for the first waiter acquiring its lock and return its path and
+    handler, None when the files were replaced by a takeover
+    """
+    while True:
+        wait = LEASE_CHECK_INTERVAL if lease else None
+        if deadline is not None:
+            remaining = max(deadline - time.time(), 0)
+            wait = remaining if wait is None else min(wait, remaining)
+        notify.wait(wait)
+        notify.clear()
+        for waiter in waiters:
+            if waiter.acquired():
+                if _is_current(waiter.handler, waiter.file_path):
+                    return waiter.file_path, waiter.handler
+                return None
+        if deadline is not None and time.time() >= deadline:
+            raise FunctionLockerTimeoutError(
+                'lock of file {0} not acquired in {1} seconds'.format(
+                    ', '.join(waiter.file_path for waiter in waiters),
+                    timeout)
+            )
+        for waiter in waiters:
+            if (not _is_current(waiter.handler, waiter.file_path) or
+                    (lease and _take_over(waiter.file_path))):
+                return None
+
+
+@contextmanager
+def _hold_file_lock(file_path, handler, lease):
+    """Hold the lock of the file handler with a lease until exit"""
+    file_lease = None
+    try:
+        if lease:
+            file_lease = _FileLease(file_path, lease)
+            file_lease.start()
+        yield handler
+    finally:
+        if file_lease is not None:
+            file_lease.stop()
+        _unlock_file(handler)
+
+
+@contextmanager
+def file_lock(file_path, timeout=LOCK_DEFAULT_TIMEOUT,
+              lease=LOCK_DEFAULT_LEASE, shared=False):
+    """Exclusively lock a file across processes and threads and yield its
+    opened handler, the file is not removed on release.
+
+    While the lock is held its lease is renewed by a heartbeat thread, the
+    waiters take over the lock when the lease expires or when the holder
+    process on the same host is dead.
+
+    :type file_path: str
+    :type timeout: int or None
+    :type lease: int or None
+    :type shared: bool
+
+    :param file_path: the path of the file to lock
+    :param timeout: the time in seconds to wait for acquiring the lock, wait
+           forever if None
+    :param lease: the time in seconds after which the lock of a holder not
+           renewing it can be taken over, no lease if None
+    :param shared: whether to share the lock with the other shared holders,
+           the shared holders have no lease but still take over the lock of
+           a stale exclusive holder
+    """
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    with lock_metrics.measure(file_path, 'shared' if shared else 'lock',
+                              _TIMEOUT_ERRORS) as measurement:
+        file_path, handler = _acquire_file_locks(
+            [file_path], timeout, lease, operation)
+        measurement.acquired()
+        with _hold_file_lock(
+                file_path, handler, None if shared else lease) as handler:
+            yield handler
+
+
+@contextmanager
+def file_semaphore(file_paths, timeout=LOCK_DEFAULT_TIMEOUT,
+                   lease=LOCK_DEFAULT_LEASE, name=None):
+    """Lock one of the files of file_paths, so that as many holders as files
+    run at the same time, and yield its opened handler.
+
+    :type file_paths: list
+    :type timeout: int or None
+    :type lease: int or None
+    :type name: str
+
+    :param name: the name of the semaphore in the lock metrics, the first
+           file path if None
+    """
+    with lock_metrics.measure(name or file_paths[0], 'semaphore',
+                              _TIMEOUT_ERRORS) as measurement:
+        file_path, handler = _acquire_file_locks(file_paths, timeout, lease)
+        measurement.acquired()
+        with _hold_file_lock(file_path, handler, lease) as handler:
+            yield handler
+
+
+@contextmanager
+def file_rw_lock(file_path, mode, timeout=LOCK_DEFAULT_TIMEOUT,
+                 lease=LOCK_DEFAULT_LEASE):
+    """Lock a file for reading, shared with the other readers, or for
+    writing, exclusively, and yield its opened handler.
+
+    A writer waits in a gate that the new readers pass through, so the
+    writers are not starved by a continuous flow of readers.
+
+    :type file_path: str
+    :type mode: str
+    :type timeout: int or None
+    :type lease: int or None
+    """
+    if mode not in RW_LOCK_MODES:
+        raise FunctionLockerError(
+            'rw lock mode must be one of {0}, got {1}'.format(
+                RW_LOCK_MODES, mode))
+    deadline = None if timeout is None else time.time() + timeout
+    with lock_metrics.measure(file_path, mode,
+                              _TIMEOUT_ERRORS) as measurement:
+        _, gate_handler = _acquire_file_locks(
+            ['{0}.gate'.format(file_path)], timeout)
+        try:
+            remaining = None if deadline is None else deadline - time.time()
+            file_path, handler = _acquire_file_locks(
+                [file_path], remaining, lease,
+                fcntl.LOCK_SH if mode == RW_LOCK_READ else fcntl.LOCK_EX)
+        finally:
+            _unlock_file(gate_handler)
+        measurement.acquired()
+        lease = lease if mode == RW_LOCK_WRITE else None
+        with _hold_file_lock(file_path, handler, lease) as handler:
+            yield handler
+
+
 def _check_deadlock(lock_file_path, process_id):
     """To prevent process deadlock, raise exception if the file content is the
     same as process_id
@@ -201,7 +778,8 @@ def _write_content(handler, content):
 
 
 def lock_function(function=None, scope=_get_default_scope, scope_context=None,
-                  scope_kwargs=None, timeout=LOCK_DEFAULT_TIMEOUT):
+                  scope_kwargs=None, timeout=LOCK_DEFAULT_TIMEOUT,
+                  lease=LOCK_DEFAULT_LEASE):
     """Generic function locker, lock any decorated function. Any parallel
      pytest xdist worker will wait for this function to finish
 
@@ -210,6 +788,7 @@ def lock_function(function=None, scope=_get_default_scope, scope_context=None,
     :type scope_kwargs: dict
     :type scope_context: str
     :type timeout: int
+    :type lease: int
 
     :param function: the function that is intended to be locked
     :param scope: this parameter will define the namespace of locking
@@ -217,18 +796,10 @@ def lock_function(function=None, scope=_get_default_scope, scope_context=None,
            lock in combination with scope and function.
     :param scope_kwargs: kwargs to be passed to scope if is a callable
     :param timeout: the time in seconds to wait for acquiring the lock
+    :param lease: the time in seconds after which the lock of a holder not
+           renewing it can be taken over
     """
-    class_names = []
-    class_name = None
-    index = 1
-    while class_name != '<module>' and index <= _DEFAULT_CLASS_NAME_DEPTH:
-        if class_name:
-            class_names.append(class_name)
-        class_name = inspect.getouterframes(inspect.currentframe())[index][3]
-        index += 1
-
-    class_names.reverse()
-    class_name = '.'.join(class_names)
+    class_name = _get_caller_class_name()
 
     def main_wrapper(func):
 
@@ -249,8 +820,8 @@ def lock_function(function=None, scope=_get_default_scope, scope_context=None,
             # check if the same process is trying to acquire the lock
             _check_deadlock(lock_file_path, process_id)
 
-            with file_lock(lock_file_path, remove=False,
-                           timeout=timeout) as handler:
+            with file_lock(lock_file_path, timeout=timeout,
+                           lease=lease) as handler:
                 logger.info(
                     'process id: {0} lock function using file path: {1}'
                     .format(process_id, lock_file_path)
@@ -279,7 +850,8 @@ def lock_function(function=None, scope=_get_default_scope, scope_context=None,
 
 @contextmanager
 def locking_function(function, scope=_get_default_scope, scope_context=None,
-                     scope_kwargs=None, timeout=LOCK_DEFAULT_TIMEOUT):
+                     scope_kwargs=None, timeout=LOCK_DEFAULT_TIMEOUT,
+                     lease=LOCK_DEFAULT_LEASE):
     """Lock a function in combination with a scope and scope_context.
     Any parallel pytest xdist worker will wait for this function to finish.
 
@@ -288,6 +860,7 @@ def locking_function(function, scope=_get_default_scope, scope_context=None,
     :type scope_kwargs: dict
     :type scope_context: str
     :type timeout: int
+    :type lease: int
 
     :param function: the function that is intended to be locked
     :param scope: this parameter will define the namespace of locking
@@ -295,6 +868,8 @@ def locking_function(function, scope=_get_default_scope, scope_context=None,
            lock in combination with scope and function.
     :param scope_kwargs: kwargs to be passed to scope if is a callable
     :param timeout: the time in seconds to wait for acquiring the lock
+    :param lease: the time in seconds after which the lock of a holder not
+           renewing it can be taken over
     """
     if not getattr(function, '__function_locked__', False):
         raise FunctionLockerError(
@@ -312,7 +887,7 @@ def locking_function(function, scope=_get_default_scope, scope_context=None,
     # check if the same process is trying to acquire the lock
     _check_deadlock(lock_file_path, process_id)
 
-    with file_lock(lock_file_path, remove=False, timeout=timeout) as handler:
+    with file_lock(lock_file_path, timeout=timeout, lease=lease) as handler:
         logger.info(
             'process id: {0} - lock function name:{1}  - using file path: {2}'
             .format(process_id, function_name, lock_file_path)
@@ -325,3 +900,195 @@ def locking_function(function, scope=_get_default_scope, scope_context=None,
         finally:
             # clear the file
             _write_content(handler, None)
+
+
+def _get_storage_handler(storage, scope_path, timeout, lease):
+    """Return a shared function storage handler of the locks of scope_path,
+    and the key prefix of the locks
+    """
+    # the shared function storage handlers import this module
+    if storage == 'file':
+        from robottelo.decorators.func_shared.file_storage import (
+            FileStorageHandler)
+        return FileStorageHandler(
+            root_dir=scope_path, lock_timeout=timeout, lock_lease=lease), ''
+    if storage == 'redis':
+        from robottelo.decorators.func_shared.redis_storage import (
+            RedisStorageHandler)
+        handler = RedisStorageHandler(
+            host=settings.shared_function.redis_host,
+            port=settings.shared_function.redis_port,
+            db=settings.shared_function.redis_db,
+            password=settings.shared_function.redis_password,
+            lock_timeout=timeout,
+            lock_lease=lease,
+        )
+        relative_path = os.path.relpath(
+            scope_path, _get_temp_lock_function_dir(create=False))
+        return handler, '{0}.{1}.'.format(
+            TEMP_FUNC_LOCK_DIR, relative_path.replace(os.sep, '.'))
+    raise FunctionLockerError(
+        'lock storage must be one of {0}, got {1}'.format(
+            LOCK_STORAGES, storage))
+
+
+class _FunctionSharedLock(object):
+    """A lock held by several holders at the same time, usable as a context
+    manager or as a function decorator.
+
+    The lock is named after ``function`` if given, else after the decorated
+    function when there is no scope_context, else after the scope and the
+    scope_context only, so that different functions can share it.
+    """
+
+    def __init__(self, kind, get_lock, function, scope, scope_context,
+                 scope_kwargs, timeout, lease, storage, class_name):
+        self.kind = kind
+        self.get_lock = get_lock
+        self.function = function
+        self.scope = scope
+        self.scope_context = scope_context
+        self.scope_kwargs = scope_kwargs
+        self.timeout = timeout
+        self.lease = lease
+        self.storage = storage
+        self.class_name = class_name
+        self._local = threading.local()
+
+    def _lock(self, function=None):
+        """Return a new context manager of the lock"""
+        function = self.function or function
+        storage = self.storage or LOCK_DEFAULT_STORAGE
+        scope_path = _get_scope_path(
+            self.scope,
+            scope_kwargs=self.scope_kwargs,
+            scope_context=self.scope_context,
+            create=storage == 'file'
+        )
+        if function is None:
+            name = self.kind
+        else:
+            name = '{0}.{1}'.format(
+                _get_function_name(
+                    function,
+                    class_name=getattr(function, '__class_name__', None)),
+                self.kind
+            )
+        handler, prefix = _get_storage_handler(
+            storage, scope_path, self.timeout, self.lease)
+        return self.get_lock(handler, prefix + name)
+
+    def __enter__(self):
+        lock = self._lock()
+        result = lock.__enter__()
+        self._local.__dict__.setdefault('locks', []).append(lock)
+        return result
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return self._local.locks.pop().__exit__(
+            exc_type, exc_value, traceback)
+
+    def __call__(self, func):
+        setattr(func, '__class_name__', self.class_name)
+        bound_function = None if self.scope_context else func
+
+        @functools.wraps(func)
+        def function_wrapper(*args, **kwargs):
+            with self._lock(bound_function):
+                return func(*args, **kwargs)
+
+        return function_wrapper
+
+
+def semaphore_function(function=None, n=1, scope=_get_default_scope,
+                       scope_context=None, scope_kwargs=None,
+                       timeout=LOCK_DEFAULT_TIMEOUT, lease=LOCK_DEFAULT_LEASE,
+                       storage=None):
+    """Counting semaphore, at most n pytest xdist workers hold it at the same
+    time. Usable as a decorator or as a context manager::
+
+        @semaphore_function(n=4, scope_context='manifest_import')
+        def import_manifest(org):
+            pass
+
+        with semaphore_function(get_available_capsule_port, n=10):
+            pass
+
+    :type function: callable
+    :type n: int
+    :type scope: str or callable
+    :type scope_kwargs: dict
+    :type scope_context: str
+    :type timeout: int
+    :type lease: int
+    :type storage: str
+
+    :param function: the function the semaphore is named after, see
+           :class:`_FunctionSharedLock` for the naming rules
+    :param n: the number of holders at the same time
+    :param scope: this parameter will define the namespace of locking
+    :param scope_context: an added context string if applicable, of a concrete
+           lock in combination with scope and function.
+    :param scope_kwargs: kwargs to be passed to scope if is a callable
+    :param timeout: the time in seconds to wait for acquiring the semaphore
+    :param lease: the time in seconds after which the slot of a holder not
+           renewing it can be taken over
+    :param storage: the storage of the semaphore, file or redis, see
+           :func:`set_default_storage`
+    """
+    if n < 1:
+        raise FunctionLockerError(
+            'semaphore size must be at least 1, got {0}'.format(n))
+    return _FunctionSharedLock(
+        'semaphore', lambda handler, key: handler.semaphore(key, n),
+        function, scope, scope_context, scope_kwargs, timeout, lease,
+        storage, _get_caller_class_name()
+    )
+
+
+def rw_lock(function=None, mode=RW_LOCK_WRITE, scope=_get_default_scope,
+            scope_context=None, scope_kwargs=None,
+            timeout=LOCK_DEFAULT_TIMEOUT, lease=LOCK_DEFAULT_LEASE,
+            storage=None):
+    """Reader/writer lock, the readers hold it at the same time, a writer
+    holds it alone. Usable as a decorator or as a context manager::
+
+        @rw_lock(mode='read', scope_context='puppet_classes')
+        def test_positive_read(self):
+            pass
+
+        @rw_lock(mode='write', scope_context='puppet_classes')
+        def test_positive_import(self):
+            pass
+
+    :type function: callable
+    :type mode: str
+    :type scope: str or callable
+    :type scope_kwargs: dict
+    :type scope_context: str
+    :type timeout: int
+    :type lease: int
+    :type storage: str
+
+    :param function: the function the lock is named after, see
+           :class:`_FunctionSharedLock` for the naming rules
+    :param mode: read or write
+    :param scope: this parameter will define the namespace of locking
+    :param scope_context: an added context string if applicable, of a concrete
+           lock in combination with scope and function.
+    :param scope_kwargs: kwargs to be passed to scope if is a callable
+    :param timeout: the time in seconds to wait for acquiring the lock
+    :param lease: the time in seconds after which the lock of a writer not
+           renewing it can be taken over
+    :param storage: the storage of the lock, file or redis, see
+           :func:`set_default_storage`
+    """
+    if mode not in RW_LOCK_MODES:
+        raise FunctionLockerError(
+            'rw lock mode must be one of {0}, got {1}'.format(
+                RW_LOCK_MODES, mode))
+    return _FunctionSharedLock(
+        'rw_lock', lambda handler, key: handler.rw_lock(key, mode),
+        function, scope, scope_context, scope_kwargs, timeout, lease,
+        storage, _get_caller_class_name()
+    )
@@ -16,6 +16,18 @@ class BaseStorageHandler(object):
         """Return the storage locker context manager"""
         raise NotImplementedError
 
+    def semaphore(self, key, n):
+        """Return a context manager holding one of the n slots of the
+        semaphore key
+        """
+        raise NotImplementedError
+
+    def rw_lock(self, key, mode):
+        """Return a context manager holding the key lock for reading, shared
+        with the other readers, or for writing, exclusively
+        """
+        raise NotImplementedError
+
     def when_lock_acquired(self, data):
         """called when the lock is acquired to do some added action"""
         raise NotImplementedError
@@ -24,6 +36,13 @@ class BaseStorageHandler(object):
         """Return the key value"""
         raise NotImplementedError
 
-    def set(self, key, value):
-        """Write the value of key to storage"""
+    def get_version(self, key):
+        """Return the version written with the key value, or None if there is
+        no value or it was written without version. Reading it does not take
+        the key lock and is cheaper than reading the value.
+        """
+        raise NotImplementedError
+
+    def set(self, key, value, version=None):
+        """Write the value of key to storage, with its version if not None"""
         raise NotImplementedError
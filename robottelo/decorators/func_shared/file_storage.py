@@ -3,9 +3,12 @@ import logging
 import os
 import tempfile
 
-from pytest_services.locks import file_lock
-
 from robottelo.config import settings
+from robottelo.decorators.func_locker import (
+    file_lock,
+    file_rw_lock,
+    file_semaphore,
+)
 from robottelo.decorators.func_shared.base import BaseStorageHandler
 
 TEMP_ROOT_DIR = 'robottelo'
@@ -15,6 +18,7 @@ SHARED_DIR = None
 logger = logging.getLogger(__name__)
 
 LOCK_TIMEOUT = 7200
+LOCK_LEASE = 60
 
 
 def get_temp_dir():
@@ -48,7 +52,8 @@ def _get_root_dir(create=True):
 class FileStorageHandler(BaseStorageHandler):
     """Key value file storage handler."""
 
-    def __init__(self, root_dir=None, create=True, lock_timeout=LOCK_TIMEOUT):
+    def __init__(self, root_dir=None, create=True, lock_timeout=LOCK_TIMEOUT,
+                 lock_lease=None):
 
         if root_dir is None:
             root_dir = _get_root_dir()
@@ -56,7 +61,11 @@ class FileStorageHandler(BaseStorageHandler):
         if create and not os.path.exists(root_dir):
             os.makedirs(root_dir)
 
+        if lock_lease is None:
+            lock_lease = LOCK_LEASE
+
         self._lock_timeout = lock_timeout
+        self._lock_lease = lock_lease
         self._root_dir = root_dir
 
     @property
@@ -66,11 +75,30 @@ class FileStorageHandler(BaseStorageHandler):
     def get_key_file_path(self, key):
         return os.path.join(self._root_dir, key)
 
+    def get_version_file_path(self, key):
+        return self.get_key_file_path('{}.version'.format(key))
+
     def lock(self, key):
         """Return the storage locker context manager"""
         lock_key = '{}.lock'.format(key)
-        return file_lock(self.get_key_file_path(lock_key), remove=False,
-                         timeout=self._lock_timeout)
+        return file_lock(self.get_key_file_path(lock_key),
+                         timeout=self._lock_timeout, lease=self._lock_lease)
+
+    def semaphore(self, key, n):
+        """Return the storage semaphore context manager"""
+        return file_semaphore(
+            [self.get_key_file_path('{0}.{1}.lock'.format(key, index))
+             for index in range(n)],
+            timeout=self._lock_timeout,
+            lease=self._lock_lease,
+            name=self.get_key_file_path('{}.semaphore'.format(key))
+        )
+
+    def rw_lock(self, key, mode):
+        """Return the storage reader/writer locker context manager"""
+        return file_rw_lock(self.get_key_file_path('{}.rwlock'.format(key)),
+                            mode, timeout=self._lock_timeout,
+                            lease=self._lock_lease)
 
     def when_lock_acquired(self, handler):
         """Write the process id to file handler"""
@@ -93,13 +121,42 @@ class FileStorageHandler(BaseStorageHandler):
             value = self.decode(value)
         return value
 
-    def set(self, key, value):
+    def get_version(self, key):
+        """Return the version written with the key value
+
+        :type key: str
+        """
+        if not os.path.exists(self.get_key_file_path(key)):
+            return None
+        try:
+            with open(self.get_version_file_path(key), 'r') as file_handler:
+                version = file_handler.read()
+        except IOError:
+            return None
+        try:
+            return self.decode(version)
+        except ValueError:
+            # the version is being written
+            return None
+
+    def set(self, key, value, version=None):
         """Write the value of key
 
         :type key: str
         :type value: object
+        :param version: json compatible version of value, or None
         """
         value = self.encode(value)
         key_file_path = self.get_key_file_path(key)
+        version_file_path = self.get_version_file_path(key)
+        # the previous version is removed first, it is never read with the
+        # new value
+        try:
+            os.remove(version_file_path)
+        except OSError:
+            pass
         with open(key_file_path, 'w') as file_handler:
             file_handler.write(value)
+        if version is not None:
+            with open(version_file_path, 'w') as file_handler:
+                file_handler.write(self.encode(version))
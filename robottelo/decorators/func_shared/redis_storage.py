@@ -1,9 +1,25 @@
 # -*- encoding: utf-8 -*-
+import logging
+import sys
+import time
+
 try:
     import redis
 except ImportError:
     redis = None
 
+from robottelo import lock_metrics
+from robottelo.decorators.func_locker import (
+    FunctionLockerError,
+    FunctionLockerTimeoutError,
+    get_stale_reason,
+    LEASE_CHECK_INTERVAL,
+    LeaseHeartbeat,
+    log_takeover,
+    new_lease_holder,
+    RW_LOCK_MODES,
+    RW_LOCK_READ,
+)
 from robottelo.decorators.func_shared.base import BaseStorageHandler
 
 REDIS_HOST = 'localhost'
@@ -11,15 +27,268 @@ REDIS_PORT = 6379
 REDIS_DB = 0
 REDIS_PASSWORD = None
 LOCK_TIMEOUT = 7200
+LOCK_LEASE = 60
+# the semaphores waiters poll redis, like the redis locks do
+SEMAPHORE_POLL_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
+
+
+class _MeasuredLock(object):
+    """Base of the redis locks context managers, their acquisitions are
+    measured in the lock metrics
+    """
+
+    kind = 'lock'
+
+    def _acquire(self):
+        raise NotImplementedError
+
+    def _release(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        self._measure = lock_metrics.measure(
+            self.name, self.kind,
+            (redis.exceptions.LockError, FunctionLockerTimeoutError))
+        measurement = self._measure.__enter__()
+        try:
+            self._acquire()
+        except Exception:
+            if not self._measure.__exit__(*sys.exc_info()):
+                raise
+        measurement.acquired()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self._release()
+        finally:
+            self._measure.__exit__(exc_type, exc_value, traceback)
+
+
+class _LeasedLock(_MeasuredLock):
+    """Redis lock context manager with a lease.
+
+    The lock key expires with the lease, it is renewed by a heartbeat while
+    held, and the holder identity is written to an other key. A waiter takes
+    over the lock of a dead holder process of the same host, and logs the
+    takeover of a lock not released by its holder.
+    """
+
+    def __init__(self, client, name, timeout, lease):
+        self.client = client
+        self.name = name
+        self.timeout = timeout
+        self.lease = lease
+        self.holder_key = '{0}.holder'.format(name)
+        self.holder = None
+        self._lock = client.lock(name, timeout=lease)
+        self._heartbeat = None
+
+    def _get_holder(self):
+        value = self.client.get(self.holder_key)
+        if value is not None:
+            value = BaseStorageHandler.decode(value)
+        return value
+
+    def _set_holder(self):
+        self.client.set(
+            self.holder_key, BaseStorageHandler.encode(self.holder))
+
+    def _take_over(self):
+        """Delete the lock of a dead holder, return whether taken over"""
+        holder = self._get_holder()
+        reason = None if holder is None else get_stale_reason(holder)
+        if reason is None:
+            return False
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.name)
+                if pipe.get(self.name) != holder['token'].encode('utf-8'):
+                    return False
+                pipe.multi()
+                pipe.delete(self.name, self.holder_key)
+                pipe.execute()
+            except redis.WatchError:
+                return False
+        log_takeover(self.name, holder, reason)
+        return True
+
+    def renew(self):
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(self.name)
+                if pipe.get(self.name) != self._lock.local.token:
+                    logger.warning(
+                        'lost the lease of lock {0}'.format(self.name))
+                    return False
+                pipe.multi()
+                pipe.pexpire(self.name, int(self.lease * 1000))
+                pipe.execute()
+            except redis.WatchError:
+                return False
+        self.holder['expires'] = time.time() + self.lease
+        self._set_holder()
+        return True
+
+    def _acquire(self):
+        deadline = time.time() + self.timeout
+        while True:
+            remaining = max(deadline - time.time(), 0)
+            if self._lock.acquire(
+                    blocking_timeout=min(LEASE_CHECK_INTERVAL, remaining)):
+                break
+            if remaining <= 0:
+                raise redis.exceptions.LockError(
+                    'Unable to acquire lock {0} within {1} seconds'.format(
+                        self.name, self.timeout))
+            self._take_over()
+        previous = self._get_holder()
+        if previous is not None:
+            log_takeover(self.name, previous, 'lock not released')
+        self.holder = new_lease_holder(self.lease)
+        self.holder['token'] = self._lock.local.token.decode('utf-8')
+        self._set_holder()
+        self._heartbeat = LeaseHeartbeat(self.renew, self.lease / 3.0)
+        self._heartbeat.start()
+
+    def _release(self):
+        self._heartbeat.stop()
+        if self._get_holder() == self.holder:
+            self.client.delete(self.holder_key)
+        try:
+            self._lock.release()
+        except redis.exceptions.LockError as err:
+            logger.warning(
+                'lock {0} was not held anymore: {1}'.format(self.name, err))
+
+
+class _Semaphore(_MeasuredLock):
+    """Redis counting semaphore context manager, at most ``n`` holders, or
+    unlimited if None.
+
+    The holders identities and lease expiries are kept in a hash, the leases
+    are renewed by a heartbeat while held. The waiters remove the holders of
+    an expired lease or of a dead process of the same host. A holder is not
+    admitted while the ``blocked_by`` semaphore has holders, and waits after
+    admission until the ``drain`` semaphore has no holder anymore, which
+    makes the reader/writer locks.
+    """
+
+    def __init__(self, client, name, n, timeout, lease, blocked_by=None,
+                 drain=None, kind='semaphore'):
+        self.kind = kind
+        self.client = client
+        self.name = name
+        self.n = n
+        self.timeout = timeout
+        self.lease = lease
+        self.blocked_by = blocked_by
+        self.drain = drain
+        self.holder = None
+        self._heartbeat = None
+
+    @staticmethod
+    def _get_holders_key(name):
+        return '{0}.holders'.format(name)
+
+    def _purge(self, name):
+        """Remove the stale holders of the semaphore name"""
+        holders_key = self._get_holders_key(name)
+        for token, value in self.client.hgetall(holders_key).items():
+            holder = BaseStorageHandler.decode(value)
+            reason = get_stale_reason(holder)
+            if reason is not None and self.client.hdel(holders_key, token):
+                log_takeover(name, holder, reason)
+
+    def _count(self, name):
+        self._purge(name)
+        return self.client.hlen(self._get_holders_key(name))
+
+    def _try_acquire(self):
+        holders_key = self._get_holders_key(self.name)
+        watched = [holders_key]
+        self._purge(self.name)
+        if self.blocked_by is not None:
+            self._purge(self.blocked_by)
+            watched.append(self._get_holders_key(self.blocked_by))
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(*watched)
+                if self.n is not None and pipe.hlen(holders_key) >= self.n:
+                    return False
+                if len(watched) > 1 and pipe.hlen(watched[1]):
+                    return False
+                self.holder = new_lease_holder(self.lease)
+                pipe.multi()
+                pipe.hset(holders_key, self.holder['id'],
+                          BaseStorageHandler.encode(self.holder))
+                pipe.execute()
+            except redis.WatchError:
+                return False
+        return True
+
+    def _wait(self, deadline, condition):
+        """Poll until condition returns True, return False on timeout"""
+        while not condition():
+            if time.time() >= deadline:
+                return False
+            time.sleep(SEMAPHORE_POLL_INTERVAL)
+        return True
+
+    def renew(self):
+        holders_key = self._get_holders_key(self.name)
+        with self.client.pipeline() as pipe:
+            try:
+                pipe.watch(holders_key)
+                if not pipe.hexists(holders_key, self.holder['id']):
+                    logger.warning(
+                        'lost the lease of semaphore {0}'.format(self.name))
+                    return False
+                self.holder['expires'] = time.time() + self.lease
+                pipe.multi()
+                pipe.hset(holders_key, self.holder['id'],
+                          BaseStorageHandler.encode(self.holder))
+                pipe.execute()
+            except redis.WatchError:
+                # retried at the next heartbeat
+                pass
+        return True
+
+    def _release(self):
+        if self._heartbeat is not None:
+            self._heartbeat.stop()
+        self.client.hdel(self._get_holders_key(self.name), self.holder['id'])
+
+    def _acquire(self):
+        deadline = time.time() + self.timeout
+        if not self._wait(deadline, self._try_acquire):
+            raise FunctionLockerTimeoutError(
+                'Unable to acquire semaphore {0} within {1} seconds'.format(
+                    self.name, self.timeout))
+        self._heartbeat = LeaseHeartbeat(self.renew, self.lease / 3.0)
+        self._heartbeat.start()
+        if self.drain is not None and not self._wait(
+                deadline, lambda: not self._count(self.drain)):
+            self._release()
+            raise FunctionLockerTimeoutError(
+                'Semaphore {0} not drained within {1} seconds'.format(
+                    self.drain, self.timeout))
 
 
 class RedisStorageHandler(BaseStorageHandler):
     """Redis Key value storage handler"""
 
     def __init__(self, host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB,
-                 password=REDIS_PASSWORD, lock_timeout=LOCK_TIMEOUT):
+                 password=REDIS_PASSWORD, lock_timeout=LOCK_TIMEOUT,
+                 lock_lease=None):
+
+        if lock_lease is None:
+            lock_lease = LOCK_LEASE
 
         self._lock_timeout = lock_timeout
+        self._lock_lease = lock_lease
         self._client = redis.StrictRedis(
             host=host, port=port, db=db, password=password)
 
@@ -33,9 +302,31 @@ class RedisStorageHandler(BaseStorageHandler):
             timeout = self._lock_timeout
 
         lock_key = '{}.lock'.format(key)
-        # If acquired the lock will be acquired until release
-        return self.client.lock(
-            lock_key, timeout=None, blocking_timeout=timeout)
+        # If acquired the lock will be acquired until release, or until its
+        # lease expires
+        return _LeasedLock(self.client, lock_key, timeout, self._lock_lease)
+
+    def semaphore(self, key, n):
+        """Return the storage semaphore context manager"""
+        return _Semaphore(self.client, '{}.semaphore'.format(key), n,
+                          self._lock_timeout, self._lock_lease)
+
+    def rw_lock(self, key, mode):
+        """Return the storage reader/writer locker context manager"""
+        if mode not in RW_LOCK_MODES:
+            raise FunctionLockerError(
+                'rw lock mode must be one of {0}, got {1}'.format(
+                    RW_LOCK_MODES, mode))
+        readers = '{}.readers'.format(key)
+        writers = '{}.writers'.format(key)
+        if mode == RW_LOCK_READ:
+            return _Semaphore(self.client, readers, None, self._lock_timeout,
+                              self._lock_lease, blocked_by=writers,
+                              kind=mode)
+        # the waiting writer is admitted first, so that no new reader is
+        # admitted while it waits for the readers to finish
+        return _Semaphore(self.client, writers, 1, self._lock_timeout,
+                          self._lock_lease, drain=readers, kind=mode)
 
     def when_lock_acquired(self, lock_object):
         # do nothing
@@ -51,11 +342,35 @@ class RedisStorageHandler(BaseStorageHandler):
             value = self.decode(value)
         return value
 
-    def set(self, key, value):
-        """Write the value of key
+    @staticmethod
+    def _get_version_key(key):
+        return '{}.version'.format(key)
+
+    def get_version(self, key):
+        """Return the version written with the key value
+
+        :type key: str
+        """
+        with self.client.pipeline() as pipe:
+            pipe.exists(key)
+            pipe.get(self._get_version_key(key))
+            exists, version = pipe.execute()
+        if not exists or version is None:
+            return None
+        return self.decode(version)
+
+    def set(self, key, value, version=None):
+        """Write the value of key, the value and its version are written in
+        the same transaction
 
         :type key: str
         :type value: object
+        :param version: json compatible version of value, or None
         """
-        value = self.encode(value)
-        self.client.set(key, value)
+        with self.client.pipeline() as pipe:
+            pipe.set(key, self.encode(value))
+            if version is None:
+                pipe.delete(self._get_version_key(key))
+            else:
+                pipe.set(self._get_version_key(key), self.encode(version))
+            pipe.execute()
@@ -84,7 +84,13 @@ Usage::
             # create a virtual machine
 
             return dict(org=cls.org, repo=cls.repo}
+
+Each process keeps the ready results it has read from or written to the
+storage in a cache of at most ``CACHE_SIZE`` entries, the next calls of the
+shared function return a copy of the cached result without locking and
+reading the storage, until the result expires.
 """
+import copy
 import datetime
 import functools
 import hashlib
@@ -93,9 +99,12 @@ import inspect
 import logging
 import os
 import sys
+import threading
 import traceback
 import uuid
 
+from collections import OrderedDict
+
 from nailgun.entities import Entity
 
 from robottelo.config import settings
@@ -119,6 +128,8 @@ NAMESPACE_SCOPE = None
 # after 24 hours the shared function data will became not valid
 SHARE_DEFAULT_TIMEOUT = 86400
 DEFAULT_CALL_RETRIES = 2
+# the maximum number of results cached by each process, 0 disables the cache
+CACHE_SIZE = 256
 
 _configured = False
 
@@ -145,14 +156,18 @@ def _check_config():
     global NAMESPACE_SCOPE
     global SHARE_DEFAULT_TIMEOUT
     global DEFAULT_CALL_RETRIES
+    global CACHE_SIZE
     if not _configured and setting_is_set('shared_function'):
         DEFAULT_STORAGE_HANDLER = settings.shared_function.storage
         ENABLED = settings.shared_function.enabled
         NAMESPACE_SCOPE = settings.shared_function.scope
         SHARE_DEFAULT_TIMEOUT = settings.shared_function.share_timeout
         DEFAULT_CALL_RETRIES = settings.shared_function.call_retries
+        CACHE_SIZE = settings.shared_function.cache_size
         file_storage.LOCK_TIMEOUT = settings.shared_function.lock_timeout
         redis_storage.LOCK_TIMEOUT = settings.shared_function.lock_timeout
+        file_storage.LOCK_LEASE = settings.shared_function.lock_lease
+        redis_storage.LOCK_LEASE = settings.shared_function.lock_lease
         redis_storage.REDIS_HOST = settings.shared_function.redis_host
         redis_storage.REDIS_PORT = settings.shared_function.redis_port
         redis_storage.REDIS_DB = settings.shared_function.redis_db
@@ -207,6 +222,88 @@ class SharedFunctionException(Exception):
    """
 
 
+class _ResultCache(object):
+    """Per process cache of the ready shared function results, an entry is
+    kept by function key and transaction with the creation datetime of the
+    stored value it was read from. An entry is only returned while the
+    version of the stored value, read without taking the storage lock, is
+    still the one of the entry.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version, has_expired):
+        """Return the entry of key matching the stored ``version``, or None
+        if there is no such entry or if ``has_expired`` of the entry creation
+        datetime
+        """
+        if version is None:
+            return None
+        entry_key = (key, version['id'])
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is None:
+                return None
+            if entry['version'] != version:
+                del self._entries[entry_key]
+                return None
+            if has_expired(entry['creation_datetime']):
+                del self._entries[entry_key]
+                return None
+            self._entries.move_to_end(entry_key)
+            return entry
+
+    def update(self, key, value):
+        """Cache the stored value of key if it is ready, and drop the entries
+        of the other values of key
+        """
+        version = _get_version(value)
+        entry_key = (key, version['id'])
+        with self._lock:
+            for other_key in [other_key for other_key in self._entries
+                              if other_key[0] == key
+                              and other_key != entry_key]:
+                del self._entries[other_key]
+            if CACHE_SIZE <= 0 or value['state'] != _STATE_READY:
+                self._entries.pop(entry_key, None)
+                return
+            entry = self._entries.get(entry_key)
+            if entry is None or entry['version'] != version:
+                entry = dict(
+                    version=version,
+                    creation_datetime=_parse_creation_datetime(value),
+                    result=copy.deepcopy(value['result']),
+                )
+                self._entries[entry_key] = entry
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_result_cache = _ResultCache()
+
+
+def clear_cache():
+    """Drop the shared function results cached by this process"""
+    _result_cache.clear()
+
+
+def _parse_creation_datetime(value):
+    return datetime.datetime.strptime(
+        value['creation_datetime'], _DATETIME_FORMAT)
+
+
+def _get_version(value):
+    """Return the version of a stored value, written with it to storage"""
+    return dict(id=value['id'], creation_datetime=value['creation_datetime'])
+
+
 class _SharedFunction(object):
     """Internal class helper that is created each time the shared function is
     launched and group all the necessary functionality
@@ -300,7 +397,29 @@ class _SharedFunction(object):
 
         return False
 
+    def _inject_result(self, result):
+        """Recall the function with the result as kwargs"""
+        # note: to be able to use this functionality the result must be a
+        # dict
+        if self._injected_kw:
+            # update the kwargs with a kw to notify the function that the
+            # kwargs are injected from saved data
+            result[self._injected_kw] = True
+        # the function may modify the result
+        return self._function(*self._function_args, **result)
+
     def __call__(self):
+        entry = None
+        if CACHE_SIZE > 0:
+            entry = _result_cache.get(
+                self.key, self.storage.get_version(self.key),
+                self._has_result_expired)
+        if entry is not None:
+            # the cached result is a copy, that the caller may modify
+            result = copy.deepcopy(entry['result'])
+            if self._inject:
+                return self._inject_result(result)
+            return result
         # this lock prevent any other process to run the function,
         # and if an other process is running the function, I should wait it
         # to finish
@@ -324,8 +443,7 @@ class _SharedFunction(object):
                 traceback_text = value.get('traceback', '')
                 error_class_name = value.get('error_class_name')
                 pid = value['pid']
-                creation_datetime = datetime.datetime.strptime(
-                    value['creation_datetime'], _DATETIME_FORMAT)
+                creation_datetime = _parse_creation_datetime(value)
 
                 if (state in [_STATE_READY, _STATE_FAILED]
                         and not self._has_result_expired(creation_datetime)):
@@ -360,7 +478,8 @@ class _SharedFunction(object):
                                  pid=os.getpid(),
                                  creation_datetime=creation_datetime
                                  )
-                self.storage.set(self.key, value)
+                self.storage.set(self.key, value, _get_version(value))
+            _result_cache.update(self.key, value)
 
         if call_function and exp:
             # i'am in the first launched process
@@ -403,15 +522,7 @@ class _SharedFunction(object):
             )
 
         if not call_function and self._inject:
-            # note: to be able to use this functionality the result must be a
-            # dict
-            if self._injected_kw:
-                # update the kwargs with a kw to notify the function that the
-                # kwargs are injected from saved data
-                result[self._injected_kw] = True
-            # recall the function with result as kwargs
-            # the function may modify the result
-            result = self._function(*self._function_args, **result)
+            result = self._inject_result(result)
 
         return result
 
@@ -209,17 +209,12 @@ def install_katello_ca(hostname=None):
     :raises: AssertionError: If katello-ca wasn't installed.
 
     """
-    ssh.command(
+    # Not checking the return_code of the installation, as rpm could be
+    # installed before and installation may fail
+    result = ssh.command_batch([
         u'rpm -Uvh {0}'.format(settings.server.get_cert_rpm_url()),
-        hostname
-    )
-    # Not checking the return_code here, as rpm could be installed before
-    # and installation may fail
-    result = ssh.command(
-        u'rpm -q katello-ca-consumer-{0}'
-        .format(settings.server.hostname),
-        hostname
-    )
+        u'rpm -q katello-ca-consumer-{0}'.format(settings.server.hostname),
+    ], hostname, stop_on_failure=False)[-1]
     # Checking the return_code here to verify katello-ca rpm is actually
     # present in the system
     if result.return_code != 0:
@@ -0,0 +1,296 @@
+"""Contention telemetry of the locks of
+:mod:`robottelo.decorators.func_locker` and of the shared function storages.
+
+When ``settings.performance.lock_metrics`` is enabled, every acquisition of a
+function lock, semaphore or reader/writer lock, including the locks taken by
+:func:`robottelo.manifests.upload_manifest_locked` and by the shared
+functions, records:
+
+* ``lock``: the locked file path or redis key, made of the scope path and of
+  the function name
+* ``kind``: ``lock``, ``shared``, ``semaphore``, ``read`` or ``write``
+* ``worker`` and ``pid``: the pytest-xdist worker and process of the holder
+* ``start`` and ``wait``: when the acquisition started and how long it
+  waited for the lock
+* ``hold``: how long the lock was held
+* ``outcome``: ``acquired``, ``timeout``, ``takeover`` when the lock of a
+  stale holder, saved in ``previous_holder``, was taken over, or ``error``
+
+Each process appends its records as JSON lines to a file in
+``settings.performance.lock_metrics_dir``, so the records of all the
+pytest-xdist workers can be aggregated at the end of the session by
+:func:`write_report`, which ranks the locks by the time spent waiting for
+them and draws the timeline of the most contended ones.
+"""
+import json
+import logging
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from robottelo.config import settings
+from robottelo.ssh_metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+OUTCOME_ACQUIRED = 'acquired'
+OUTCOME_TIMEOUT = 'timeout'
+OUTCOME_TAKEOVER = 'takeover'
+OUTCOME_ERROR = 'error'
+REPORT_FILE_NAME = 'report.json'
+TIMELINE_FILE_NAME = 'timeline.txt'
+# the number of locks and the number of columns of the timeline
+TIMELINE_LOCKS = 5
+TIMELINE_WIDTH = 80
+
+_local = threading.local()
+_file_lock = threading.Lock()
+
+
+def is_enabled():
+    """Whether the lock acquisitions should be measured."""
+    return bool(settings.performance and settings.performance.lock_metrics)
+
+
+def get_metrics_dir():
+    """Return the directory where the records are stored."""
+    return settings.performance.lock_metrics_dir or 'lock_metrics'
+
+
+class _Measurement(object):
+    """The measure of a lock acquisition, the lock implementation calls
+    :meth:`acquired` once it holds the lock.
+    """
+
+    def __init__(self, record):
+        self.record = record
+        self.acquired_at = None
+
+    def acquired(self):
+        self.acquired_at = time.time()
+        self.record['wait'] = self.acquired_at - self.record['start']
+        if self.record['outcome'] is None:
+            self.record['outcome'] = OUTCOME_ACQUIRED
+
+
+class _NoMeasurement(object):
+
+    def acquired(self):
+        pass
+
+
+@contextmanager
+def measure(lock, kind='lock', timeout_errors=()):
+    """Measure the acquisition of ``lock`` by the block, and how long it is
+    held.
+
+    The record is saved when the block exits, with the ``timeout`` outcome
+    if one of ``timeout_errors`` was raised before the lock was acquired.
+    """
+    if not is_enabled():
+        yield _NoMeasurement()
+        return
+    record = {
+        'lock': lock,
+        'kind': kind,
+        'worker': os.environ.get('PYTEST_XDIST_WORKER', 'master'),
+        'pid': os.getpid(),
+        'start': time.time(),
+        'wait': 0.0,
+        'hold': 0.0,
+        'outcome': None,
+    }
+    measurement = _Measurement(record)
+    records = _local.__dict__.setdefault('records', [])
+    records.append(record)
+    try:
+        yield measurement
+    except Exception as err:
+        if measurement.acquired_at is None:
+            if isinstance(err, timeout_errors):
+                record['outcome'] = OUTCOME_TIMEOUT
+            else:
+                record['outcome'] = OUTCOME_ERROR
+                record['error'] = type(err).__name__
+        raise
+    finally:
+        records.pop()
+        end = time.time()
+        if measurement.acquired_at is None:
+            record['wait'] = end - record['start']
+        else:
+            record['hold'] = end - measurement.acquired_at
+        _save(record)
+
+
+def takeover(holder):
+    """Mark the acquisition measured by the current thread as the takeover
+    of the lock of the stale ``holder``.
+    """
+    records = getattr(_local, 'records', None)
+    if records:
+        records[-1]['outcome'] = OUTCOME_TAKEOVER
+        records[-1]['previous_holder'] = u'{0}@{1}'.format(
+            holder.get('pid'), holder.get('host'))
+
+
+def _save(record):
+    """Append the record to the current process records file."""
+    directory = get_metrics_dir()
+    path = os.path.join(directory, 'lock_metrics_{0}.jsonl'.format(
+        os.getpid()))
+    with _file_lock:
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(path, 'a') as handler:
+                handler.write(json.dumps(record) + '\n')
+        except (IOError, OSError) as err:
+            logger.warning('Could not save lock metrics record: %s', err)
+
+
+def _is_records_file(name):
+    return name.startswith('lock_metrics_') and name.endswith('.jsonl')
+
+
+def clear(directory=None):
+    """Remove the records of a previous session."""
+    directory = directory or get_metrics_dir()
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if _is_records_file(name):
+            os.remove(os.path.join(directory, name))
+
+
+def load_records(directory=None):
+    """Read the records saved by all the processes."""
+    directory = directory or get_metrics_dir()
+    records = []
+    if not os.path.isdir(directory):
+        return records
+    for name in sorted(os.listdir(directory)):
+        if not _is_records_file(name):
+            continue
+        with open(os.path.join(directory, name)) as handler:
+            for line in handler:
+                if line.strip():
+                    records.append(json.loads(line))
+    return records
+
+
+def aggregate(records):
+    """Group the records by lock and compute their statistics.
+
+    :return: a dict mapping each lock to its ``count``, the count of each
+        outcome, the ``wait`` and ``hold`` total times, the ``p50``, ``p95``
+        and ``max`` of the wait time and the ``workers`` which used it.
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(record['lock'], []).append(record)
+    stats = {}
+    for lock, group in groups.items():
+        waits = sorted(record['wait'] for record in group)
+        stats[lock] = {
+            'count': len(group),
+            'wait': sum(waits),
+            'hold': sum(record['hold'] for record in group),
+            'p50': percentile(waits, 50),
+            'p95': percentile(waits, 95),
+            'max': waits[-1],
+            'workers': sorted(set(record['worker'] for record in group)),
+        }
+        for outcome in (OUTCOME_ACQUIRED, OUTCOME_TIMEOUT, OUTCOME_TAKEOVER,
+                        OUTCOME_ERROR):
+            stats[lock][outcome] = sum(
+                1 for record in group if record['outcome'] == outcome)
+    return stats
+
+
+def rank(stats):
+    """Return the locks sorted by the total time spent waiting for them."""
+    return sorted(stats, key=lambda lock: stats[lock]['wait'], reverse=True)
+
+
+def format_report(stats):
+    """Return a text table of the statistics of the most contended locks
+    first.
+    """
+    lines = [
+        u'{0:<60} {1:>6} {2:>9} {3:>8} {4:>8} {5:>9} {6:>8} {7:>8}'.format(
+            'lock', 'count', 'wait(s)', 'p95(s)', 'max(s)', 'hold(s)',
+            'timeout', 'takeover')
+    ]
+    for lock in rank(stats):
+        stat = stats[lock]
+        lines.append(
+            u'{0:<60} {1:>6} {2:>9.2f} {3:>8.3f} {4:>8.3f} {5:>9.2f} '
+            u'{6:>8} {7:>8}'.format(
+                lock[-60:], stat['count'], stat['wait'], stat['p95'],
+                stat['max'], stat['hold'], stat['timeout'],
+                stat['takeover'])
+        )
+    return u'\n'.join(lines)
+
+
+def format_timeline(records, locks, width=TIMELINE_WIDTH):
+    """Return a text timeline of the acquisitions of ``locks``, a row by
+    worker, where ``.`` is a wait, ``#`` a hold, ``x`` a timeout and ``T`` a
+    takeover.
+    """
+    records = [record for record in records if record['lock'] in locks]
+    if not records:
+        return u''
+    start = min(record['start'] for record in records)
+    end = max(record['start'] + record['wait'] + record['hold']
+              for record in records)
+    scale = (end - start) / width or 1.0
+
+    def column(moment):
+        return min(int((moment - start) / scale), width - 1)
+
+    lines = [u'timeline of {0:.2f}s, {1:.2f}s by column'.format(
+        end - start, scale)]
+    for lock in locks:
+        lines.append(lock)
+        rows = {}
+        for record in records:
+            if record['lock'] != lock:
+                continue
+            row = rows.setdefault(record['worker'], [u' '] * width)
+            acquired_at = record['start'] + record['wait']
+            for index in range(column(record['start']),
+                               column(acquired_at) + 1):
+                row[index] = u'.'
+            if record['outcome'] == OUTCOME_TIMEOUT:
+                row[column(acquired_at)] = u'x'
+                continue
+            for index in range(column(acquired_at),
+                               column(acquired_at + record['hold']) + 1):
+                row[index] = u'#'
+            if record['outcome'] == OUTCOME_TAKEOVER:
+                row[column(acquired_at)] = u'T'
+        for worker in sorted(rows):
+            lines.append(u'  {0:<8} |{1}|'.format(
+                worker, u''.join(rows[worker])))
+    return u'\n'.join(lines)
+
+
+def write_report(directory=None):
+    """Aggregate the records of all the processes, export the statistics to
+    ``report.json`` and the timeline of the most contended locks to
+    ``timeline.txt`` in the metrics directory and return the text report.
+    """
+    directory = directory or get_metrics_dir()
+    records = load_records(directory)
+    stats = aggregate(records)
+    if not stats:
+        return u''
+    with open(os.path.join(directory, REPORT_FILE_NAME), 'w') as handler:
+        json.dump(stats, handler, indent=2, sort_keys=True)
+    timeline = format_timeline(records, rank(stats)[:TIMELINE_LOCKS])
+    with open(os.path.join(directory, TIMELINE_FILE_NAME), 'w') as handler:
+        handler.write(timeline)
+    return u'\n\n'.join([format_report(stats), timeline])
@@ -1,20 +1,44 @@
 """Utility module to handle the shared ssh connection."""
 import base64
+import hashlib
 import logging
 import os
 import re
+import select
+import socket
+import stat
+import threading
 import time
+import uuid
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import paramiko
 import six
 
 from fnmatch import fnmatch
+from shlex import quote as shlex_quote
 from contextlib import contextmanager
+from robottelo import ssh_metrics
 from robottelo.cli import hammer
 from robottelo.config import settings
 
 logger = logging.getLogger(__name__)
 
+# Escape codes for colors displayed in the output
+COLOR_CODES_REGEX = re.compile(r'\x1b\[\d\d?m')
+
+# Maximum number of commands :func:`run_on_hosts` runs at the same time on a
+# single host, across all the threads of the process
+MAX_SESSIONS_PER_HOST = 5
+
+# Size of the chunks read and written by the file transfers
+TRANSFER_CHUNK_SIZE = 1024 * 1024
+
+# Size of the chunks read from the channel of a streamed command
+STREAM_CHUNK_SIZE = 32 * 1024
+
 
 class SSHCommandTimeoutError(Exception):
     """Raised when the SSH command has not finished executing after a
@@ -22,6 +46,23 @@ class SSHCommandTimeoutError(Exception):
     """
 
 
+class SSHMultiHostError(Exception):
+    """Raised by :func:`run_on_hosts` when the command could not be run on
+    some of the hosts.
+
+    :param results: dict mapping hostnames to the ``SSHCommandResult`` of the
+        commands which finished
+    :param errors: dict mapping hostnames to the exception raised when running
+        the command on them
+    :param msg: explanation of the error
+    """
+
+    def __init__(self, results, errors, msg):
+        self.results = results
+        self.errors = errors
+        super(SSHMultiHostError, self).__init__(msg)
+
+
 def decode_to_utf8(text):  # pragma: no cover
     """Paramiko returns bytes object and we need to ensure it is utf-8 before
     parsing
@@ -100,13 +141,14 @@ def get_client(hostname=None, username=None, password=None,
         timeout = settings.ssh_client.connection_timeout
     client = _call_paramiko_sshclient()
     client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    client.connect(
-        hostname=hostname,
-        username=username,
-        key_filename=key_filename,
-        password=password,
-        timeout=timeout
-    )
+    with ssh_metrics.timer('connect'):
+        client.connect(
+            hostname=hostname,
+            username=username,
+            key_filename=key_filename,
+            password=password,
+            timeout=timeout
+        )
     client._id = hex(id(client))
     return client
 
@@ -157,6 +199,246 @@ def get_connection(hostname=None, username=None, password=None,
         logger.debug('Destroyed Paramiko client {0}'.format(client._id))
 
 
+class SSHConnectionPool(object):
+    """Keep connected SSH clients around so they can be reused by several
+    commands instead of doing a new TCP and key exchange handshake for each
+    one of them.
+
+    Clients are keyed by ``(hostname, username, password, key_filename)`` and
+    are checked out exclusively, so a client is never shared by two threads at
+    the same time. ``settings.ssh_client.connection_pool_size`` limits both:
+
+    * the clients of a key checked out at the same time, the other threads
+      wait for one of them to be returned. A thread already holding a client
+      of the key is not limited, so nested commands do not deadlock.
+    * the idle clients kept per process, the least recently used one is
+      closed when that limit is reached.
+
+    Clients idle for longer than
+    ``settings.ssh_client.connection_pool_idle_timeout`` seconds are evicted.
+
+    The ``stats`` attribute counts:
+
+    * ``hits``: a live idle client was reused
+    * ``misses``: no idle client was available, a new one was connected
+    * ``reconnects``: an idle client had a dead transport and was replaced
+    * ``evictions``: idle clients closed because of the size or idle limits
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._returned = threading.Condition(self._lock)
+        self._idle = []  # [key, client, last_used] ordered by last_used
+        self._active = {}  # key: number of checked out clients
+        self._local = threading.local()
+        self._pid = os.getpid()
+        self.stats = dict.fromkeys(
+            ('hits', 'misses', 'reconnects', 'evictions'), 0)
+
+    @staticmethod
+    def _is_alive(client):
+        """Check whether the client transport can still be used."""
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+        except (EOFError, socket.error, paramiko.SSHException):
+            return False
+        return True
+
+    @staticmethod
+    def _close(client):
+        """Close a client ignoring errors from an already dead transport."""
+        try:
+            client.close()
+        except Exception as err:  # pragma: no cover
+            logger.debug('Error closing Paramiko client: %s', err)
+        logger.debug('Destroyed Paramiko client {0}'.format(
+            getattr(client, '_id', None)))
+
+    def _reset_after_fork(self):
+        """Forget clients inherited from a parent process, their transports
+        belong to the parent.
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = []
+            self._active = {}
+            self._local = threading.local()
+
+    def _held(self):
+        """Return the number of clients checked out by the current thread by
+        key.
+        """
+        return self._local.__dict__.setdefault('held', {})
+
+    def _check_out(self, key):
+        """Wait until a client of key can be checked out and count it. Must be
+        called with the pool lock held.
+        """
+        held = self._held()
+        if not held.get(key):
+            limit = max(settings.ssh_client.connection_pool_size, 1)
+            while self._active.get(key, 0) >= limit:
+                self._returned.wait()
+        self._active[key] = self._active.get(key, 0) + 1
+        held[key] = held.get(key, 0) + 1
+
+    def _check_in(self, key):
+        """Count a checked out client of key as returned. Must be called with
+        the pool lock held.
+        """
+        held = self._held()
+        if held.get(key):
+            held[key] -= 1
+        if self._active.get(key):
+            self._active[key] -= 1
+        self._returned.notify_all()
+
+    def _evict_idle(self, now):
+        """Close the clients which have been idle for too long. Must be
+        called with the pool lock held.
+        """
+        deadline = now - settings.ssh_client.connection_pool_idle_timeout
+        expired = [entry for entry in self._idle if entry[2] < deadline]
+        for entry in expired:
+            self._idle.remove(entry)
+            self.stats['evictions'] += 1
+        return [entry[1] for entry in expired]
+
+    def acquire(self, key, timeout=None):
+        """Check out a connected client for ``key``, reusing an idle one when
+        possible. Waits while the limit of checked out clients of ``key`` is
+        reached.
+        """
+        with self._lock:
+            self._reset_after_fork()
+            self._check_out(key)
+        try:
+            return self._connect(key, timeout)
+        except BaseException:
+            with self._lock:
+                self._check_in(key)
+            raise
+
+    def _connect(self, key, timeout):
+        """Return an idle client of ``key`` or a new one."""
+        reused = None
+        with self._lock:
+            to_close = self._evict_idle(time.time())
+            for entry in reversed(self._idle):
+                if entry[0] == key:
+                    self._idle.remove(entry)
+                    reused = entry[1]
+                    break
+        for client in to_close:
+            self._close(client)
+        if reused is not None:
+            if self._is_alive(reused):
+                with self._lock:
+                    self.stats['hits'] += 1
+                logger.debug('Reusing Paramiko client {0}'.format(reused._id))
+                return reused
+            logger.info('Pooled connection to [%s] is dead, reconnecting',
+                        key[0])
+            self._close(reused)
+            with self._lock:
+                self.stats['reconnects'] += 1
+        else:
+            with self._lock:
+                self.stats['misses'] += 1
+        client = get_client(*key, timeout=timeout)
+        logger.debug('Instantiated Paramiko client {0}'.format(client._id))
+        logger.info('Connected to [%s]', key[0])
+        return client
+
+    def release(self, key, client):
+        """Return a checked out client to the pool."""
+        to_close = []
+        with self._lock:
+            self._reset_after_fork()
+            self._check_in(key)
+            self._idle.append([key, client, time.time()])
+            while len(self._idle) > settings.ssh_client.connection_pool_size:
+                to_close.append(self._idle.pop(0)[1])
+                self.stats['evictions'] += 1
+        for client in to_close:
+            self._close(client)
+
+    def discard(self, key, client):
+        """Close a checked out client which state is unknown."""
+        self._close(client)
+        with self._lock:
+            self._reset_after_fork()
+            self._check_in(key)
+
+    def close_all(self):
+        """Close all the idle clients."""
+        with self._lock:
+            to_close = [entry[1] for entry in self._idle]
+            self._idle = []
+        for client in to_close:
+            self._close(client)
+
+
+_pool = SSHConnectionPool()
+
+
+def get_pool_stats():
+    """Return a copy of the connection pool hit, miss, reconnect and eviction
+    counters of the current process.
+    """
+    with _pool._lock:
+        return dict(_pool.stats)
+
+
+def close_pooled_connections():
+    """Close all idle connections kept by the connection pool."""
+    _pool.close_all()
+
+
+@contextmanager
+def get_pooled_connection(hostname=None, username=None, password=None,
+                          key_filename=None, timeout=None):
+    """Yield an ssh connection object taken from the connection pool.
+
+    Accepts the same arguments as :func:`get_connection`, but instead of
+    closing the connection when the caller is done with it, the connection is
+    kept open to be reused by the next call with the same hostname and
+    credentials. If the block raises an exception the connection is closed
+    instead, since its state is unknown.
+
+    :return: An SSH connection.
+    :rtype: ``paramiko.SSHClient``
+
+    """
+    if hostname is None:
+        hostname = settings.server.hostname
+    if username is None:
+        username = settings.server.ssh_username
+    if key_filename is None and password is None:
+        key_filename = settings.server.ssh_key
+    if password is None:
+        password = settings.server.ssh_password
+    if timeout is None:
+        timeout = settings.ssh_client.connection_timeout
+    if settings.ssh_client.connection_pool_size <= 0:
+        with get_connection(hostname, username, password, key_filename,
+                            timeout) as connection:
+            yield connection
+        return
+    key = (hostname, username, password, key_filename)
+    client = _pool.acquire(key, timeout=timeout)
+    try:
+        yield client
+    except BaseException:
+        _pool.discard(key, client)
+        raise
+    else:
+        _pool.release(key, client)
+
+
 @contextmanager
 def get_sftp_session(hostname=None, username=None,
                      password=None, key_filename=None, timeout=None):
@@ -186,11 +468,11 @@ def get_sftp_session(hostname=None, username=None,
         configuration's ``server`` section will be used.
     :param int timeout: Time to wait for establish the connection.
        """
-    with get_connection(hostname=hostname, username=username,
-                        password=password, key_filename=key_filename,
-                        timeout=timeout) as connection:
+    with get_pooled_connection(hostname=hostname, username=username,
+                               password=password, key_filename=key_filename,
+                               timeout=timeout) as connection:
+        sftp = connection.open_sftp()
         try:
-            sftp = connection.open_sftp()
             yield sftp
         finally:
             sftp.close()
@@ -234,27 +516,24 @@ def add_authorized_key(key, hostname=None, username=None, password=None,
     ssh_path = '~/.ssh'
     auth_file = os.path.join(ssh_path, 'authorized_keys')
 
-    with get_connection(hostname=hostname, username=username,
-                        password=password, key_filename=key_filename,
-                        timeout=timeout) as con:
-
-        # ensure ssh directory exists
-        execute_command('mkdir -p %s' % ssh_path, con)
+    with get_pooled_connection(hostname=hostname, username=username,
+                               password=password, key_filename=key_filename,
+                               timeout=timeout) as con:
 
-        # append the key if doesn't exists
-        add_key = "grep -q '{key}' {dest} || echo '{key}' >> {dest}".format(
-            key=key_content, dest=auth_file)
-        execute_command(add_key, con)
-
-        # set proper permissions
-        execute_command('chmod 700 %s' % ssh_path, con)
-        execute_command('chmod 600 %s' % auth_file, con)
         ssh_user = username or settings.server.ssh_username
-        execute_command('chown -R %s %s' % (ssh_user, ssh_path), con)
-
-        # Restore SELinux context with restorecon, if it's available:
-        cmd = 'command -v restorecon && restorecon -RvF %s || true' % ssh_path
-        execute_command(cmd, con)
+        execute_command_batch([
+            # ensure ssh directory exists
+            'mkdir -p %s' % ssh_path,
+            # append the key if doesn't exists
+            "grep -q '{key}' {dest} || echo '{key}' >> {dest}".format(
+                key=key_content, dest=auth_file),
+            # set proper permissions
+            'chmod 700 %s' % ssh_path,
+            'chmod 600 %s' % auth_file,
+            'chown -R %s %s' % (ssh_user, ssh_path),
+            # Restore SELinux context with restorecon, if it's available:
+            'command -v restorecon && restorecon -RvF %s || true' % ssh_path,
+        ], con, stop_on_failure=False)
 
 
 def upload_file(local_file, remote_file, key_filename=None, hostname=None):
@@ -276,8 +555,14 @@ def upload_file(local_file, remote_file, key_filename=None, hostname=None):
 
 
 def upload_files(local_dir, remote_dir, file_search="*.txt",
-                 hostname=None, key_filename=None):
+                 hostname=None, key_filename=None, max_workers=4):
     """ Upload all files from directory to a remote directory
+
+    Files are transferred concurrently over several SFTP channels of the same
+    connection. A file is skipped when the remote file already has the same
+    size and checksum and a partially uploaded file is resumed. See
+    :func:`_sync_upload`.
+
     :param local_dir: all files from local path to be uploaded.
     :param remote_dir: a remote path where the uploaded files will be
            placed.
@@ -287,17 +572,20 @@ def upload_files(local_dir, remote_dir, file_search="*.txt",
     :param str key_filename: The path of the ssh private key to use when
         connecting to the server. If it is ``None`` ``key_filename`` from
         configuration's ``server`` section will be used.
+    :param int max_workers: Maximum number of files transferred concurrently.
     """
-    command("mkdir -p {}".format(remote_dir))
-    # making only one SFTP Session to transfer all files
-    with get_sftp_session(hostname=hostname,
-                          key_filename=key_filename) as sftp:
-        for root, dirs, files in os.walk(local_dir):
-            for local_filename in files:
-                if fnmatch(local_filename, file_search):
-                    remote_file = "{0}/{1}".format(remote_dir, local_filename)
-                    local_file = os.path.join(local_dir, local_filename)
-                    _upload_file(sftp, local_file, remote_file)
+    jobs = []
+    for root, dirs, files in os.walk(local_dir):
+        for local_filename in files:
+            if fnmatch(local_filename, file_search):
+                remote_file = "{0}/{1}".format(remote_dir, local_filename)
+                local_file = os.path.join(root, local_filename)
+                jobs.append((local_file, remote_file))
+    with get_pooled_connection(hostname=hostname,
+                               key_filename=key_filename) as connection:
+        execute_command(
+            "mkdir -p {}".format(shlex_quote(remote_dir)), connection)
+        _transfer_files(connection, _sync_upload, jobs, max_workers)
 
 
 def _upload_file(sftp, local_file, remote_file):
@@ -316,21 +604,211 @@ def _upload_file(sftp, local_file, remote_file):
         sftp.put(local_file, remote_file)
 
 
+def _local_checksum(path, size=None):
+    """Return the sha256 hex digest of the first ``size`` bytes of a local
+    file, or of the whole file when ``size`` is ``None``.
+    """
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, 'rb') as handler:
+        while remaining is None or remaining > 0:
+            chunk_size = TRANSFER_CHUNK_SIZE
+            if remaining is not None:
+                chunk_size = min(chunk_size, remaining)
+                remaining -= chunk_size
+            chunk = handler.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remote_checksum(connection, path, size=None):
+    """Return the sha256 hex digest of the first ``size`` bytes of a remote
+    file, or of the whole file when ``size`` is ``None``. Return ``None``
+    when it can't be computed.
+    """
+    if size is None:
+        cmd = 'sha256sum {0}'.format(shlex_quote(path))
+    else:
+        cmd = 'head -c {0} {1} | sha256sum'.format(size, shlex_quote(path))
+    result = execute_command(cmd, connection, output_format='plain')
+    if result.return_code != 0 or not result.stdout:
+        return None
+    return result.stdout.split()[0]
+
+
+def _resume_offset(connection, partial_size, full_size, local_path,
+                   remote_path):
+    """Return the offset where an interrupted transfer can be resumed.
+
+    When the destination file is smaller than the source file and both start
+    with the same contents, the transfer resumes after them. Otherwise it
+    starts over from 0.
+    """
+    if not partial_size or partial_size >= full_size:
+        return 0
+    if (_local_checksum(local_path, partial_size) ==
+            _remote_checksum(connection, remote_path, partial_size)):
+        return partial_size
+    return 0
+
+
+def _remote_size(sftp, path):
+    """Return the size of a remote file, ``None`` if it does not exist."""
+    try:
+        return sftp.stat(path).st_size
+    except IOError:
+        return None
+
+
+def _copy_chunks(reader, writer):
+    """Copy the contents of ``reader`` to ``writer`` chunk by chunk."""
+    while True:
+        chunk = reader.read(TRANSFER_CHUNK_SIZE)
+        if not chunk:
+            break
+        writer.write(chunk)
+
+
+def _sync_upload(connection, sftp, local_file, remote_file):
+    """Upload a local file unless the remote file is already up to date.
+
+    The upload is skipped if the remote file has the same size and sha256
+    checksum as the local one and resumed if the remote file is a prefix of
+    the local one. Writes are pipelined, paramiko does not wait for the
+    acknowledgment of a chunk before sending the next one.
+
+    :return: Whether the file was transferred.
+    """
+    local_size = os.path.getsize(local_file)
+    remote_size = _remote_size(sftp, remote_file)
+    if remote_size == local_size and (
+            _local_checksum(local_file) ==
+            _remote_checksum(connection, remote_file)):
+        logger.debug('Skipping upload of %s, %s is up to date',
+                     local_file, remote_file)
+        return False
+    offset = _resume_offset(
+        connection, remote_size, local_size, local_file, remote_file)
+    if offset:
+        logger.info('Resuming upload of %s at byte %s', local_file, offset)
+    with open(local_file, 'rb') as reader:
+        with sftp.open(remote_file, 'r+b' if offset else 'wb') as writer:
+            reader.seek(offset)
+            writer.seek(offset)
+            writer.set_pipelined(True)
+            _copy_chunks(reader, writer)
+    return True
+
+
+def _sync_download(connection, sftp, remote_file, local_file):
+    """Download a remote file unless the local file is already up to date.
+
+    The download is skipped if the local file has the same size and sha256
+    checksum as the remote one and resumed if the local file is a prefix of
+    the remote one. Reads are prefetched in the background by paramiko.
+
+    :return: Whether the file was transferred.
+    """
+    remote_size = sftp.stat(remote_file).st_size
+    local_size = None
+    if os.path.isfile(local_file):
+        local_size = os.path.getsize(local_file)
+    if local_size == remote_size and (
+            _local_checksum(local_file) ==
+            _remote_checksum(connection, remote_file)):
+        logger.debug('Skipping download of %s, %s is up to date',
+                     remote_file, local_file)
+        return False
+    offset = _resume_offset(
+        connection, local_size, remote_size, local_file, remote_file)
+    if offset:
+        logger.info('Resuming download of %s at byte %s', remote_file, offset)
+    with sftp.open(remote_file, 'rb') as reader:
+        with open(local_file, 'r+b' if offset else 'wb') as writer:
+            reader.seek(offset)
+            writer.seek(offset)
+            reader.prefetch(remote_size)
+            _copy_chunks(reader, writer)
+    return True
+
+
+def _transfer_files(connection, transfer, jobs, max_workers):
+    """Run ``transfer(connection, sftp, source, destination)`` for every
+    ``(source, destination)`` pair in ``jobs`` using up to ``max_workers``
+    threads, each one with its own SFTP channel over ``connection``.
+
+    :return: The number of files actually transferred.
+    """
+    sessions = threading.local()
+    opened = []
+    opened_lock = threading.Lock()
+
+    def _run(job):
+        sftp = getattr(sessions, 'sftp', None)
+        if sftp is None:
+            sftp = sessions.sftp = connection.open_sftp()
+            with opened_lock:
+                opened.append(sftp)
+        return transfer(connection, sftp, *job)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return sum(executor.map(_run, jobs))
+    finally:
+        for sftp in opened:
+            sftp.close()
+
+
 def download_file(remote_file, local_file=None, hostname=None):
     """Download a remote file to the local machine. If ``hostname`` is not
     provided will be used the server.
 
+    The download is skipped when the local file is already up to date and
+    resumed when it was interrupted, see :func:`_sync_download`.
+
     """
     if local_file is None:  # pragma: no cover
         local_file = remote_file
-    with get_connection(
-        hostname=hostname,
-    ) as connection:  # pragma: no cover
+    with get_pooled_connection(hostname=hostname) as connection:
+        _transfer_files(
+            connection, _sync_download, [(remote_file, local_file)], 1)
+
+
+def download_files(remote_dir, local_dir, file_search='*', hostname=None,
+                   key_filename=None, max_workers=4):
+    """Download all files from a remote directory to a local directory.
+
+    Files are transferred concurrently, skipped when already up to date and
+    resumed when interrupted, like :func:`upload_files` does.
+
+    :param remote_dir: the remote directory to download the files from.
+    :param local_dir: a local path where the downloaded files will be placed.
+    :param file_search: filter only files matching this pattern
+    :param hostname: source machine hostname. If not provided will be used the
+        ``server.hostname`` from the configuration.
+    :param str key_filename: The path of the ssh private key to use when
+        connecting to the server. If it is ``None`` ``key_filename`` from
+        configuration's ``server`` section will be used.
+    :param int max_workers: Maximum number of files transferred concurrently.
+    """
+    if not os.path.isdir(local_dir):
+        os.makedirs(local_dir)
+    with get_pooled_connection(hostname=hostname,
+                               key_filename=key_filename) as connection:
+        sftp = connection.open_sftp()
         try:
-            sftp = connection.open_sftp()
-            sftp.get(remote_file, local_file)
+            jobs = [
+                ('{0}/{1}'.format(remote_dir, attr.filename),
+                 os.path.join(local_dir, attr.filename))
+                for attr in sftp.listdir_attr(remote_dir)
+                if stat.S_ISREG(attr.st_mode) and
+                fnmatch(attr.filename, file_search)
+            ]
         finally:
             sftp.close()
+        _transfer_files(connection, _sync_download, jobs, max_workers)
 
 
 def command(cmd, hostname=None, output_format=None, username=None,
@@ -359,11 +837,305 @@ def command(cmd, hostname=None, output_format=None, username=None,
         timeout = settings.ssh_client.command_timeout
     if connection_timeout is None:
         connection_timeout = settings.ssh_client.connection_timeout
-    with get_connection(hostname=hostname, username=username,
-                        password=password, key_filename=key_filename,
-                        timeout=connection_timeout) as connection:
-        return execute_command(
-            cmd, connection, output_format, timeout, connection_timeout)
+    with ssh_metrics.measure(cmd, hostname):
+        with get_pooled_connection(
+                hostname=hostname, username=username, password=password,
+                key_filename=key_filename,
+                timeout=connection_timeout) as connection:
+            return execute_command(
+                cmd, connection, output_format, timeout, connection_timeout)
+
+
+class SSHCommandStream(object):
+    """Iterable over the stdout lines of a command, lines are yielded as soon
+    as they are received so only one line is kept in memory at a time.
+
+    Lines are decoded and processed the same way :func:`execute_command`
+    processes the output, so for ``output_format`` other than ``json`` and
+    ``plain`` the color codes are removed and the Rails traffic lines are
+    skipped. stderr is read while stdout is iterated, so a command writing a
+    lot to stderr does not stall. Once the iteration is over ``return_code``
+    and ``stderr`` are set. Breaking out of the iteration closes the remote
+    channel.
+
+    The command is measured by :mod:`robottelo.ssh_metrics` with the tags of
+    the thread which created the stream, the time spent by the consumer
+    between two lines is not counted.
+
+    The stream can be iterated only once and is usually created by
+    :func:`stream_command`.
+    """
+
+    def __init__(self, cmd, output_format=None, timeout=None,
+                 connection_timeout=None, **connection_kwargs):
+        self.cmd = cmd
+        self.output_format = output_format
+        self.timeout = timeout
+        self.connection_timeout = connection_timeout
+        self.connection_kwargs = connection_kwargs
+        self.return_code = None
+        self.stderr = None
+        self._consumed = False
+        self._tags = ssh_metrics.get_tags()
+
+    def _clean(self, line):
+        """Decode a raw stdout line and remove the trailing line break,
+        return ``None`` when the line must be skipped.
+        """
+        line = decode_to_utf8(line).rstrip(u'\r\n')
+        if self.output_format in ('json', 'plain'):
+            return line
+        if line.startswith('['):
+            return None
+        return COLOR_CODES_REGEX.sub('', line.replace('""', ''))
+
+    @staticmethod
+    def _add_time(record, phase, start):
+        if record is not None:
+            record[phase] += time.time() - start
+
+    def _receive(self, channel, record):
+        """Yield the stdout chunks of the channel until its end, its stderr
+        is read in the same loop.
+        """
+        end_time = time.time() + self.timeout if self.timeout else None
+        stderr = []
+        while True:
+            start = time.time()
+            if channel.recv_stderr_ready():
+                stderr.append(channel.recv_stderr(STREAM_CHUNK_SIZE))
+                self._add_time(record, 'execution', start)
+                continue
+            if channel.recv_ready():
+                chunk = channel.recv(STREAM_CHUNK_SIZE)
+                self._add_time(record, 'execution', start)
+                if record is not None:
+                    record['bytes'] += len(chunk)
+                yield chunk
+                continue
+            if channel.eof_received or channel.closed:
+                break
+            wait = 1.0
+            if end_time:
+                wait = min(end_time - time.time(), wait)
+                if wait <= 0:
+                    raise socket.timeout()
+            # the channel is readable when stdout or stderr data arrives
+            select.select([channel], [], [], wait)
+            self._add_time(record, 'execution', start)
+        start = time.time()
+        self.return_code = channel.recv_exit_status()
+        self._add_time(record, 'execution', start)
+        stderr = b''.join(stderr)
+        if record is not None:
+            record['bytes'] += len(stderr)
+        self.stderr = COLOR_CODES_REGEX.sub('', decode_to_utf8(stderr))
+
+    def _lines(self, channel, record):
+        """Yield the cleaned stdout lines of the channel."""
+        pending = b''
+        for chunk in self._receive(channel, record):
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                start = time.time()
+                line = self._clean(line)
+                self._add_time(record, 'parse', start)
+                if line is not None:
+                    yield line
+        if pending:
+            line = self._clean(pending)
+            if line is not None:
+                yield line
+
+    def __iter__(self):
+        if self._consumed:
+            raise RuntimeError('SSHCommandStream can be iterated only once')
+        self._consumed = True
+        record = ssh_metrics.new_record(
+            self.cmd, self.connection_kwargs.get('hostname'), self._tags)
+        try:
+            start = time.time()
+            with get_pooled_connection(
+                    timeout=self.connection_timeout,
+                    **self.connection_kwargs) as connection:
+                self._add_time(record, 'connect', start)
+                logger.info('>>> %s', self.cmd)
+                start = time.time()
+                channel = connection.get_transport().open_session(
+                    timeout=self.connection_timeout)
+                channel.settimeout(self.timeout)
+                channel.exec_command(self.cmd)
+                self._add_time(record, 'channel_open', start)
+                try:
+                    for line in self._lines(channel, record):
+                        yield line
+                except socket.timeout:
+                    channel.close()
+                    raise SSHCommandTimeoutError(
+                        'ssh command: {0} \n did not respond in the '
+                        'predefined time (timeout={1})'.format(
+                            self.cmd, self.timeout)
+                    )
+                except GeneratorExit:
+                    # the consumer stopped iterating, the connection can
+                    # still be reused once the channel is closed
+                    channel.close()
+                    return
+                channel.close()
+        except Exception as err:
+            if record is not None:
+                record['status'] = type(err).__name__
+            raise
+        finally:
+            if record is not None:
+                ssh_metrics.save_record(record)
+        if self.stderr:
+            logger.info('<<< stderr\n%s', self.stderr)
+
+
+def stream_command(cmd, hostname=None, output_format=None, username=None,
+                   password=None, key_filename=None, timeout=None,
+                   connection_timeout=None):
+    """Executes SSH command on remote hostname yielding the stdout lines as
+    they arrive instead of reading the whole output into memory.
+
+    Accepts the same arguments as :func:`command`. The returned
+    :class:`SSHCommandStream` can be consumed by incremental parsers, for
+    example::
+
+        stream = stream_command('hammer --output csv package list')
+        for package in hammer.iter_csv(stream):
+            ...
+        assert stream.return_code == 0
+
+    :return: SSHCommandStream
+    """
+    if timeout is None:
+        timeout = settings.ssh_client.command_timeout
+    if connection_timeout is None:
+        connection_timeout = settings.ssh_client.connection_timeout
+    return SSHCommandStream(
+        cmd,
+        output_format=output_format,
+        timeout=timeout,
+        connection_timeout=connection_timeout,
+        hostname=hostname or settings.server.hostname,
+        username=username,
+        password=password,
+        key_filename=key_filename,
+    )
+
+
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def _get_host_semaphore(hostname):
+    """Return the semaphore limiting the concurrent sessions to a host."""
+    with _host_semaphores_lock:
+        if hostname not in _host_semaphores:
+            _host_semaphores[hostname] = threading.BoundedSemaphore(
+                MAX_SESSIONS_PER_HOST)
+        return _host_semaphores[hostname]
+
+
+def run_on_hosts(cmd, hosts=None, max_workers=10, timeout=None,
+                 fail_fast=False, output_format=None, username=None,
+                 password=None, key_filename=None, connection_timeout=None):
+    """Executes SSH command(s) on many hosts concurrently.
+
+    Every host is handled by a thread of a pool of ``max_workers`` threads
+    using :func:`command`, so pooled connections are reused. At most
+    :data:`MAX_SESSIONS_PER_HOST` commands run at the same time on a given
+    host.
+
+    By default the command is run on all the hosts and if it could not be run
+    on some of them, because of a connection error or timeout for example,
+    :class:`SSHMultiHostError` is raised once all the hosts are done. When
+    ``fail_fast`` is ``True`` the first error or non zero return code cancels
+    the commands which have not started yet and raises
+    :class:`SSHMultiHostError` right away, without waiting for the commands
+    still running on the other hosts.
+
+    :param cmd: The command to run on every host or a dict mapping each
+        hostname to the command to run on it.
+    :param hosts: The hostnames to run the command on. Optional, defaults to
+        the keys of ``cmd`` when it is a dict and to the ``server.hostname``
+        from the configuration otherwise.
+    :param int max_workers: Maximum number of hosts handled concurrently.
+    :param timeout: Time to wait for the ssh command to finish on each host,
+        either a number or a dict mapping hostnames to a number.
+    :param bool fail_fast: Whether to stop on the first failure.
+    :param str output_format: json, csv or None
+    :param str username: The username to use when connecting.
+    :param str password: The password to use when connecting.
+    :param str key_filename: The path of the ssh private key to use when
+        connecting.
+    :param connection_timeout: Time to wait for establishing the connection.
+    :return: An ordered dict mapping each hostname to its SSHCommandResult
+    :raises SSHMultiHostError: When the command failed on some hosts.
+    """
+    if isinstance(cmd, dict):
+        commands = OrderedDict(
+            (host, cmd[host]) for host in (hosts if hosts else cmd))
+    else:
+        if not hosts:
+            hosts = [settings.server.hostname]
+        commands = OrderedDict((host, cmd) for host in hosts)
+    if not isinstance(timeout, dict):
+        timeout = dict.fromkeys(commands, timeout)
+
+    def _run(host):
+        with _get_host_semaphore(host):
+            return command(
+                commands[host],
+                hostname=host,
+                output_format=output_format,
+                username=username,
+                password=password,
+                key_filename=key_filename,
+                timeout=timeout.get(host),
+                connection_timeout=connection_timeout,
+            )
+
+    results = {}
+    errors = {}
+    failed = False
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(_run, host): host for host in commands}
+        for future in as_completed(futures):
+            host = futures[future]
+            try:
+                results[host] = future.result()
+            except Exception as err:
+                logger.error('Command failed on [%s]: %r', host, err)
+                errors[host] = err
+            if fail_fast and (
+                    host in errors or results[host].return_code != 0):
+                failed = True
+                for pending in futures:
+                    pending.cancel()
+                break
+    finally:
+        # on failure the commands still running are left to finish in the
+        # background
+        executor.shutdown(wait=not failed)
+    results = OrderedDict(
+        (host, results[host]) for host in commands if host in results)
+    if failed or errors:
+        raise SSHMultiHostError(
+            results,
+            errors,
+            'ssh command failed on hosts: {0}'.format(', '.join(
+                host for host in commands
+                if host in errors or (
+                    host in results and results[host].return_code != 0 and
+                    fail_fast)
+            ))
+        )
+    return results
 
 
 def execute_command(cmd, connection, output_format=None, timeout=None,
@@ -382,45 +1154,52 @@ def execute_command(cmd, connection, output_format=None, timeout=None,
     if connection_timeout is None:
         connection_timeout = settings.ssh_client.connection_timeout
     logger.info('>>> %s', cmd)
-    _, stdout, stderr = connection.exec_command(
-        cmd, timeout=connection_timeout)
-    if timeout:
-        # wait for the exit status ready
-        end_time = time.time() + timeout
-        while time.time() < end_time:
-            if stdout.channel.exit_status_ready():
-                break
-            time.sleep(1)
-        else:
-            logger.error('ssh command did not respond in the predefined time'
-                         ' (timeout=%s) and will be interrupted', timeout)
-            stdout.channel.close()
-            stderr.channel.close()
-            logger.error(
-                    '[Captured stdout]\n{0}\n-----\n'.format(stdout.read())
-            )
-            logger.error(
-                    '[Captured stderr]\n{0}\n-----\n'.format(stderr.read())
-            )
-            raise SSHCommandTimeoutError(
-                'ssh command: {0} \n did not respond in the predefined time '
-                '(timeout={1})'.format(cmd, timeout)
-            )
-
-    errorcode = stdout.channel.recv_exit_status()
-
-    stdout = stdout.read()
-    stderr = stderr.read()
-    # Remove escape code for colors displayed in the output
-    regex = re.compile(r'\x1b\[\d\d?m')
-    if stdout:
-        # Convert to unicode string
-        stdout = decode_to_utf8(stdout)
-        logger.info('<<< stdout\n%s', stdout)
-    if stderr:
-        # Convert to unicode string and remove all color codes characters
-        stderr = regex.sub('', decode_to_utf8(stderr))
-        logger.info('<<< stderr\n%s', stderr)
+    with ssh_metrics.timer('channel_open'):
+        _, stdout, stderr = connection.exec_command(
+            cmd, timeout=connection_timeout)
+    # paramiko sets the channel status event as soon as the exit status is
+    # received or the channel is closed, so waiting on it returns right after
+    # the command finishes
+    with ssh_metrics.timer('execution'):
+        finished = not timeout or stdout.channel.status_event.wait(timeout)
+    if not finished:
+        logger.error('ssh command did not respond in the predefined time'
+                     ' (timeout=%s) and will be interrupted', timeout)
+        stdout.channel.close()
+        stderr.channel.close()
+        logger.error(
+                '[Captured stdout]\n{0}\n-----\n'.format(stdout.read())
+        )
+        logger.error(
+                '[Captured stderr]\n{0}\n-----\n'.format(stderr.read())
+        )
+        raise SSHCommandTimeoutError(
+            'ssh command: {0} \n did not respond in the predefined time '
+            '(timeout={1})'.format(cmd, timeout)
+        )
+
+    with ssh_metrics.timer('execution'):
+        errorcode = stdout.channel.recv_exit_status()
+        stdout = stdout.read()
+        stderr = stderr.read()
+    ssh_metrics.add('bytes', len(stdout) + len(stderr))
+    with ssh_metrics.timer('parse'):
+        if stdout:
+            # Convert to unicode string
+            stdout = decode_to_utf8(stdout)
+            logger.info('<<< stdout\n%s', stdout)
+        if stderr:
+            # Convert to unicode string and remove all color codes characters
+            stderr = COLOR_CODES_REGEX.sub('', decode_to_utf8(stderr))
+            logger.info('<<< stderr\n%s', stderr)
+        return _command_result(stdout, stderr, errorcode, output_format)
+
+
+def _command_result(stdout, stderr, return_code, output_format):
+    """Build the ``SSHCommandResult`` of a command from its decoded stdout
+    and stderr.
+    """
+    regex = COLOR_CODES_REGEX
     # we don't want a list as output of 'plain' just pure text
     if stdout and output_format not in ('json', 'plain'):
         # Mostly only for hammer commands
@@ -435,7 +1214,109 @@ def execute_command(cmd, connection, output_format=None, timeout=None,
             if not line.startswith('[')
         ]
     return SSHCommandResult(
-        stdout, stderr, errorcode, output_format)
+        stdout, stderr, return_code, output_format)
+
+
+def _batch_script(cmds, marker, stop_on_failure):
+    """Build a shell script running each command in its own subshell with
+    its output delimited by start and end markers in both stdout and stderr.
+    The end marker carries the command return code.
+    """
+    script = []
+    for index, cmd in enumerate(cmds):
+        script.append(
+            "printf '{marker}:start:{index}\\n'\n"
+            "printf '{marker}:start:{index}\\n' >&2\n"
+            "(\n{cmd}\n)\n"
+            "rc=$?\n"
+            "printf '\\n{marker}:end:{index}:%d\\n' $rc\n"
+            "printf '\\n{marker}:end:{index}:%d\\n' $rc >&2\n"
+            .format(marker=marker, index=index, cmd=cmd)
+        )
+        if stop_on_failure:
+            script.append('[ $rc -eq 0 ] || exit $rc\n')
+    return ''.join(script)
+
+
+def _split_batch_output(output, marker):
+    """Return a dict mapping each command index to a tuple with its output
+    and return code.
+    """
+    regex = re.compile(
+        r'^{0}:start:(\d+)\n(.*?)\n{0}:end:\1:(\d+)$'.format(marker),
+        re.DOTALL | re.MULTILINE
+    )
+    return {
+        int(index): (text, int(return_code))
+        for index, text, return_code in regex.findall(output or u'')
+    }
+
+
+def execute_command_batch(cmds, connection, output_format=None,
+                          stop_on_failure=True, timeout=None,
+                          connection_timeout=None):
+    """Execute several commands via ssh in a single round-trip.
+
+    The commands are shipped as one remote shell script, each command runs in
+    its own subshell, so a ``cd`` or an ``exit`` does not affect the next
+    ones, and its output is delimited by unique markers.
+
+    :param cmds: the ordered list of commands to be executed
+    :param connection: SSH Paramiko client connection
+    :param output_format: plain|json|csv|list applied to every command
+    :param stop_on_failure: whether to stop at the first command finishing
+        with a non zero return code, otherwise all commands are run
+    :param timeout: Time to wait for all the commands to finish.
+    :param connection_timeout: Time to wait for establishing the connection.
+    :return: a list with one SSHCommandResult for each command which ran, in
+        the same order as ``cmds``
+    """
+    marker = 'ROBOTTELO-BATCH-{0}'.format(uuid.uuid4().hex)
+    result = execute_command(
+        _batch_script(cmds, marker, stop_on_failure),
+        connection,
+        output_format='plain',
+        timeout=timeout,
+        connection_timeout=connection_timeout,
+    )
+    stdout = _split_batch_output(result.stdout, marker)
+    stderr = _split_batch_output(result.stderr, marker)
+    results = []
+    for index in range(len(cmds)):
+        if index not in stdout:
+            break
+        text, return_code = stdout[index]
+        results.append(_command_result(
+            text, stderr.get(index, (u'', None))[0], return_code,
+            output_format
+        ))
+    return results
+
+
+def command_batch(cmds, hostname=None, output_format=None,
+                  stop_on_failure=True, username=None, password=None,
+                  key_filename=None, timeout=None, connection_timeout=None):
+    """Executes several SSH commands on remote hostname in a single
+    round-trip, see :func:`execute_command_batch`.
+
+    Accepts the same connection arguments as :func:`command`.
+
+    :return: a list with one SSHCommandResult for each command which ran, in
+        the same order as ``cmds``
+    """
+    hostname = hostname or settings.server.hostname
+    if timeout is None:
+        timeout = settings.ssh_client.command_timeout
+    if connection_timeout is None:
+        connection_timeout = settings.ssh_client.connection_timeout
+    with ssh_metrics.measure(u'; '.join(cmds), hostname):
+        with get_pooled_connection(
+                hostname=hostname, username=username, password=password,
+                key_filename=key_filename,
+                timeout=connection_timeout) as connection:
+            return execute_command_batch(
+                cmds, connection, output_format, stop_on_failure, timeout,
+                connection_timeout)
 
 
 def is_ssh_pub_key(key):
@@ -0,0 +1,97 @@
+"""asyncio counterpart of :mod:`robottelo.ssh`.
+
+The coroutines in this module accept the same arguments and return the same
+:class:`robottelo.ssh.SSHCommandResult` objects as their :mod:`robottelo.ssh`
+counterparts, including the hammer csv and json output parsing. They run the
+blocking paramiko calls in the event loop default executor, sharing the
+connection pool and the ``settings.ssh_client`` timeouts with
+:mod:`robottelo.ssh`, so several remote operations can overlap inside a single
+process::
+
+    results = loop.run_until_complete(asyncio.gather(
+        ssh_aio.command('hammer repository synchronize --id 1'),
+        ssh_aio.command('subscription-manager register ...', hostname=vm),
+    ))
+
+"""
+import asyncio
+import functools
+
+from robottelo import ssh
+
+
+async def _run_in_executor(func, *args, **kwargs):
+    """Run ``func`` in the event loop default executor and return its
+    result.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(
+        None, functools.partial(func, *args, **kwargs))
+
+
+async def command(cmd, hostname=None, output_format=None, username=None,
+                  password=None, key_filename=None, timeout=None,
+                  connection_timeout=None):
+    """Executes SSH command(s) on remote hostname.
+
+    See :func:`robottelo.ssh.command` for the arguments.
+
+    :return: SSHCommandResult
+    """
+    return await _run_in_executor(
+        ssh.command,
+        cmd,
+        hostname=hostname,
+        output_format=output_format,
+        username=username,
+        password=password,
+        key_filename=key_filename,
+        timeout=timeout,
+        connection_timeout=connection_timeout,
+    )
+
+
+async def execute_command(cmd, connection, output_format=None, timeout=None,
+                          connection_timeout=None):
+    """Execute a command via ssh in the given connection.
+
+    See :func:`robottelo.ssh.execute_command` for the arguments.
+
+    :return: SSHCommandResult
+    """
+    return await _run_in_executor(
+        ssh.execute_command,
+        cmd,
+        connection,
+        output_format=output_format,
+        timeout=timeout,
+        connection_timeout=connection_timeout,
+    )
+
+
+async def upload_file(local_file, remote_file, key_filename=None,
+                      hostname=None):
+    """Upload a local file to a remote machine.
+
+    See :func:`robottelo.ssh.upload_file` for the arguments.
+    """
+    await _run_in_executor(
+        ssh.upload_file,
+        local_file,
+        remote_file,
+        key_filename=key_filename,
+        hostname=hostname,
+    )
+
+
+async def download_file(remote_file, local_file=None, hostname=None):
+    """Download a remote file to the local machine.
+
+    See :func:`robottelo.ssh.download_file` for the arguments.
+    """
+    await _run_in_executor(
+        ssh.download_file,
+        remote_file,
+        local_file=local_file,
+        hostname=hostname,
+    )
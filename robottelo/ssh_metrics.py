@@ -0,0 +1,265 @@
+"""Latency instrumentation of the commands run through :mod:`robottelo.ssh`.
+
+When ``settings.performance.ssh_metrics`` is enabled, every command run by
+:func:`robottelo.ssh.command` or streamed by :func:`robottelo.ssh.stream_command`
+records how long it took to:
+
+* ``connect``: establish the connection, 0 when a pooled one is reused
+* ``channel_open``: open the channel and start the command
+* ``execution``: wait for the command to finish remotely
+* ``parse``: decode and parse the output
+
+together with the number of bytes received, the host and, for hammer commands
+run by :meth:`robottelo.cli.base.Base.execute`, the ``command_base`` and
+``command_sub``.
+
+Each process appends its records as JSON lines to a file in
+``settings.performance.ssh_metrics_dir``, so the records of all the
+pytest-xdist workers can be aggregated at the end of the session by
+:func:`write_report`.
+"""
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from robottelo.config import settings
+
+logger = logging.getLogger(__name__)
+
+PHASES = ('connect', 'channel_open', 'execution', 'parse')
+PERCENTILES = (50, 95, 99)
+REPORT_FILE_NAME = 'report.json'
+
+_local = threading.local()
+_file_lock = threading.Lock()
+
+
+def is_enabled():
+    """Whether ssh commands should be measured."""
+    return bool(settings.performance and settings.performance.ssh_metrics)
+
+
+def get_metrics_dir():
+    """Return the directory where the records are stored."""
+    return settings.performance.ssh_metrics_dir or 'ssh_metrics'
+
+
+@contextmanager
+def tags(**kwargs):
+    """Tag the commands run by the current thread inside the block, for
+    example with the hammer ``command_base`` and ``command_sub``.
+    """
+    previous = getattr(_local, 'tags', {})
+    _local.tags = dict(previous, **kwargs)
+    try:
+        yield
+    finally:
+        _local.tags = previous
+
+
+def get_tags():
+    """Return the tags of the current thread."""
+    return dict(getattr(_local, 'tags', {}))
+
+
+def new_record(cmd, hostname, tags=None):
+    """Return a new record of the command, tagged with ``tags`` or with the
+    current thread tags, or ``None`` if the commands are not measured.
+
+    The caller fills the phases and saves it with :func:`save_record`, it is
+    used for the commands which are not run inside a single block of the
+    same thread, like the streamed ones, other commands use :func:`measure`.
+    """
+    if not is_enabled():
+        return None
+    if isinstance(cmd, bytes):
+        cmd = cmd.decode('utf-8', 'replace')
+    record = dict.fromkeys(PHASES, 0.0)
+    record.update(get_tags() if tags is None else tags)
+    record.update({
+        'host': hostname,
+        'command': cmd.split(None, 1)[0] if cmd.split() else '',
+        'bytes': 0,
+        'worker': os.environ.get('PYTEST_XDIST_WORKER', 'master'),
+        'pid': os.getpid(),
+        'start': time.time(),
+        'status': 'ok',
+    })
+    return record
+
+
+def save_record(record):
+    """Set the total time of a record created by :func:`new_record` and
+    save it.
+    """
+    record['total'] = time.time() - record['start']
+    _save(record)
+
+
+@contextmanager
+def measure(cmd, hostname):
+    """Measure the command run by the current thread inside the block.
+
+    The phases are filled by :func:`add` calls and the record is saved when
+    the block exits, even if the command failed.
+    """
+    if getattr(_local, 'record', None) is not None:
+        yield
+        return
+    record = new_record(cmd, hostname)
+    if record is None:
+        yield
+        return
+    _local.record = record
+    try:
+        yield
+    except Exception as err:
+        record['status'] = type(err).__name__
+        raise
+    finally:
+        _local.record = None
+        save_record(record)
+
+
+def add(name, value):
+    """Add ``value`` to the ``name`` field of the record being measured by
+    the current thread, if any.
+    """
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record[name] = record.get(name, 0) + value
+
+
+@contextmanager
+def timer(phase):
+    """Add the time spent inside the block to ``phase``."""
+    start = time.time()
+    try:
+        yield
+    finally:
+        add(phase, time.time() - start)
+
+
+def _save(record):
+    """Append the record to the current process records file."""
+    directory = get_metrics_dir()
+    path = os.path.join(directory, 'ssh_metrics_{0}.jsonl'.format(
+        os.getpid()))
+    with _file_lock:
+        try:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with open(path, 'a') as handler:
+                handler.write(json.dumps(record) + '\n')
+        except (IOError, OSError) as err:
+            logger.warning('Could not save ssh metrics record: %s', err)
+
+
+def clear(directory=None):
+    """Remove the records of a previous session."""
+    directory = directory or get_metrics_dir()
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith('ssh_metrics_') and name.endswith('.jsonl'):
+            os.remove(os.path.join(directory, name))
+
+
+def load_records(directory=None):
+    """Read the records saved by all the processes."""
+    directory = directory or get_metrics_dir()
+    records = []
+    if not os.path.isdir(directory):
+        return records
+    for name in sorted(os.listdir(directory)):
+        if not (name.startswith('ssh_metrics_') and name.endswith('.jsonl')):
+            continue
+        with open(os.path.join(directory, name)) as handler:
+            for line in handler:
+                if line.strip():
+                    records.append(json.loads(line))
+    return records
+
+
+def command_type(record):
+    """Return the name records are grouped by, ``hammer <base> <sub>`` for
+    hammer commands and the executable name for other commands.
+    """
+    if record.get('command_base'):
+        return u'hammer {0} {1}'.format(
+            record['command_base'], record.get('command_sub') or '').strip()
+    return record.get('command') or u''
+
+
+def percentile(values, percent):
+    """Return the nearest-rank ``percent`` percentile of sorted
+    ``values``.
+    """
+    if not values:
+        return 0.0
+    rank = int(math.ceil(percent / 100.0 * len(values)))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+def aggregate(records):
+    """Group the records by command type and compute their statistics.
+
+    :return: a dict mapping each command type to its ``count``, ``failures``,
+        ``bytes``, ``total`` time, ``p50``, ``p95`` and ``p99`` of the total
+        time and the time spent in each phase.
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(command_type(record), []).append(record)
+    stats = {}
+    for name, group in groups.items():
+        totals = sorted(record['total'] for record in group)
+        stats[name] = {
+            'count': len(group),
+            'failures': sum(
+                1 for record in group if record.get('status') != 'ok'),
+            'bytes': sum(record.get('bytes', 0) for record in group),
+            'total': sum(totals),
+            'hosts': sorted(set(record.get('host') for record in group)),
+        }
+        for percent in PERCENTILES:
+            stats[name]['p{0}'.format(percent)] = percentile(totals, percent)
+        for phase in PHASES:
+            stats[name][phase] = sum(record.get(phase, 0) for record in group)
+    return stats
+
+
+def format_report(stats):
+    """Return a text table of the statistics sorted by total time."""
+    lines = [
+        u'{0:<50} {1:>7} {2:>10} {3:>8} {4:>8} {5:>8} {6:>10} {7:>10}'.format(
+            'command', 'count', 'total(s)', 'p50(s)', 'p95(s)', 'p99(s)',
+            'connect(s)', 'parse(s)')
+    ]
+    ordered = sorted(
+        stats.items(), key=lambda item: item[1]['total'], reverse=True)
+    for name, stat in ordered:
+        lines.append(
+            u'{0:<50} {1:>7} {2:>10.2f} {3:>8.3f} {4:>8.3f} {5:>8.3f} '
+            u'{6:>10.2f} {7:>10.2f}'.format(
+                name[:50], stat['count'], stat['total'], stat['p50'],
+                stat['p95'], stat['p99'], stat['connect'], stat['parse'])
+        )
+    return u'\n'.join(lines)
+
+
+def write_report(directory=None):
+    """Aggregate the records of all the processes, export the statistics to
+    ``report.json`` in the metrics directory and return the text report.
+    """
+    directory = directory or get_metrics_dir()
+    stats = aggregate(load_records(directory))
+    if not stats:
+        return u''
+    with open(os.path.join(directory, REPORT_FILE_NAME), 'w') as handler:
+        json.dump(stats, handler, indent=2, sort_keys=True)
+    return format_report(stats)
@@ -413,12 +413,10 @@ gpgcheck=0'''.format(name, url)
         url = urlunsplit(('http', capsule, 'pub/', '', ''))
         ca_url = urljoin(
             url, 'katello-ca-consumer-latest.noarch.rpm')
-        ssh.command(
+        result = ssh.command_batch([
             u'rpm -Uvh {0}'.format(ca_url),
-            self.ip_addr
-        )
-        result = ssh.command(
-            u'rpm -q katello-ca-consumer-{0}'.format(capsule), self.ip_addr)
+            u'rpm -q katello-ca-consumer-{0}'.format(capsule),
+        ], self.ip_addr, stop_on_failure=False)[-1]
         if result.return_code != 0:
             raise VirtualMachineError('Failed to install the katello-ca rpm')
 
@@ -547,6 +545,33 @@ gpgcheck=0'''.format(name, url)
 
         return ssh.command(cmd, hostname=self.ip_addr, timeout=timeout)
 
+    def run_batch(self, cmds, timeout=None, stop_on_failure=True):
+        """Runs several ssh commands on the virtual machine in a single
+        round-trip
+
+        :param list cmds: Commands to run on the virtual machine, in order
+        :param int timeout: Time to wait for all the commands to finish
+        :param bool stop_on_failure: Whether to stop at the first command
+            finishing with a non zero return code
+        :return: A list of :class:`robottelo.ssh.SSHCommandResult`
+            instances, one for each command which ran
+        :raises robottelo.vm.VirtualMachineError: If the virtual machine is not
+            created.
+
+        """
+        if not self._created:
+            raise VirtualMachineError(
+                'The virtual machine should be created before running any ssh '
+                'command'
+            )
+
+        return ssh.command_batch(
+            cmds,
+            hostname=self.ip_addr,
+            timeout=timeout,
+            stop_on_failure=stop_on_failure,
+        )
+
     def get(self, remote_path, local_path=None):
         """Get a remote file from the virtual machine."""
         if not self._created:
@@ -603,16 +628,18 @@ gpgcheck=0'''.format(name, url)
             'environment     = production\n'
             'server          = {1}\n'
             .format(proxy_hostname, proxy_hostname))
-        result = self.run(u'yum install puppet -y')
-        if result.return_code != 0:
+        results = self.run_batch([
+            u'yum install puppet -y',
+            'echo "{0}" >> /etc/puppetlabs/puppet/puppet.conf'
+            .format(puppet_conf),
+        ])
+        if results[0].return_code != 0:
             raise VirtualMachineError(
                 'Failed to install the puppet rpm')
-        self.run(
-            'echo "{0}" >> /etc/puppetlabs/puppet/puppet.conf'
-            .format(puppet_conf))
         # This particular puppet run on client would populate a cert on
         # sat6 under the capsule --> certifcates or on capsule via cli "puppet
-        # cert list", so that we sign it.
+        # cert list", so that we sign it. It is not part of the batch, so it
+        # gets its own command timeout like the rpm installation.
         self.run(u'puppet agent -t')
         ssh.command(cmd=u'puppet cert sign --all', hostname=proxy_hostname)
         # This particular puppet run would create the host entity under
@@ -230,9 +230,11 @@ class CapsuleVirtualMachine(VirtualMachine):
             maint=settings.satmaintenance_repo
         )
         self.configure_rhel_repo(settings.__dict__[self.distro[:-1] + '_repo'])
-        self.run('yum repolist')
-        self.run('yum -y install satellite-capsule', timeout=900)
-        result = self.run('rpm -q satellite-capsule')
+        result = self.run_batch([
+            'yum repolist',
+            'yum -y install satellite-capsule',
+            'rpm -q satellite-capsule',
+        ], timeout=1200, stop_on_failure=False)[-1]
         if result.return_code != 0:
             raise CapsuleVirtualMachineError(
                 u'Failed to install satellite-capsule package\n{}'.format(
@@ -1,35 +1,273 @@
 """Generate hammer command tree in json format by inspecting every command's
 help.
 
+The tree is walked level by level, the ``--help`` of all the commands of a
+level are run in batches, each batch is a single SSH round-trip, and the
+batches run concurrently over the pooled connections::
+
+    python scripts/hammer_command_tree.py --workers 8 --batch-size 20
+
+Every help output is kept in an on-disk cache, so running the script again,
+or resuming an interrupted run, only fetches the help of the commands not yet
+cached. The help of each top level command subtree, ``hammer organization``
+and all its subcommands for example, is keyed by the versions of the RPMs
+owning the ruby files of the subtree command classes, their ancestors and
+extensions. Upgrading a hammer plugin RPM only refetches the subtrees it
+provides or extends. The ``hammer`` help, and the subtrees whose files are not
+all owned by an RPM, are keyed by the versions of all the hammer RPMs.
+
+The tree is written with sorted keys and subcommands, so regenerating it
+gives a minimal diff.
 """
+import argparse
 import json
+import os
 
+from concurrent.futures import as_completed, ThreadPoolExecutor
 from robottelo import ssh
 from robottelo.cli import hammer
 from robottelo.config import settings
 
+# print the RPMs owning the files of each top level hammer command subtree
+SUBTREE_RPMS_SCRIPT = u'''\
+require 'json'
+require 'hammer_cli'
+require 'hammer_cli/settings'
+HammerCLI::Settings.load_from_defaults
+HammerCLI::Modules.load_all
+
+def source_files(klass, files)
+  modules = klass.ancestors
+  if klass.respond_to?(:command_extensions)
+    modules += klass.command_extensions.map(&:class)
+  end
+  # only the hammer and hammer plugins modules, not the ruby core ones
+  modules.select { |mod| mod.name.to_s.start_with?('HammerCLI') }.each do |mod|
+    names = mod.instance_methods(false) + mod.private_instance_methods(false)
+    names.each do |name|
+      location = mod.instance_method(name).source_location
+      files << location[0] if location
+    end
+  end
+  if klass.respond_to?(:recognised_subcommands)
+    klass.recognised_subcommands.each do |subcommand|
+      source_files(subcommand.subcommand_class, files)
+    end
+  end
+  files
+end
+
+subtrees = {}
+HammerCLI::MainCommand.recognised_subcommands.each do |subcommand|
+  files = source_files(subcommand.subcommand_class, []).uniq.sort
+  rpms = IO.popen(
+    ['rpm', '-qf', '--queryformat', '%{NAME}-%{VERSION}-%{RELEASE}\\n'] +
+    files, err: File::NULL, &:readlines).map(&:strip)
+  # a file not owned by any package has no version
+  owned = $?.success? && rpms.length == files.length
+  subcommand.names.each do |name|
+    subtrees[name] = owned ? rpms.uniq.sort.join("\\n") : nil
+  end
+end
+puts(JSON.generate(subtrees))
+'''
+
+
+def get_hammer_versions():
+    """Return the sorted name and version of the hammer RPMs installed on
+    the server.
+    """
+    result = ssh.command("rpm -qa '*hammer*' | sort")
+    return u'\n'.join(line for line in result.stdout if line)
+
+
+def get_subtree_versions(versions):
+    """Return a dictionary mapping each top level hammer command to the
+    versions of the RPMs providing its subtree, ``versions``, the versions of
+    all the hammer RPMs, when they are not known.
+    """
+    result = ssh.command(
+        u'HAMMER=$(command -v hammer) && '
+        u'RUBY=$(head -n 1 "$HAMMER" | sed -n "s/^#! *//p") && '
+        u"$RUBY - <<'EOF'\n{0}EOF".format(SUBTREE_RPMS_SCRIPT)
+    )
+    try:
+        subtrees = json.loads(u'\n'.join(result.stdout))
+    except ValueError:
+        subtrees = None
+    if result.return_code != 0 or not isinstance(subtrees, dict):
+        print(u'The RPMs of the hammer commands are not known, the whole '
+              u'cache is invalidated by any hammer RPM upgrade: {0}'
+              .format(result.stderr))
+        return {}
+    return {
+        name: subtree_versions or versions
+        for name, subtree_versions in subtrees.items()
+    }
+
+
+def _subtree(command):
+    """Return the top level command of ``command``, ``''`` for ``hammer``."""
+    parts = command.split(' ', 2)
+    return parts[1] if len(parts) > 1 else ''
+
+
+def _versions(subtree_versions, versions, command):
+    """Return the versions the help of ``command`` is cached for."""
+    return subtree_versions.get(_subtree(command), versions)
+
+
+def load_cache(path, versions, subtree_versions):
+    """Return the help outputs cached in ``path`` whose subtree versions are
+    the current ones.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path) as handler:
+        try:
+            cache = json.load(handler)
+        except ValueError:
+            return {}
+    helps = {}
+    for subtree, cached in cache.get('subtrees', {}).items():
+        if cached.get('versions') == subtree_versions.get(subtree, versions):
+            helps.update(cached.get('help', {}))
+    return helps
 
-def generate_command_tree(command):
-    """Recursively walk trhough the hammer commands and subcommands and fetch
-    their help. Return a dictionary with the contents.
 
+def save_cache(path, versions, subtree_versions, helps):
+    """Write the ``helps`` outputs, grouped by subtree with their versions,
+    to ``path``.
     """
-    output = ssh.command('{0} --help'.format(command)).stdout
-    contents = hammer.parse_help(output)
-    if len(contents['subcommands']) > 0:
-        for subcommand in contents['subcommands']:
-            subcommand.update(generate_command_tree(
-                '{0} {1}'.format(command, subcommand['name'])
-            ))
-    return contents
-
-
-settings.configure()
-
-# Generate the json file in the working directory
-with open('hammer_commands.json', 'w') as f:
-    f.write(json.dumps(
-        generate_command_tree('hammer'),
-        indent=2,
-        sort_keys=True
-    ))
+    if not path:
+        return
+    subtrees = {}
+    for command, output in helps.items():
+        subtree = _subtree(command)
+        cached = subtrees.setdefault(subtree, {
+            'versions': _versions(subtree_versions, versions, command),
+            'help': {},
+        })
+        cached['help'][command] = output
+    temp_path = '{0}.tmp'.format(path)
+    with open(temp_path, 'w') as handler:
+        json.dump(
+            {'subtrees': subtrees},
+            handler,
+            indent=2,
+            sort_keys=True,
+        )
+    os.rename(temp_path, path)
+
+
+def fetch_help(commands, workers, batch_size, helps, save=None):
+    """Run the ``--help`` of ``commands`` and add each command help output
+    lines to ``helps``, batch by batch. ``save`` is called after each batch,
+    so the help fetched before an error is kept.
+
+    :raises RuntimeError: once all the batches are done, if a help failed.
+    """
+    batches = [
+        commands[index:index + batch_size]
+        for index in range(0, len(commands), batch_size)
+    ]
+
+    def run(batch):
+        return ssh.command_batch(
+            ['{0} --help'.format(command) for command in batch],
+            stop_on_failure=False,
+        )
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run, batch): batch for batch in batches}
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                results = future.result()
+            except Exception as err:
+                errors.append(u'{0} --help failed: {1}'.format(
+                    u', '.join(batch), err))
+                continue
+            for command, result in zip(batch, results):
+                if result.return_code != 0:
+                    errors.append(u'{0} --help failed: {1}'.format(
+                        command, result.stderr))
+                else:
+                    helps[command] = result.stdout
+            if save is not None:
+                save()
+    if errors:
+        raise RuntimeError(u'\n'.join(errors))
+
+
+def generate_command_tree(command='hammer', workers=8, batch_size=20,
+                          cache_path=None):
+    """Walk through the hammer commands and subcommands level by level and
+    fetch their help. Return a dictionary with the contents.
+
+    """
+    versions = get_hammer_versions()
+    subtree_versions = get_subtree_versions(versions) if cache_path else {}
+    helps = load_cache(cache_path, versions, subtree_versions)
+    contents = {}
+    level = [command]
+    while level:
+        missing = [name for name in level if name not in helps]
+        if missing:
+            fetch_help(
+                missing, workers, batch_size, helps,
+                save=lambda: save_cache(
+                    cache_path, versions, subtree_versions, helps),
+            )
+        next_level = []
+        for name in level:
+            contents[name] = hammer.parse_help(helps[name])
+            contents[name]['subcommands'].sort(
+                key=lambda subcommand: subcommand['name'])
+            next_level.extend(
+                '{0} {1}'.format(name, subcommand['name'])
+                for subcommand in contents[name]['subcommands']
+            )
+        level = next_level
+
+    def build(name):
+        tree = contents[name]
+        for subcommand in tree['subcommands']:
+            subcommand.update(
+                build('{0} {1}'.format(name, subcommand['name'])))
+        return tree
+
+    return build(command)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument(
+        '--output', default='hammer_commands.json',
+        help='path of the generated json file')
+    parser.add_argument(
+        '--cache', default='.hammer_command_tree_cache.json',
+        help='path of the help output cache, empty to disable it')
+    parser.add_argument(
+        '--workers', type=int, default=8,
+        help='number of batches running at the same time')
+    parser.add_argument(
+        '--batch-size', type=int, default=20,
+        help='number of --help commands sent in one SSH round-trip')
+    args = parser.parse_args()
+
+    settings.configure()
+    tree = generate_command_tree(
+        workers=args.workers,
+        batch_size=args.batch_size,
+        cache_path=args.cache,
+    )
+    with open(args.output, 'w') as handler:
+        json.dump(
+            tree, handler, indent=2, sort_keys=True, separators=(',', ': '))
+        handler.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Measure the per command overhead of ``robottelo.ssh.execute_command``.
+
+A local SSH server stand-in is started in a thread, it answers every exec
+request after a fixed delay, which simulates a short hammer command. The same
+commands are then run using the previous ``exit_status_ready`` sleep polling
+and the current channel status event wait, and the average wall clock time of
+both is printed::
+
+    python scripts/ssh_command_benchmark.py --commands 20 --delay 0.2
+
+"""
+from __future__ import print_function
+
+import argparse
+import socket
+import threading
+import time
+
+import paramiko
+
+from robottelo import ssh
+
+
+class StandInServer(paramiko.ServerInterface):
+    """Accept any password and answer exec requests after ``delay``
+    seconds with the command echoed to stdout.
+    """
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_exec_request(self, channel, command):
+        thread = threading.Thread(target=self._run, args=(channel, command))
+        thread.daemon = True
+        thread.start()
+        return True
+
+    def _run(self, channel, command):
+        time.sleep(self.delay)
+        channel.sendall(command + b'\n')
+        channel.send_exit_status(0)
+        channel.close()
+
+
+def serve(sock, delay):
+    """Accept connections on ``sock`` and serve them with a
+    :class:`StandInServer`.
+    """
+    host_key = paramiko.RSAKey.generate(2048)
+    while True:
+        conn, _ = sock.accept()
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(host_key)
+        transport.start_server(server=StandInServer(delay))
+
+
+def legacy_execute_command(cmd, connection, timeout):
+    """Run ``cmd`` waiting for its completion the way ``execute_command``
+    did before, polling ``exit_status_ready`` every second.
+    """
+    _, stdout, stderr = connection.exec_command(cmd)
+    end_time = time.time() + timeout
+    while time.time() < end_time:
+        if stdout.channel.exit_status_ready():
+            break
+        time.sleep(1)
+    stdout.channel.recv_exit_status()
+    return stdout.read(), stderr.read()
+
+
+def measure(func, connection, commands):
+    """Return the average time, in seconds, to run ``commands`` commands."""
+    start = time.time()
+    for index in range(commands):
+        func('echo {0}'.format(index), connection, timeout=30)
+    return (time.time() - start) / commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--commands', type=int, default=10)
+    parser.add_argument('--delay', type=float, default=0.2,
+                        help='remote command duration in seconds')
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(5)
+    server = threading.Thread(target=serve, args=(sock, args.delay))
+    server.daemon = True
+    server.start()
+
+    client = ssh._call_paramiko_sshclient()
+    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    client.connect('127.0.0.1', port=sock.getsockname()[1],
+                   username='benchmark', password='benchmark',
+                   look_for_keys=False, allow_agent=False)
+    try:
+        before = measure(legacy_execute_command, client, args.commands)
+        after = measure(ssh.execute_command, client, args.commands)
+    finally:
+        client.close()
+
+    print('remote command duration: {0:.3f}s'.format(args.delay))
+    print('sleep polling:  {0:.3f}s per command, {1:.3f}s overhead'.format(
+        before, before - args.delay))
+    print('status event:   {0:.3f}s per command, {1:.3f}s overhead'.format(
+        after, after - args.delay))
+
+
+if __name__ == '__main__':
+    main()
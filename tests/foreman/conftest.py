@@ -10,8 +10,10 @@ except ImportError:
     pass
 from time import time
 from types import SimpleNamespace
+from robottelo import lock_metrics, ssh_metrics
+from robottelo.cli import cache as cli_cache, entity_pool
 from robottelo.config import settings
-from robottelo.decorators import setting_is_set
+from robottelo.decorators import factory_cache, setting_is_set
 from robottelo.bz_helpers import get_deselect_bug_ids, group_by_key
 from robottelo.helpers import get_func_name
 
@@ -145,6 +147,88 @@ def pytest_configure():
     })
 
 
+def pytest_sessionstart(session):
+    """Remove the ssh and lock metrics records of a previous session,
+    workers share the records directories so only the master does it.
+    """
+    if not settings.configured:
+        settings.configure()
+    if hasattr(session.config, 'slaveinput'):
+        return
+    if ssh_metrics.is_enabled():
+        ssh_metrics.clear()
+    if lock_metrics.is_enabled():
+        lock_metrics.clear()
+
+
+def pytest_sessionfinish(session):
+    """Aggregate the ssh and lock metrics records of all the workers once
+    they are done and log the hammer and factory cache statistics of each process.
+    """
+    if cli_cache.is_enabled():
+        log('hammer cache statistics: {0}'.format(cli_cache.get_stats()),
+            'INFO')
+    factory_stats = factory_cache.get_stats()
+    if factory_stats:
+        log('factory cache statistics: {0}'.format(factory_stats), 'INFO')
+    if ssh_metrics.is_enabled() and not hasattr(session.config, 'slaveinput'):
+        report = ssh_metrics.write_report()
+        if report:
+            log('SSH commands latency report:\n{0}'.format(report), 'INFO')
+    if lock_metrics.is_enabled() and not hasattr(session.config, 'slaveinput'):
+        report = lock_metrics.write_report()
+        if report:
+            log('Lock contention report:\n{0}'.format(report), 'INFO')
+
+
+# entity pool of the pooled_* fixtures
+POOL_FIXTURES = {
+    'pooled_org_with_manifest': 'org_with_manifest',
+    'pooled_org_with_custom_repo': 'org_with_custom_repo',
+    'shared_org_with_custom_repo': 'org_with_custom_repo',
+}
+
+
+def pytest_collection_finish(session):
+    """Start filling the entity pools used by the collected tests."""
+    if not entity_pool.is_enabled():
+        return
+    names = {
+        POOL_FIXTURES[fixture]
+        for item in session.items
+        for fixture in getattr(item, 'fixturenames', ())
+        if fixture in POOL_FIXTURES
+    }
+    if names:
+        log('Filling entity pools {0}'.format(sorted(names)), 'INFO')
+        entity_pool.warm(*sorted(names))
+
+
+@pytest.fixture
+def pooled_org_with_manifest():
+    """An organization with a manifest uploaded, for this test only."""
+    with entity_pool.checkout('org_with_manifest') as item:
+        yield item['org']
+
+
+@pytest.fixture
+def pooled_org_with_custom_repo():
+    """The entities ids of ``setup_org_for_a_custom_repo`` for this test
+    only.
+    """
+    with entity_pool.checkout('org_with_custom_repo') as item:
+        yield item
+
+
+@pytest.fixture
+def shared_org_with_custom_repo():
+    """The entities ids of ``setup_org_for_a_custom_repo`` shared with the
+    other tests, they must not be changed.
+    """
+    with entity_pool.checkout('org_with_custom_repo', shared=True) as item:
+        yield item
+
+
 def _extract_setup_class_ids(item):
     setup_class_method = getattr(item.parent.obj, 'setUpClass', None)
     return getattr(setup_class_method, 'bugzilla_ids', [])
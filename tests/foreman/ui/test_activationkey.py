@@ -1154,7 +1154,7 @@ def test_positive_add_multiple_aks_to_system(session, module_org):
 @skip_if_not_set('clients')
 @tier3
 @upgrade
-def test_positive_host_associations(session):
+def test_positive_host_associations(session, pooled_org_with_custom_repo):
     """Register few hosts with different activation keys and ensure proper
     data is reflected under Associations > Content Hosts tab
 
@@ -1167,11 +1167,8 @@ def test_positive_host_associations(session):
 
     :CaseLevel: System
     """
-    org = entities.Organization().create()
-    org_entities = setup_org_for_a_custom_repo({
-        'url': FAKE_1_YUM_REPO,
-        'organization-id': org.id,
-    })
+    org_entities = pooled_org_with_custom_repo
+    org = entities.Organization(id=org_entities['organization-id']).read()
     ak1 = entities.ActivationKey(
         id=org_entities['activationkey-id']).read()
     ak2 = entities.ActivationKey(
@@ -0,0 +1,99 @@
+# -*- encoding: utf-8 -*-
+"""Benchmarks of the contended function locks.
+
+``PROCESSES`` processes take turns on the same lock, each one holding it
+``ACQUISITIONS`` times for ``HOLD`` seconds, compared for the file lock of
+:mod:`robottelo.decorators.func_locker` and the sleep polling file lock of
+``pytest_services``. The ideal duration of a round is
+``PROCESSES * ACQUISITIONS * HOLD`` seconds.
+
+The wake-up benchmark measures the time between the release of the lock by
+an other process and its acquisition by a waiting one, the
+``extra_info`` of the benchmark holds the mean and maximum wake-up latency.
+"""
+import multiprocessing
+import time
+
+import pytest
+
+from robottelo.decorators import func_locker
+
+pytest.importorskip('pytest_benchmark')
+polling_locks = pytest.importorskip('pytest_services.locks')
+
+PROCESSES = 16
+ACQUISITIONS = 5
+HOLD = 0.01
+WAKE_UPS = 20
+
+
+def _func_locker_lock(file_path):
+    return func_locker.file_lock(file_path)
+
+
+def _polling_lock(file_path):
+    return polling_locks.file_lock(file_path, remove=False)
+
+
+LOCKS = {
+    'func_locker': _func_locker_lock,
+    'polling': _polling_lock,
+}
+
+
+def _contend(args):
+    lock_name, file_path = args
+    for _ in range(ACQUISITIONS):
+        with LOCKS[lock_name](file_path):
+            time.sleep(HOLD)
+
+
+@pytest.mark.parametrize('lock_name', sorted(LOCKS))
+def test_contended_acquisition(benchmark, tmpdir, lock_name):
+    file_path = str(tmpdir.join('benchmark.lock'))
+    pool = multiprocessing.Pool(PROCESSES)
+    try:
+        benchmark.pedantic(
+            pool.map, args=(_contend, [(lock_name, file_path)] * PROCESSES),
+            rounds=3)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _hold(lock_name, file_path, connection):
+    """Hold the lock for HOLD seconds on every request of ``connection`` and
+    send the release time
+    """
+    while connection.recv():
+        with LOCKS[lock_name](file_path):
+            connection.send('locked')
+            time.sleep(HOLD)
+            released = time.time()
+        connection.send(released)
+
+
+@pytest.mark.parametrize('lock_name', sorted(LOCKS))
+def test_wake_up_latency(benchmark, tmpdir, lock_name):
+    file_path = str(tmpdir.join('benchmark.lock'))
+    connection, holder_connection = multiprocessing.Pipe()
+    holder = multiprocessing.Process(
+        target=_hold, args=(lock_name, file_path, holder_connection))
+    holder.start()
+    latencies = []
+
+    def wake_up():
+        connection.send(True)
+        connection.recv()
+        with LOCKS[lock_name](file_path):
+            acquired = time.time()
+        latencies.append(acquired - connection.recv())
+
+    try:
+        benchmark.pedantic(wake_up, rounds=WAKE_UPS)
+    finally:
+        connection.send(False)
+        holder.join()
+    benchmark.extra_info['mean_latency'] = sum(latencies) / len(latencies)
+    benchmark.extra_info['max_latency'] = max(latencies)
+    assert max(latencies) < 0.5
@@ -0,0 +1,113 @@
+# -*- encoding: utf-8 -*-
+"""Benchmarks of the hammer output parsers.
+
+Run them with ``make test-robottelo-benchmark`` and compare two runs with
+``py.test-benchmark compare``. The sizes are the number of records of the
+parsed output: versions of a content view, rows of a list, options of a help.
+"""
+import json
+import pytest
+
+from robottelo.cli import hammer
+
+pytest.importorskip('pytest_benchmark')
+
+SIZES = (10, 100, 1000)
+
+
+def _info_output(size):
+    """Return the lines of a content view info with ``size`` versions."""
+    output = [
+        'ID:                     3',
+        'Name:                   cv1',
+        'Composite:              false',
+        'Description:            ',
+        'Organization:           Default Organization',
+        'Lifecycle Environments: ',
+        ' 1) ID:   1',
+        '    Name: Library',
+        'Versions:               ',
+    ]
+    for index in range(1, size + 1):
+        output.extend([
+            ' {0}) ID:        {0}'.format(index),
+            '    Version:   {0}.0'.format(index),
+            '    Published: 2019/07/10 11:02:11',
+        ])
+    output.extend([
+        'Activation Keys:        ',
+        '    ak1',
+        '    ak2',
+    ])
+    return output
+
+
+def _csv_output(size):
+    """Return the lines of a list with ``size`` rows."""
+    output = [u'ID,Name,Label,Description']
+    output.extend(
+        u'{0},name {0},label_{0},"quoted, ""description"" {0}"'.format(index)
+        for index in range(1, size + 1)
+    )
+    return output
+
+
+def _json_output(size):
+    """Return the text of a JSON list of ``size`` objects."""
+    return json.dumps([
+        {
+            'ID': index,
+            'Name': 'name {0}'.format(index),
+            'Lifecycle Environments': [{'ID': 1, 'Name': 'Library'}],
+        }
+        for index in range(1, size + 1)
+    ])
+
+
+def _help_output(size):
+    """Return the lines of a help with ``size`` subcommands and options."""
+    output = ['Usage:', '    hammer [OPTIONS] SUBCOMMAND [ARG] ...', '',
+              'Subcommands:']
+    for index in range(size):
+        output.extend([
+            ' subcommand-{0}                 Manipulate things'.format(index),
+            '                               on the server',
+        ])
+    output.append('Options:')
+    for index in range(size):
+        output.extend([
+            ' --option-{0} VALUE             An option'.format(index),
+            '                               with a long help',
+        ])
+        output.append(
+            ' -o, --output-{0} ADAPTER       Output format'.format(index))
+    return output
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_parse_info(benchmark, size):
+    output = _info_output(size)
+    result = benchmark(hammer.parse_info, output)
+    assert len(result['versions']) == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_parse_csv(benchmark, size):
+    output = _csv_output(size)
+    result = benchmark(hammer.parse_csv, output)
+    assert len(result) == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_parse_json(benchmark, size):
+    output = _json_output(size)
+    result = benchmark(hammer.parse_json, output)
+    assert len(result) == size
+
+
+@pytest.mark.parametrize('size', SIZES)
+def test_parse_help(benchmark, size):
+    output = _help_output(size)
+    result = benchmark(hammer.parse_help, output)
+    assert len(result['subcommands']) == size
+    assert len(result['options']) == 2 * size
@@ -0,0 +1,171 @@
+"""Tests for the entity builder of module ``robottelo.cli.factory``."""
+import threading
+import time
+
+from robottelo.cli import factory
+from robottelo.cli.base import CLIReturnCodeError
+from robottelo.cli.factory import CLIFactoryError, EntityBuilder, Ref
+from unittest import mock
+from unittest2 import TestCase
+
+
+class EntityBuilderTestCase(TestCase):
+    """Tests for :class:`robottelo.cli.factory.EntityBuilder`."""
+
+    def setUp(self):
+        patcher = mock.patch('robottelo.cli.executor.settings')
+        settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        settings.server.hostname = 'example.com'
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.created = []
+
+    def factory(self, kind):
+        def make(options):
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            time.sleep(0.05)
+            with self.lock:
+                self.running -= 1
+                self.created.append(kind)
+            if options.get('fail'):
+                raise CLIFactoryError('Failed to create {0}'.format(kind))
+            return dict(options, id=len(self.created), kind=kind)
+        return make
+
+    def test_levels(self):
+        builder = EntityBuilder()
+        org = builder.add('org', self.factory('org'))
+        product = builder.add(
+            'product', self.factory('product'), {'organization-id': org})
+        builder.add('lce', self.factory('lce'), {'organization-id': org})
+        builder.add('repo', self.factory('repo'), {'product-id': product})
+        builder.add('cv', self.factory('cv'), {
+            'organization-id': org,
+            'repository-ids': [Ref('repo')],
+        })
+        self.assertEqual(
+            builder.levels(),
+            [['org'], ['product', 'lce'], ['repo'], ['cv']]
+        )
+
+    def test_build(self):
+        builder = EntityBuilder()
+        org = builder.add('org', self.factory('org'))
+        builder.add('lce', self.factory('lce'), {'organization-id': org})
+        builder.add('cv', self.factory('cv'), {'organization-id': org})
+        builder.add('product', self.factory('product'),
+                    {'organization-label': Ref('org', 'kind')})
+        entities = builder.build()
+        self.assertEqual(entities['org']['id'], 1)
+        self.assertEqual(entities['lce']['organization-id'], 1)
+        self.assertEqual(entities['cv']['organization-id'], 1)
+        self.assertEqual(entities['product']['organization-label'], 'org')
+        self.assertEqual(self.max_running, 3)
+
+    def test_existing_record(self):
+        builder = EntityBuilder()
+        org = builder.add('org', self.factory('org'), record={'id': 10})
+        builder.add('lce', self.factory('lce'), {'organization-id': org})
+        entities = builder.build()
+        self.assertEqual(entities['lce']['organization-id'], 10)
+        self.assertEqual(self.created, ['lce'])
+
+    def test_rollback(self):
+        org_entity = mock.Mock()
+        product_entity = mock.Mock()
+        product_entity.delete.side_effect = CLIReturnCodeError(
+            1, 'error', 'Failed to delete')
+        builder = EntityBuilder()
+        org = builder.add('org', self.factory('org'), entity=org_entity)
+        builder.add('product', self.factory('product'),
+                    {'organization-id': org}, entity=product_entity)
+        builder.add('lce', self.factory('lce'),
+                    {'organization-id': org, 'fail': True})
+        builder.add('repo', self.factory('repo'),
+                    {'product-id': Ref('product')})
+        with self.assertRaises(CLIFactoryError):
+            builder.build()
+        self.assertNotIn('repo', self.created)
+        product_entity.delete.assert_called_once_with(
+            {'id': builder.records['product']['id']})
+        org_entity.delete.assert_called_once_with({'id': 1})
+
+    def test_invalid_references(self):
+        builder = EntityBuilder()
+        builder.add('lce', self.factory('lce'),
+                    {'organization-id': Ref('org')})
+        with self.assertRaises(CLIFactoryError):
+            builder.levels()
+        builder = EntityBuilder()
+        builder.add('a', self.factory('a'), {'b-id': Ref('b')})
+        builder.add('b', self.factory('b'), {'a-id': Ref('a')})
+        with self.assertRaises(CLIFactoryError):
+            builder.build()
+        self.assertEqual(self.created, [])
+
+    def patch_entities(self, names):
+        """Patch the factory functions and CLI classes of ``names``, a list
+        of ``(factory function, CLI class)`` name pairs, the functions create
+        entities with ``self.factory``.
+        """
+        entities = {}
+        for function, entity in names:
+            patcher = mock.patch.object(
+                factory, function, side_effect=self.factory(entity))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+            patcher = mock.patch.object(factory, entity)
+            entities[entity] = patcher.start()
+            self.addCleanup(patcher.stop)
+        return entities
+
+    def test_setup_org_for_a_custom_repo_rollback(self):
+        """Check the entities created by setup_org_for_a_custom_repo are
+        deleted when the creation of another one fails, but not the given
+        ones
+        """
+        entities = self.patch_entities([
+            ('make_org', 'Org'),
+            ('make_lifecycle_environment', 'LifecycleEnvironment'),
+            ('make_content_view', 'ContentView'),
+            ('make_product', 'Product'),
+            ('make_repository', 'Repository'),
+        ])
+        factory.make_repository.side_effect = CLIFactoryError(
+            'Failed to create repository')
+        with self.assertRaises(CLIFactoryError):
+            factory.setup_org_for_a_custom_repo({
+                'url': 'http://example.com/repo',
+                'content-view-id': 20,
+            })
+        self.assertEqual(
+            sorted(self.created), ['LifecycleEnvironment', 'Org', 'Product'])
+        for name in ('Org', 'LifecycleEnvironment', 'Product'):
+            entities[name].delete.assert_called_once_with(
+                {'id': self.created.index(name) + 1})
+        entities['ContentView'].delete.assert_not_called()
+        entities['Repository'].delete.assert_not_called()
+        entities['ContentView'].add_repository.assert_not_called()
+        entities['Repository'].synchronize.assert_not_called()
+
+    def test_configure_env_for_provision_rollback(self):
+        """Check the organization and location created by
+        configure_env_for_provision are deleted when the environment can not
+        be created
+        """
+        entities = self.patch_entities([
+            ('make_org', 'Org'),
+            ('make_location', 'Location'),
+            ('make_environment', 'Environment'),
+        ])
+        factory.make_environment.side_effect = CLIFactoryError(
+            'Failed to create environment')
+        with self.assertRaises(CLIFactoryError):
+            factory.configure_env_for_provision(loc={'id': 30})
+        self.assertEqual(self.created, ['Org'])
+        entities['Org'].delete.assert_called_once_with({'id': 1})
+        entities['Location'].delete.assert_not_called()
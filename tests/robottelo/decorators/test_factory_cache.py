@@ -0,0 +1,106 @@
+"""Tests for module ``robottelo.decorators.factory_cache``."""
+import importlib
+import shutil
+import tempfile
+
+from unittest2 import TestCase
+
+from robottelo.decorators import factory_cache
+from robottelo.decorators.func_shared.file_storage import FileStorageHandler
+from unittest import mock
+
+
+class FactoryCacheTestCase(TestCase):
+    """Tests for :class:`robottelo.decorators.factory_cache.FactoryCache`."""
+
+    def setUp(self):
+        patcher = mock.patch('robottelo.decorators.factory_cache.settings')
+        settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        settings.performance.factory_cache_size = 2
+        settings.performance.factory_cache_ttl = 60
+        settings.performance.factory_cache_validate_interval = 30
+        settings.performance.factory_cache_shared = False
+        self.settings = settings
+        self.cache = factory_cache.FactoryCache()
+        self.created = 0
+
+    def create(self):
+        self.created += 1
+        return {'id': self.created}
+
+    def get(self, options=None, validate=None, cache=None):
+        return (cache or self.cache).get_or_create(
+            'org', options, self.create, validate)
+
+    def test_make_key(self):
+        self.assertEqual(
+            factory_cache.make_key('org', {'a': 1, 'b': [1, 2]}),
+            factory_cache.make_key('org', {'b': [1, 2], 'a': 1}),
+        )
+        self.assertEqual(
+            factory_cache.make_key('org', None),
+            factory_cache.make_key('org', {}),
+        )
+        self.assertNotEqual(
+            factory_cache.make_key('org', {}),
+            factory_cache.make_key('location', {}),
+        )
+
+    def test_lru(self):
+        for name in ('a', 'b', 'a', 'c', 'a', 'b'):
+            self.get({'name': name})
+        # b was evicted by c
+        self.assertEqual(self.created, 4)
+        self.assertEqual(self.cache.get_stats()['org']['hits'], 2)
+
+    def test_ttl(self):
+        self.get()
+        self.settings.performance.factory_cache_ttl = -1
+        self.assertEqual(self.get(), {'id': 2})
+        self.assertEqual(self.cache.get_stats()['org']['expirations'], 1)
+
+    def test_validate_interval(self):
+        validate = mock.Mock(return_value=True)
+        self.get(validate=validate)
+        # the entity was just created, and then validated recently
+        for _ in range(3):
+            self.assertEqual(self.get(validate=validate), {'id': 1})
+        validate.assert_not_called()
+        self.settings.performance.factory_cache_validate_interval = 0
+        self.assertEqual(self.get(validate=validate), {'id': 1})
+        validate.assert_called_once_with({'id': 1})
+        validate.return_value = False
+        self.assertEqual(self.get(validate=validate), {'id': 2})
+        self.assertEqual(self.cache.get_stats()['org']['invalidations'], 1)
+
+    def test_shared(self):
+        root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root_dir)
+        self.settings.performance.factory_cache_shared = True
+        # the func_shared package shadows the shared module with the shared
+        # function
+        shared = importlib.import_module(
+            'robottelo.decorators.func_shared.shared')
+        patchers = [
+            mock.patch.object(
+                shared, '_get_default_scope', return_value='test'),
+            mock.patch.object(
+                shared, '_get_default_storage_handler',
+                side_effect=lambda: FileStorageHandler(root_dir=root_dir)),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        first = self.get()
+        # an other process has its own cache
+        other_cache = factory_cache.FactoryCache()
+        self.assertEqual(self.get(cache=other_cache), first)
+        self.assertEqual(self.created, 1)
+        self.assertEqual(other_cache.get_stats()['org']['shared_hits'], 1)
+        # the shared entity is validated on every hit
+        self.assertEqual(
+            self.get(cache=factory_cache.FactoryCache(),
+                     validate=lambda org: False),
+            {'id': 2}
+        )
@@ -2,12 +2,15 @@ import six
 import unittest2
 
 from functools import partial
+from robottelo import ssh
+from robottelo.cli import hammer_session
 from robottelo.cli.base import (
     Base,
     CLIBaseError,
     CLIDataBaseError,
     CLIError,
-    CLIReturnCodeError
+    CLIReturnCodeError,
+    LazyEntityRecord,
 )
 
 if six.PY2:
@@ -28,8 +31,7 @@ class BaseCliTestCase(unittest2.TestCase):
     def test_construct_command(self):
         """_construct_command builds a command using flags and arguments"""
         Base.command_base = 'basecommand'
-        Base.command_sub = 'subcommand'
-        command_parts = Base._construct_command({
+        command_parts = Base._construct_command('subcommand', {
             u'flag-one': True,
             u'flag-two': False,
             u'argument': u'value',
@@ -156,14 +158,13 @@ class BaseCliTestCase(unittest2.TestCase):
     @mock.patch('robottelo.cli.base.Base.execute')
     @mock.patch('robottelo.cli.base.Base._construct_command')
     def test_add_operating_system(self, construct, execute):
-        """Check command_sub edited when executing add_operating_system"""
+        """Check command_sub passed when executing add_operating_system"""
         options = {u'foo': u'bar'}
-        self.assertNotEqual('add-operatingsystem', Base.command_sub)
         self.assertEqual(
             execute.return_value,
             Base.add_operating_system(options)
         )
-        self.assertEqual('add-operatingsystem', Base.command_sub)
+        self.assertEqual('add-operatingsystem', construct.call_args[0][0])
         construct.called_once_with(options)
         execute.called_once_with(construct.return_value)
 
@@ -176,7 +177,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.create()
         )
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
 
@@ -191,7 +192,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.create()
         )
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
         self.assertFalse(info.called)
@@ -210,7 +211,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.create()
         )
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
         info.called_once_with({'id': 'foo'})
@@ -229,11 +230,62 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.create({'organization-id': 'org-id'})
         )
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
         info.called_once_with({'id': 'foo', 'organization-id': 'org-id'})
 
+    @mock.patch('robottelo.cli.base.Base.info')
+    @mock.patch('robottelo.cli.base.Base.execute')
+    def test_lazy_create(self, execute, info):
+        """Check lazy create only runs info when a missing field is read"""
+        execute.return_value = [
+            {'message': 'Created', 'id': '5', 'name': 'foo'}]
+        info.return_value = {'id': '5', 'name': 'foo', 'label': 'bar'}
+        Base.command_requires_org = False
+        result = Base.create({'name': 'foo'}, lazy=True)
+        self.assertIsInstance(result, LazyEntityRecord)
+        self.assertEqual(result['id'], '5')
+        self.assertEqual(result.get('name'), 'foo')
+        self.assertFalse(info.called)
+        self.assertEqual(result['label'], 'bar')
+        self.assertEqual(result, info.return_value)
+        self.assertNotIn('message', result)
+        info.assert_called_once_with({'id': '5'})
+
+    @mock.patch('robottelo.cli.base.Base.info')
+    @mock.patch('robottelo.cli.base.Base.execute')
+    def test_lazy_create_loads_whole_record(self, execute, info):
+        """Check lazy records load when iterated or compared"""
+        execute.return_value = [{'id': '5', 'name': 'foo'}]
+        info.return_value = {'id': '5', 'name': 'foo', 'label': 'bar'}
+        Base.command_requires_org = False
+        self.assertEqual(
+            sorted(Base.create(lazy=True)), ['id', 'label', 'name'])
+        self.assertIn('label', Base.create(lazy=True))
+        self.assertEqual(dict(Base.create(lazy=True)), info.return_value)
+        self.assertIsNone(Base.create(lazy=True).get('unknown'))
+        self.assertEqual(info.call_count, 4)
+
+    @mock.patch('robottelo.cli.base.Base.info')
+    @mock.patch('robottelo.cli.base.Base.list')
+    def test_load_records(self, list_method, info):
+        """Check lazy records are filled with a single list command"""
+        records = [
+            LazyEntityRecord(Base, {'id': '1', 'organization-id': 3},
+                             {'id': '1'}),
+            LazyEntityRecord(Base, {'id': '2', 'organization-id': 3},
+                             {'id': '2'}),
+        ]
+        list_method.return_value = [
+            {'id': '1', 'name': 'one'}, {'id': '2', 'name': 'two'}]
+        Base.load_records(records)
+        list_method.assert_called_once_with(
+            {'search': 'id ^ (1,2)', 'organization-id': 3})
+        self.assertEqual(records[0]['name'], 'one')
+        self.assertEqual(records[1]['name'], 'two')
+        self.assertFalse(info.called)
+
     @mock.patch('robottelo.cli.base.Base.execute')
     @mock.patch('robottelo.cli.base.Base._construct_command')
     def test_add_create_with_result_dct_id_required_org_error(
@@ -246,7 +298,7 @@ class BaseCliTestCase(unittest2.TestCase):
         ]
         Base.command_requires_org = True
         self.assertRaises(CLIError, Base.create)
-        self.assertEqual('create', Base.command_sub)
+        self.assertEqual('create', construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(construct.return_value, output_format='csv')
 
@@ -258,7 +310,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             base_method(**base_method_kwargs)
         )
-        self.assertEqual(cmd_sub, Base.command_sub)
+        self.assertEqual(cmd_sub, construct.call_args[0][0])
         construct.called_once_with({})
         execute.called_once_with(
             construct.return_value, ignore_stderr=ignore_stderr
@@ -324,10 +376,102 @@ class BaseCliTestCase(unittest2.TestCase):
         )
         handle_resp.assert_called_once_with(
             command.return_value,
-            ignore_stderr=None
+            ignore_stderr=None,
+            command_sub=None,
         )
         self.assertIs(response, handle_resp.return_value)
 
+    @mock.patch('robottelo.cli.base.Base._handle_response')
+    @mock.patch('robottelo.cli.base.hammer_session.execute')
+    @mock.patch('robottelo.cli.base.ssh.command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_execute_with_hammer_session(
+            self, settings, command, session_execute, handle_resp):
+        """Check the command is sent to the hammer session when enabled"""
+        settings.locale = 'en_US'
+        settings.performance.time_hammer = False
+        settings.performance.hammer_session = True
+        settings.server.admin_username = 'admin'
+        settings.server.admin_password = 'password'
+        response = Base.execute('some_cmd', output_format='csv')
+        session_execute.assert_called_once_with(
+            u'-v --output=csv some_cmd',
+            'admin',
+            'password',
+            output_format='csv',
+            timeout=None,
+            env={u'LANG': 'en_US'},
+        )
+        command.assert_not_called()
+        handle_resp.assert_called_once_with(
+            session_execute.return_value,
+            ignore_stderr=None,
+            command_sub=None,
+        )
+        self.assertIs(response, handle_resp.return_value)
+
+    @mock.patch('robottelo.cli.base.hammer_session.execute')
+    @mock.patch('robottelo.cli.base.ssh.command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_execute_hammer_session_fallback(
+            self, settings, command, session_execute):
+        """Check the command is run as a separate process when there is no
+        hammer session available
+        """
+        settings.locale = 'en_US'
+        settings.performance.time_hammer = False
+        settings.performance.hammer_session = True
+        settings.server.admin_username = 'admin'
+        settings.server.admin_password = 'password'
+        session_execute.return_value = None
+        response = Base.execute('some_cmd', return_raw_response=True)
+        ssh_cmd = u'LANG=en_US  hammer -v -u admin -p password  some_cmd'
+        command.assert_called_once_with(
+            ssh_cmd.encode('utf-8'),
+            output_format=None,
+            timeout=None,
+            connection_timeout=None
+        )
+        self.assertIs(response, command.return_value)
+
+    @mock.patch('robottelo.cli.base.hammer_session.execute')
+    @mock.patch('robottelo.cli.base.ssh.command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_execute_hammer_session_died(
+            self, settings, command, session_execute):
+        """Check a read only command is run again as a separate process when
+        the hammer session died while running it, and an error is raised for
+        other commands
+        """
+        settings.locale = 'en_US'
+        settings.performance.time_hammer = False
+        settings.performance.hammer_session = True
+        settings.server.admin_username = 'admin'
+        settings.server.admin_password = 'password'
+        session_execute.side_effect = hammer_session.HammerSessionError(
+            'hammer session exited', sent=True)
+
+        class Org(Base):
+            command_base = 'organization'
+            logger = mock.Mock()
+
+        response = Org.execute(
+            'organization list', return_raw_response=True)
+        self.assertIs(response, command.return_value)
+        command.assert_called_once_with(
+            u'LANG=en_US  hammer -v -u admin -p password  organization list'
+            .encode('utf-8'),
+            output_format=None,
+            timeout=None,
+            connection_timeout=None
+        )
+        command.reset_mock()
+        with self.assertRaises(CLIReturnCodeError) as context:
+            Org.execute('organization create --name foo')
+        self.assertEqual(context.exception.return_code, 255)
+        self.assertIn('hammer session exited', context.exception.stderr)
+        command.assert_not_called()
+
     @mock.patch('robottelo.cli.base.Base.list')
     def test_exists_without_option_and_empty_return(self, lst_method):
         """Check exists method without options and empty return"""
@@ -397,7 +541,7 @@ class BaseCliTestCase(unittest2.TestCase):
             execute.return_value,
             Base.list(options={'organization-id': 1})
         )
-        self.assertEqual('list', Base.command_sub)
+        self.assertEqual('list', construct.call_args[0][0])
         construct.called_once_with({'per-page': 1000})
         execute.called_once_with(construct.return_value, output_format='csv')
 
@@ -417,6 +561,103 @@ class BaseCliTestCase(unittest2.TestCase):
             'list',
         )
 
+    @mock.patch('robottelo.cli.base.ssh.stream_command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_list_with_fields(self, settings, stream_command):
+        """Check list streams the output and returns projected records"""
+        settings.locale = 'en_US.UTF-8'
+        settings.performance.hammer_cache = False
+        stream = stream_command.return_value
+        stream.__iter__.return_value = iter([
+            u'ID,Name,Arch', u'1,foo,x86_64', u'2,bar,noarch'])
+        stream.return_code = 0
+        stream.stderr = u''
+        records = Base.with_user('admin', 'changeme').list(
+            {'organization-id': 1},
+            fields=['name', 'id'],
+            where={'arch': 'noarch'},
+        )
+        self.assertEqual(records, [('bar', '2')])
+        self.assertEqual(records[0].name, 'bar')
+        command = stream_command.call_args[0][0].decode('utf-8')
+        self.assertIn(u'--output=csv', command)
+        self.assertIn(u'list --organization-id="1"', command)
+
+    @mock.patch('robottelo.cli.base.ssh.stream_command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_list_with_fields_error(self, settings, stream_command):
+        """Check list with fields raises the command errors"""
+        settings.performance.hammer_cache = False
+        stream = stream_command.return_value
+        stream.__iter__.return_value = iter([])
+        stream.return_code = 65
+        stream.stderr = u'Error: organization not found'
+        with self.assertRaises(CLIReturnCodeError):
+            Base.list({'organization-id': 1}, fields=['id'])
+
+    @mock.patch('robottelo.cli.base.ssh_metrics.tags')
+    @mock.patch('robottelo.cli.base.hammer_session.execute')
+    @mock.patch('robottelo.cli.base.ssh.stream_command')
+    @mock.patch('robottelo.cli.base.settings')
+    def test_list_with_fields_in_session(
+            self, settings, stream_command, session_execute, tags):
+        """Check list with fields runs in the hammer session and is tagged
+        like the other commands
+        """
+        settings.locale = 'en_US.UTF-8'
+        settings.performance.hammer_cache = False
+        settings.performance.time_hammer = False
+        settings.performance.hammer_session = True
+        session_execute.return_value = ssh.SSHCommandResult(
+            [u'ID,Name', u'1,foo', u'2,bar'], u'', 0)
+
+        class Org(Base):
+            command_base = 'organization'
+
+        records = Org.with_user('admin', 'changeme').list(
+            fields=['id'], where={'name': 'bar'})
+        self.assertEqual(records, [('2',)])
+        stream_command.assert_not_called()
+        self.assertEqual(
+            session_execute.call_args[0][0],
+            u'-v --output=csv organization list --per-page="10000"')
+        # the session returns the output lines to parse
+        self.assertIsNone(session_execute.call_args[1]['output_format'])
+        tags.assert_called_once_with(
+            command_base='organization', command_sub='list')
+
+    @mock.patch('robottelo.cli.base.Base.list')
+    def test_iter_list(self, list_):
+        """Check iter_list walks the pages until a partial one"""
+        list_.side_effect = [[1, 2], [3, 4], [5]]
+        self.assertEqual(
+            list(Base.iter_list({'organization-id': 1}, page_size=2)),
+            [1, 2, 3, 4, 5]
+        )
+        self.assertEqual(
+            [call[0][0] for call in list_.call_args_list],
+            [{'organization-id': 1, 'per-page': 2, 'page': page}
+             for page in (1, 2, 3)]
+        )
+
+    @mock.patch('robottelo.cli.base.Base.list')
+    def test_iter_list_stops_early(self, list_):
+        """Check iter_list does not fetch the pages which are not consumed"""
+        list_.side_effect = lambda options: [options['page']] * 2
+        results = Base.iter_list(page_size=2)
+        self.assertEqual(next(results), 1)
+        results.close()
+        self.assertEqual(list_.call_count, 1)
+
+    @mock.patch('robottelo.cli.base.Base.list')
+    def test_iter_list_prefetch(self, list_):
+        """Check iter_list fetches the next page while one is processed"""
+        list_.side_effect = [[1, 2], [3]]
+        results = Base.iter_list(page_size=2, prefetch=True)
+        self.assertEqual(next(results), 1)
+        self.assertEqual(list(results), [2, 3])
+        self.assertEqual(list_.call_count, 2)
+
     @mock.patch('robottelo.cli.base.Base.execute')
     @mock.patch('robottelo.cli.base.Base._construct_command')
     def test_puppet_classes(self, construct, execute):
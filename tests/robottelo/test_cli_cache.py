@@ -0,0 +1,120 @@
+"""Tests for module ``robottelo.cli.cache``."""
+from robottelo.cli import cache
+from robottelo.cli.base import Base
+from unittest import mock
+from unittest2 import TestCase
+
+
+class Repository(Base):
+    command_base = 'repository'
+    command_requires_org = False
+
+
+class ContentView(Base):
+    command_base = 'content-view'
+    command_requires_org = False
+
+
+class Architecture(Base):
+    command_base = 'architecture'
+    command_requires_org = False
+
+
+class CLICacheTestCase(TestCase):
+    """Tests for module ``robottelo.cli.cache``."""
+
+    def setUp(self):
+        patcher = mock.patch('robottelo.cli.cache.settings')
+        settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        settings.performance.hammer_cache = True
+        settings.performance.hammer_cache_ttl = 300
+        settings.performance.hammer_cache_size = 100
+        self.settings = settings
+        self.addCleanup(setattr, cache, '_cache', cache._cache)
+        cache._cache = cache.CLIResultCache()
+        patcher = mock.patch('robottelo.cli.base.ssh.command')
+        self.command = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.command.return_value.return_code = 0
+        self.command.return_value.stderr = ''
+        self.command.return_value.stdout = [{'id': '1', 'name': 'foo'}]
+
+    def test_is_read_only(self):
+        self.assertTrue(cache.is_read_only(
+            'repository', u'repository info --id="1"'))
+        self.assertTrue(cache.is_read_only(
+            'content-view filter', u'content-view filter list'))
+        self.assertFalse(cache.is_read_only(
+            'repository', u'repository synchronize --id="1"'))
+        self.assertFalse(cache.is_read_only(
+            'repository', u'product list'))
+        self.assertFalse(cache.is_read_only(None, u'ping'))
+
+    def test_list_is_cached(self):
+        first = Repository.list({'organization-id': 1})
+        first[0]['name'] = 'changed'
+        second = Repository.list({'organization-id': 1})
+        self.assertEqual(second, [{'id': '1', 'name': 'foo'}])
+        self.assertEqual(self.command.call_count, 1)
+        stats = cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_key_includes_options_and_user(self):
+        Repository.list({'organization-id': 1})
+        Repository.list({'organization-id': 2})
+        Repository.with_user('other', 'password').list({'organization-id': 1})
+        self.assertEqual(self.command.call_count, 3)
+
+    def test_write_invalidates_command_base_and_dependents(self):
+        Repository.list()
+        ContentView.list()
+        Architecture.list()
+        Repository.synchronize = classmethod(
+            lambda cls, options: cls.execute(u'repository synchronize'))
+        self.addCleanup(delattr, Repository, 'synchronize')
+        Repository.synchronize({'id': 1})
+        self.command.reset_mock()
+        Repository.list()
+        ContentView.list()
+        Architecture.list()
+        # architecture does not depend on repository
+        self.assertEqual(self.command.call_count, 2)
+
+    def test_failed_write_invalidates(self):
+        Repository.list()
+        self.command.return_value.return_code = 1
+        with self.assertRaises(Exception):
+            Repository.delete({'id': 1})
+        self.command.return_value.return_code = 0
+        self.command.reset_mock()
+        Repository.list()
+        self.assertEqual(self.command.call_count, 1)
+
+    def test_result_fetched_during_write_is_not_cached(self):
+        key = cache.make_key('repository', 'list', {}, 'csv', 'admin')
+        found, generation = cache.get(key)
+        self.assertFalse(found)
+        cache.invalidate('repository')
+        cache.put(key, ['stale'], generation)
+        self.assertFalse(cache.get(key)[0])
+
+    def test_lru_and_ttl(self):
+        self.settings.performance.hammer_cache_size = 2
+        for org_id in range(3):
+            Repository.list({'organization-id': org_id})
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+        self.settings.performance.hammer_cache_ttl = -1
+        Repository.list({'organization-id': 3})
+        Repository.list({'organization-id': 3})
+        self.assertEqual(cache.get_stats()['expirations'], 1)
+        self.assertEqual(self.command.call_count, 5)
+
+    def test_disabled(self):
+        self.settings.performance.hammer_cache = False
+        Repository.list()
+        Repository.list()
+        self.assertEqual(self.command.call_count, 2)
+        self.assertEqual(cache.get_stats()['misses'], 0)
@@ -0,0 +1,100 @@
+"""Tests for module ``robottelo.cli.executor``."""
+import threading
+import time
+
+from robottelo.cli.base import Base, CLIReturnCodeError
+from robottelo.cli.executor import CLIExecutor
+from unittest import mock
+from unittest2 import TestCase
+
+
+class Org(Base):
+    command_base = 'organization'
+    command_requires_org = False
+
+
+class CLIExecutorTestCase(TestCase):
+    """Tests for module ``robottelo.cli.executor``."""
+
+    def setUp(self):
+        patcher = mock.patch('robottelo.cli.executor.settings')
+        settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        settings.server.hostname = 'example.com'
+        self.running = 0
+        self.max_running = 0
+        self.commands = []
+        self.lock = threading.Lock()
+        patcher = mock.patch(
+            'robottelo.cli.base.ssh.command', side_effect=self.command)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def command(self, cmd, **kwargs):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        cmd = cmd.decode('utf-8')
+        with self.lock:
+            self.running -= 1
+            self.commands.append(cmd)
+        response = mock.Mock(stderr='', return_code=0)
+        if 'fail' in cmd:
+            response.return_code = 1
+            response.stderr = 'Could not find organization'
+        response.stdout = [cmd.split(' hammer ', 1)[1]]
+        return response
+
+    def test_subcommands_are_not_mixed(self):
+        with CLIExecutor(max_workers=8) as executor:
+            futures = executor.map(
+                Org, 'update', [{'id': index} for index in range(8)])
+            futures += executor.map(
+                Org, 'delete', [{'id': index} for index in range(8)])
+        for future in futures[:8]:
+            self.assertIn('organization update', future.result()[0])
+        for future in futures[8:]:
+            self.assertIn('organization delete', future.result()[0])
+
+    def test_errors_are_mapped(self):
+        with CLIExecutor() as executor:
+            future = executor.submit(Org, 'delete', {'name': 'fail'})
+        with self.assertRaises(CLIReturnCodeError) as context:
+            future.result()
+        self.assertIn(
+            'Command "organization delete" finished with return_code 1',
+            context.exception.msg
+        )
+
+    def test_bounded_per_server(self):
+        with CLIExecutor(max_workers=8, max_per_server=2) as executor:
+            futures = executor.map(
+                Org, 'delete', [{'id': index} for index in range(6)])
+        for future in futures:
+            future.result()
+        self.assertEqual(len(self.commands), 6)
+        self.assertLessEqual(self.max_running, 2)
+
+    def test_nested_calls(self):
+        """Check functions waiting for nested jobs do not hold the command
+        slots the nested jobs need
+        """
+        def setup(executor, index):
+            Org.create({'name': 'org{0}'.format(index)})
+            futures = executor.map(
+                Org, 'update', [{'id': index}, {'id': index}])
+            return [future.result() for future in futures]
+
+        with CLIExecutor(max_workers=12, max_per_server=2) as executor:
+            futures = [
+                executor.call(setup, executor, index) for index in range(4)]
+            for future in futures:
+                future.result(timeout=10)
+        self.assertEqual(len(self.commands), 12)
+        self.assertLessEqual(self.max_running, 2)
+
+    def test_unknown_subcommand(self):
+        with CLIExecutor() as executor:
+            with self.assertRaises(AttributeError):
+                executor.submit(Org, 'not-a-subcommand')
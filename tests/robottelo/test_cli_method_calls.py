@@ -31,7 +31,7 @@ from robottelo.cli.subscription import Subscription
     ]
 )
 def test_cli_org_method_called(mocker, command_sub):
-    """Check Org methods are called and command_sub edited
+    """Check Org methods are called and command_sub passed
     This is a parametrized test called by Pytest for each of Org methods
     """
     execute = mocker.patch('robottelo.cli.org.Org.execute')
@@ -40,7 +40,7 @@ def test_cli_org_method_called(mocker, command_sub):
     assert execute.return_value == getattr(
         Org, command_sub.replace('-', '_')
     )(options)
-    assert command_sub == Org.command_sub
+    assert construct.call_args[0][0] == command_sub
     assert construct.called_once_with(options)
     assert execute.called_once_with(construct.return_value)
 
@@ -50,7 +50,7 @@ def test_cli_org_method_called(mocker, command_sub):
     ['import-classes', 'refresh-features']
 )
 def test_cli_proxy_method_called(mocker, command_sub):
-    """Check Proxy methods are called and command_sub edited
+    """Check Proxy methods are called and command_sub passed
     This is a parametrized test called by Pytest for each of Proxy methods
     """
     execute = mocker.patch('robottelo.cli.proxy.Proxy.execute')
@@ -59,7 +59,7 @@ def test_cli_proxy_method_called(mocker, command_sub):
     assert execute.return_value == getattr(
         Proxy, command_sub.replace('-', '_')
     )(options)
-    assert command_sub == Proxy.command_sub
+    assert construct.call_args[0][0] == command_sub
     assert construct.called_once_with(options)
     assert execute.called_once_with(construct.return_value)
 
@@ -74,7 +74,7 @@ def test_cli_proxy_method_called(mocker, command_sub):
     ]
 )
 def test_cli_repository_method_called(mocker, command_sub):
-    """Check Repository methods are called and command_sub edited
+    """Check Repository methods are called and command_sub passed
     This is a parametrized test called by Pytest for each of Repository methods
     """
     execute = mocker.patch('robottelo.cli.repository.Repository.execute')
@@ -84,7 +84,7 @@ def test_cli_repository_method_called(mocker, command_sub):
     assert execute.return_value == getattr(
         Repository, command_sub.replace('-', '_')
     )(options)
-    assert command_sub == Repository.command_sub
+    assert construct.call_args[0][0] == command_sub
     assert construct.called_once_with(options)
     assert execute.called_once_with(construct.return_value)
 
@@ -115,7 +115,7 @@ def test_cli_repository_info_and_create(mocker, command_sub):
     ]
 )
 def test_cli_subscription_method_called(mocker, command_sub):
-    """Check Subscription methods are called and command_sub edited
+    """Check Subscription methods are called and command_sub passed
     This is a parametrized test called by Pytest for each
     of Subscription methods
     """
@@ -128,6 +128,6 @@ def test_cli_subscription_method_called(mocker, command_sub):
     assert execute.return_value == getattr(
         Subscription, command_sub.replace('-', '_')
     )(options)
-    assert command_sub == Subscription.command_sub
+    assert construct.call_args[0][0] == command_sub
     assert construct.called_once_with(options)
     assert execute.called_once_with(construct.return_value)
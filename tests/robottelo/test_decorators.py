@@ -707,36 +707,69 @@ class CacheableTestCase(TestCase):
     """Tests for :func:`robottelo.decorators.cacheable`."""
 
     def setUp(self):
-        self.object_cache_patcher = mock.patch.dict(
-            'robottelo.decorators.OBJECT_CACHE')
-        self.object_cache = self.object_cache_patcher.start()
+        patcher = mock.patch(
+            'robottelo.decorators.factory_cache._cache',
+            decorators.factory_cache.FactoryCache()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch('robottelo.decorators.factory_cache.settings')
+        settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        settings.performance.factory_cache_size = 10
+        settings.performance.factory_cache_ttl = 60
+        settings.performance.factory_cache_shared = False
+        # validate the cached objects on every hit
+        settings.performance.factory_cache_validate_interval = 0
+        self.calls = []
 
         def make_foo(options):
-            return {'id': 42}
+            self.calls.append(options)
+            return {'id': len(self.calls)}
 
         self.make_foo = decorators.cacheable(make_foo)
 
-    def tearDown(self):
-        self.object_cache_patcher.stop()
-
     def test_build_cache(self):
         """Create a new object and add it to the cache."""
         obj = self.make_foo(cached=True)
-        self.assertEqual(decorators.OBJECT_CACHE, {'foo': {'id': 42}})
-        self.assertEqual(id(decorators.OBJECT_CACHE['foo']), id(obj))
+        self.assertEqual(obj, {'id': 1})
+        self.assertEqual(
+            decorators.factory_cache.get_stats(),
+            {'foo': {'hits': 0, 'shared_hits': 0, 'misses': 1,
+                     'expirations': 0, 'invalidations': 0}}
+        )
 
     def test_return_from_cache(self):
         """Return an already cached object."""
-        cache_obj = {'id': 42}
-        decorators.OBJECT_CACHE['foo'] = cache_obj
-        obj = self.make_foo(cached=True)
+        cache_obj = self.make_foo({'name': 'foo', 'label': 'foo'},
+                                  cached=True)
+        obj = self.make_foo({'label': 'foo', 'name': 'foo'}, cached=True)
         self.assertEqual(id(cache_obj), id(obj))
+        self.assertEqual(len(self.calls), 1)
+
+    def test_options_are_part_of_the_key(self):
+        """Create a new object when the options differ."""
+        first = self.make_foo({'name': 'foo'}, cached=True)
+        second = self.make_foo({'name': 'bar'}, cached=True)
+        self.assertNotEqual(first, second)
+        self.assertEqual(len(self.calls), 2)
 
     def test_create_and_not_add_to_cache(self):
         """Create a new object and not add it to the cache."""
         self.make_foo(cached=False)
-        self.assertNotIn('foo', decorators.OBJECT_CACHE)
-        self.assertEqual(decorators.OBJECT_CACHE, {})
+        self.make_foo(cached=True)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_invalid_object(self):
+        """Create a new object when the cached one is not valid."""
+        make_foo = decorators.cacheable(
+            validate=lambda obj: obj['id'] != 1)(self.make_foo.__wrapped__)
+        make_foo(cached=True)
+        self.assertEqual(make_foo(cached=True), {'id': 2})
+        self.assertEqual(make_foo(cached=True), {'id': 2})
+        stats = decorators.factory_cache.get_stats()['foo']
+        self.assertEqual(stats['invalidations'], 1)
+        self.assertEqual(stats['hits'], 1)
 
 
 class RmBugIsOpenTestCase(TestCase):
@@ -0,0 +1,122 @@
+"""Tests for module ``robottelo.cli.entity_pool``."""
+import shutil
+import subprocess
+import tempfile
+
+from robottelo.cli import entity_pool
+from robottelo.decorators.func_shared.file_storage import FileStorageHandler
+from unittest import mock
+from unittest2 import TestCase
+
+
+class EntityPoolTestCase(TestCase):
+    """Tests for module ``robottelo.cli.entity_pool``."""
+
+    def setUp(self):
+        root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root_dir)
+        self.built = 0
+        self.pool = entity_pool.EntityPool(
+            'orgs',
+            self.build,
+            size=2,
+            storage=FileStorageHandler(root_dir=root_dir),
+            scope='test',
+            timeout=60,
+        )
+
+    def build(self):
+        self.built += 1
+        return {'org': {'id': str(self.built)}}
+
+    def wait_refill(self):
+        if self.pool._refill_thread is not None:
+            self.pool._refill_thread.join(10)
+
+    def test_fill(self):
+        self.pool.fill()
+        self.assertEqual(self.built, 2)
+        self.pool.fill()
+        self.assertEqual(self.built, 2)
+
+    def test_exclusive_checkout(self):
+        self.pool.fill()
+        with self.pool.checkout() as first:
+            self.wait_refill()
+            with self.pool.checkout() as second:
+                self.wait_refill()
+        self.assertEqual(first, {'org': {'id': '1'}})
+        self.assertEqual(second, {'org': {'id': '2'}})
+        # the checked out items were replaced
+        self.assertEqual(self.built, 4)
+        with self.pool._state() as state:
+            self.assertEqual(len(state['items']), 2)
+
+    def test_empty_pool_builds(self):
+        with mock.patch.object(self.pool, 'refill'):
+            with self.pool.checkout() as item:
+                self.assertEqual(item, {'org': {'id': '1'}})
+
+    def test_shared_checkout(self):
+        with mock.patch.object(self.pool, 'refill'):
+            self.pool.fill()
+            with self.pool.checkout(shared=True) as first:
+                with self.pool.checkout(shared=True) as second:
+                    with self.pool._state() as state:
+                        self.assertEqual(state['shared']['holders'], 2)
+                with self.pool.checkout() as exclusive:
+                    pass
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, exclusive)
+        self.assertEqual(self.built, 2)
+        with self.pool._state() as state:
+            self.assertEqual(state['shared']['holders'], 0)
+            self.assertEqual(state['items'], [])
+
+    def test_expired_items_are_dropped(self):
+        self.pool.fill()
+        self.pool.timeout = -1
+        with mock.patch.object(self.pool, 'refill'):
+            with self.pool.checkout() as item:
+                self.assertEqual(item, {'org': {'id': '3'}})
+
+    def test_failed_build(self):
+        self.pool.build = mock.Mock(side_effect=Exception('error'))
+        self.pool.fill()
+        with self.pool._state() as state:
+            self.assertEqual(state['builds'], [])
+            self.assertEqual(state['items'], [])
+
+    def test_dead_builds_are_reclaimed(self):
+        """Check the build slots of dead processes are given to new builds"""
+        process = subprocess.Popen(['true'])
+        process.wait()
+        with self.pool._state() as state:
+            for _ in range(2):
+                build = entity_pool.new_lease_holder(
+                    entity_pool.BUILD_TIMEOUT)
+                build['pid'] = process.pid
+                state['builds'].append(build)
+        self.pool.fill()
+        self.assertEqual(self.built, 2)
+        with self.pool._state() as state:
+            self.assertEqual(state['builds'], [])
+            self.assertEqual(len(state['items']), 2)
+
+    def test_running_builds_are_kept(self):
+        with self.pool._state() as state:
+            state['builds'].append(
+                entity_pool.new_lease_holder(entity_pool.BUILD_TIMEOUT))
+        self.pool.fill()
+        self.assertEqual(self.built, 1)
+
+    @mock.patch('robottelo.cli.entity_pool.is_enabled', return_value=False)
+    def test_disabled(self, _):
+        build = mock.Mock(return_value={'org': {'id': '1'}})
+        self.addCleanup(entity_pool.TEMPLATES.pop, 'test_disabled')
+        entity_pool.template('test_disabled')(build)
+        with entity_pool.checkout('test_disabled') as item:
+            self.assertEqual(item, {'org': {'id': '1'}})
+        with self.assertRaises(entity_pool.EntityPoolError):
+            with entity_pool.checkout('unknown'):
+                pass
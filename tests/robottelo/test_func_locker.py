@@ -1,12 +1,21 @@
 # coding: utf-8
 
+import fcntl
+import json
 import multiprocessing
 import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
 import time
 import tempfile
 
+from unittest import mock
 from unittest2 import TestCase
 from robottelo.decorators.func_locker import (
+    file_lock,
     get_temp_dir,
     lock_function,
     locking_function,
@@ -15,6 +24,9 @@ from robottelo.decorators.func_locker import (
     TEMP_FUNC_LOCK_DIR,
     TEMP_ROOT_DIR,
     FunctionLockerError,
+    FunctionLockerTimeoutError,
+    rw_lock,
+    semaphore_function,
 )
 
 _this_module_name_string = 'tests.robottelo.test_func_locker'
@@ -146,11 +158,11 @@ def simple_with_locking_function(index=None):
                   'r') as rf:
             content = rf.read()
 
-    if index is not None:
-        saved_counter = int(_read_counter_file())
-        _write_to_counter_file(str(index + saved_counter))
+        if index is not None:
+            saved_counter = int(_read_counter_file())
+            _write_to_counter_file(str(index + saved_counter))
 
-    time.sleep(0.05)
+        time.sleep(0.05)
     return os.getpid(), content
 
 
@@ -209,6 +221,25 @@ def simple_function_not_locked():
     return None
 
 
+@semaphore_function(n=2)
+def simple_semaphore_function(index=None):
+    """Return the time span of the call"""
+    start = time.time()
+    time.sleep(0.2)
+    return start, time.time()
+
+
+def _max_overlap(spans):
+    """Return the maximum number of time spans overlapping"""
+    events = sorted(
+        [(start, 1) for start, _ in spans] + [(end, -1) for _, end in spans])
+    current = maximum = 0
+    for _, change in events:
+        current += change
+        maximum = max(maximum, current)
+    return maximum
+
+
 class FuncLockerTestCase(TestCase):
 
     @classmethod
@@ -456,3 +487,248 @@ class FuncLockerTestCase(TestCase):
                 pass
 
         self.assertIn('Cannot ensure locking', str(context.exception))
+
+
+class FileLockTestCase(TestCase):
+
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        self.file_path = os.path.join(tmp_dir, 'file.lock')
+        patcher = mock.patch(
+            'robottelo.decorators.func_locker.LEASE_CHECK_INTERVAL', 0.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def hold_lock(self, duration):
+        """Hold the lock in an other thread during duration seconds"""
+        acquired = threading.Event()
+        times = {}
+
+        def hold():
+            with file_lock(self.file_path):
+                acquired.set()
+                time.sleep(duration)
+                times['released'] = time.time()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        self.addCleanup(thread.join)
+        acquired.wait()
+        return times
+
+    def test_timeout(self):
+        """Ensure that the lock is not acquired after the timeout and that the
+        abandoned waiter does not keep it"""
+        self.hold_lock(0.3)
+        with self.assertRaises(FunctionLockerTimeoutError):
+            with file_lock(self.file_path, timeout=0.05):
+                pass
+        with file_lock(self.file_path, timeout=5) as handler:
+            handler.write('content')
+
+    def test_abandoned_waiter_is_adopted(self):
+        """Ensure that the waiters given up on a busy lock are reused by the
+        next waiters, and exit with their file closed once the lock is
+        released"""
+        threads = threading.active_count()
+        fds = len(os.listdir('/proc/self/fd'))
+        times = self.hold_lock(0.5)
+        for _ in range(5):
+            with self.assertRaises(FunctionLockerTimeoutError):
+                with file_lock(self.file_path, timeout=0.02, lease=None):
+                    pass
+        # the holder and its heartbeat, and a single waiter
+        self.assertEqual(threading.active_count(), threads + 3)
+        with file_lock(self.file_path, timeout=5, lease=None):
+            self.assertLess(time.time() - times['released'], 0.1)
+        self.hold_lock(0.2)
+        with self.assertRaises(FunctionLockerTimeoutError):
+            with file_lock(self.file_path, timeout=0.02, lease=None):
+                pass
+        # the waiter releases the lock it gets after its caller gave up
+        for _ in range(100):
+            if (threading.active_count() == threads and
+                    len(os.listdir('/proc/self/fd')) == fds):
+                break
+            time.sleep(0.01)
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(len(os.listdir('/proc/self/fd')), fds)
+
+    def test_wake_on_release(self):
+        """Ensure that a waiter acquires the lock as soon as released"""
+        times = self.hold_lock(0.5)
+        with file_lock(self.file_path, timeout=5, lease=None):
+            self.assertLess(time.time() - times['released'], 0.1)
+
+    def test_wake_on_release_by_other_process(self):
+        """Ensure that a waiter acquires the lock as soon as released by an
+        other process"""
+        process = subprocess.Popen(
+            [sys.executable, '-c',
+             'import fcntl, sys, time\n'
+             'handler = open(sys.argv[1], "w")\n'
+             'fcntl.flock(handler.fileno(), fcntl.LOCK_EX)\n'
+             'print("locked", flush=True)\n'
+             'time.sleep(0.5)\n'
+             'print(time.time(), flush=True)\n'
+             'fcntl.flock(handler.fileno(), fcntl.LOCK_UN)\n',
+             self.file_path],
+            stdout=subprocess.PIPE, universal_newlines=True)
+        self.addCleanup(process.wait)
+        self.addCleanup(process.stdout.close)
+        self.assertEqual(process.stdout.readline().strip(), 'locked')
+        with file_lock(self.file_path, timeout=5, lease=None):
+            acquired = time.time()
+        released = float(process.stdout.readline())
+        self.assertLess(acquired - released, 0.05)
+
+    def write_lease(self, pid, expires):
+        """Write the lease of a stale holder"""
+        with open('{0}.lease'.format(self.file_path), 'w') as handler:
+            json.dump({
+                'id': 'stale',
+                'host': socket.gethostname(),
+                'pid': pid,
+                'thread': 'MainThread',
+                'acquired': time.time() - 100,
+                'expires': expires,
+            }, handler)
+
+    def hold_stale_lock(self, pid, expires):
+        """Lock the file like a frozen process or the child of a dead one"""
+        handler = open(self.file_path, 'w')
+        self.addCleanup(handler.close)
+        fcntl.flock(handler.fileno(), fcntl.LOCK_EX)
+        self.write_lease(pid, expires)
+
+    def assert_takeover(self, reason):
+        with mock.patch('robottelo.decorators.func_locker.logger') as logger:
+            with file_lock(self.file_path, timeout=5):
+                pass
+        logger.warning.assert_called_once()
+        message = logger.warning.call_args[0][0]
+        self.assertIn('held by process id: {0}'.format(os.getpid()), message)
+        self.assertIn(reason, message)
+
+    def test_takeover_expired_lease(self):
+        self.hold_stale_lock(os.getpid(), time.time() - 1)
+        self.assert_takeover('lease expired')
+
+    def test_takeover_dead_process(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        self.hold_stale_lock(process.pid, time.time() + 100)
+        with mock.patch('robottelo.decorators.func_locker.logger') as logger:
+            with file_lock(self.file_path, timeout=5):
+                pass
+        message = logger.warning.call_args[0][0]
+        self.assertIn('held by process id: {0}'.format(process.pid), message)
+        self.assertIn('process is dead', message)
+
+    def test_takeover_not_released(self):
+        self.write_lease(os.getpid(), time.time() + 100)
+        self.assert_takeover('lock not released')
+
+    def test_no_takeover_of_live_holder(self):
+        self.hold_lock(0.3)
+        with self.assertRaises(FunctionLockerTimeoutError):
+            with file_lock(self.file_path, timeout=0.2):
+                pass
+
+    def test_lease_renewed(self):
+        lease_path = '{0}.lease'.format(self.file_path)
+        with file_lock(self.file_path, lease=0.3):
+            time.sleep(0.5)
+            with open(lease_path) as handler:
+                holder = json.load(handler)
+            self.assertGreater(holder['expires'], time.time())
+            self.assertEqual(holder['pid'], os.getpid())
+        self.assertFalse(os.path.exists(lease_path))
+
+
+class SharedLockTestCase(TestCase):
+
+    def setUp(self):
+        self.spans = []
+
+    def sleep(self, duration=0.1):
+        """Sleep and save the time span of the sleep"""
+        start = time.time()
+        time.sleep(duration)
+        self.spans.append((start, time.time()))
+
+    def run_threads(self, *functions):
+        threads = [threading.Thread(target=function) for function in functions]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_semaphore_in_multiprocess(self):
+        """Ensure that at most n processes hold the semaphore"""
+        pool = multiprocessing.Pool(POOL_SIZE)
+        self.addCleanup(pool.join)
+        self.addCleanup(pool.terminate)
+        spans = pool.map(simple_semaphore_function, range(POOL_SIZE))
+        self.assertEqual(_max_overlap(spans), 2)
+
+    def test_semaphore_with(self):
+        """Ensure that the semaphore of a scope context is shared by the
+        functions and blocks using it"""
+
+        @semaphore_function(n=1, scope_context=SCOPE)
+        def sleep():
+            self.sleep()
+
+        def with_sleep():
+            with semaphore_function(n=1, scope_context=SCOPE):
+                self.sleep()
+
+        self.run_threads(sleep, sleep, with_sleep, with_sleep)
+        self.assertEqual(len(self.spans), 4)
+        self.assertEqual(_max_overlap(self.spans), 1)
+
+    def test_semaphore_timeout(self):
+        acquired = threading.Event()
+
+        def hold():
+            with semaphore_function(n=1, scope_context=SCOPE_2):
+                acquired.set()
+                time.sleep(0.3)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        self.addCleanup(thread.join)
+        acquired.wait()
+        with self.assertRaises(FunctionLockerTimeoutError):
+            with semaphore_function(n=1, scope_context=SCOPE_2, timeout=0.1):
+                pass
+
+    def test_rw_lock(self):
+        """Ensure that the readers share the lock and the writers do not"""
+        modes = {}
+
+        def access(mode):
+            def function():
+                with rw_lock(mode=mode, scope_context=SCOPE):
+                    self.sleep()
+                    modes[self.spans[-1]] = mode
+            return function
+
+        self.run_threads(*[access('read') for _ in range(3)])
+        self.assertEqual(_max_overlap(self.spans), 3)
+        self.spans = []
+        self.run_threads(*[
+            access(mode) for mode in ('read', 'write', 'read', 'read', 'write')
+        ])
+        self.assertEqual(len(self.spans), 5)
+        writes = [span for span in self.spans if modes[span] == 'write']
+        for write in writes:
+            for span in self.spans:
+                if span is not write:
+                    self.assertEqual(_max_overlap([write, span]), 1)
+
+    def test_negative_rw_lock_mode(self):
+        with self.assertRaises(FunctionLockerError):
+            rw_lock(mode='append')
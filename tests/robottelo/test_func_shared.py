@@ -1,15 +1,21 @@
 # coding: utf-8
 
+import importlib
 import multiprocessing
 import os
+import shutil
+import tempfile
 import time
 
 
 from fauxfactory import gen_integer, gen_string
+from unittest import mock
 from unittest2 import TestCase
 
 from robottelo.decorators.func_shared.shared import (
     _set_configured,
+    _SharedFunction,
+    clear_cache,
     set_default_scope,
     enable_shared_function,
     shared,
@@ -17,6 +23,7 @@ from robottelo.decorators.func_shared.shared import (
     _NAMESPACE_SCOPE_KEY_TYPE,
 )
 from robottelo.decorators.func_shared.file_storage import (
+    FileStorageHandler,
     get_temp_dir,
     TEMP_ROOT_DIR,
     TEMP_FUNC_SHARED_DIR,
@@ -527,3 +534,96 @@ class FunctionSharedTestCase(TestCase):
             inc_string_2 = basic_shared_counter_string(
                 suffix=suffix, prefix=prefix, counter=counter_value)
             self.assertEqual(inc_string, inc_string_2)
+
+
+class SharedFunctionCacheTestCase(TestCase):
+    """Tests for the shared function results cache of each process"""
+
+    def setUp(self):
+        root_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root_dir)
+        self.storage = FileStorageHandler(root_dir=root_dir)
+        self.calls = 0
+        clear_cache()
+        self.addCleanup(clear_cache)
+
+    def counter(self, index=0, _injected=False):
+        self.calls += 1
+        return {'index': index + self.calls}
+
+    def call(self, key='counter', timeout=60, inject=False):
+        return _SharedFunction(
+            key, self.counter, storage_handler=self.storage,
+            timeout=timeout, inject=inject, injected_kw='_injected')()
+
+    def test_hit_skips_storage(self):
+        result = self.call()
+        with mock.patch.object(self.storage, 'lock') as lock:
+            with mock.patch.object(self.storage, 'get') as get:
+                self.assertEqual(self.call(), result)
+        lock.assert_not_called()
+        # only the version of the stored value is read
+        get.assert_not_called()
+        self.assertEqual(self.calls, 1)
+
+    def test_result_copy(self):
+        self.call()['index'] = 100
+        self.assertEqual(self.call(), {'index': 1})
+
+    def test_inject(self):
+        self.assertEqual(self.call(inject=True), {'index': 1})
+        # the cached result is injected in the function
+        self.assertEqual(self.call(inject=True), {'index': 3})
+        self.assertEqual(self.call(inject=True), {'index': 4})
+
+    def test_expired(self):
+        self.call(timeout=-1)
+        self.call(timeout=-1)
+        self.assertEqual(self.calls, 2)
+
+    def test_stored_value_changed(self):
+        self.call()
+        # an other worker stores an other result behind the cache
+        value = self.storage.get('counter')
+        value.update(id='other', result={'index': 10})
+        self.storage.set('counter', value, {
+            'id': 'other', 'creation_datetime': value['creation_datetime']})
+        self.assertEqual(self.call(), {'index': 10})
+        with mock.patch.object(self.storage, 'get') as get:
+            self.assertEqual(self.call(), {'index': 10})
+        get.assert_not_called()
+        # the same transaction stored again at an other time
+        value.update(
+            creation_datetime='2000-01-01T00:00:00', result={'index': 20})
+        self.storage.set('counter', value, {
+            'id': 'other', 'creation_datetime': value['creation_datetime']})
+        self.assertEqual(self.call(timeout=10 ** 10), {'index': 20})
+        self.assertEqual(self.calls, 1)
+
+    def test_stored_value_without_version(self):
+        self.call()
+        value = self.storage.get('counter')
+        value['result'] = {'index': 10}
+        self.storage.set('counter', value)
+        self.assertEqual(self.call(), {'index': 10})
+        self.assertEqual(self.calls, 1)
+
+    def test_stored_value_cleared(self):
+        self.call()
+        os.remove(self.storage.get_key_file_path('counter'))
+        self.assertEqual(self.call(), {'index': 2})
+        self.assertEqual(self.calls, 2)
+
+    def test_size(self):
+        # the func_shared package shadows the shared module with the shared
+        # function
+        shared_module = importlib.import_module(
+            'robottelo.decorators.func_shared.shared')
+        patcher = mock.patch.object(shared_module, 'CACHE_SIZE', 1)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.call(key='first')
+        self.call(key='second')
+        with mock.patch.object(self.storage, 'get', return_value=None) as get:
+            self.call(key='first')
+        get.assert_called_once_with('first')
@@ -1,5 +1,8 @@
 # -*- encoding: utf-8 -*-
 """Tests for Robottelo's hammer helpers"""
+import glob
+import json
+import os
 import unittest2
 
 from robottelo.cli import hammer
@@ -38,6 +41,62 @@ class ParseCSVTestCase(unittest2.TestCase):
             ]
         )
 
+    def test_iter_csv(self):
+        output_lines = iter([
+            u'Id,Description',
+            u'1,"first line',
+            u'second line"',
+            u'2,single line',
+        ])
+        rows = hammer.iter_csv(output_lines)
+        self.assertEqual(
+            next(rows),
+            {u'id': u'1', u'description': u'first line\nsecond line'}
+        )
+        self.assertEqual(
+            next(rows), {u'id': u'2', u'description': u'single line'})
+        self.assertEqual(list(rows), [])
+        self.assertEqual(hammer.parse_csv([]), [])
+
+    def test_iter_csv_records(self):
+        output_lines = [
+            u'Id,Name,Content View',
+            u'1,foo,cv1',
+            u'2,bar,cv2',
+            u'3,baz',
+        ]
+        records = list(hammer.iter_csv_records(output_lines))
+        self.assertEqual(
+            records,
+            [('1', 'foo', 'cv1'), ('2', 'bar', 'cv2'), ('3', 'baz', None)]
+        )
+        self.assertEqual(records[0].content_view, 'cv1')
+        self.assertEqual(records[0]._asdict()['name'], 'foo')
+
+    def test_parse_csv_fields_and_where(self):
+        output_lines = [
+            u'Id,Name,Arch',
+            u'1,foo,x86_64',
+            u'2,bar,noarch',
+            u'3,baz,noarch',
+        ]
+        self.assertEqual(
+            hammer.parse_csv(output_lines, fields=['name']),
+            [('foo',), ('bar',), ('baz',)]
+        )
+        records = hammer.parse_csv(
+            output_lines,
+            fields=['name', 'id'],
+            where={'arch': 'noarch', 'id': lambda value: int(value) > 2},
+        )
+        self.assertEqual(records, [('baz', '3')])
+        self.assertEqual(records[0].id, '3')
+        with self.assertRaises(ValueError):
+            hammer.parse_csv(output_lines, fields=['name', 'unknown'])
+        with self.assertRaises(ValueError):
+            hammer.parse_csv(output_lines, where={'unknown': '1'})
+        self.assertEqual(hammer.parse_csv([], fields=['id']), [])
+
 
 class ParseJSONTestCase(unittest2.TestCase):
     """Tests for parsing JSON hammer output"""
@@ -395,6 +454,20 @@ class ParseInfoTestCase(unittest2.TestCase):
             }
         )
 
+    def test_parse_info_corpus(self):
+        """Can parse the recorded info outputs of the hammer commands"""
+        corpus = os.path.join(
+            os.path.dirname(__file__), 'data', 'hammer_info')
+        paths = sorted(glob.glob(os.path.join(corpus, '*.txt')))
+        self.assertTrue(paths)
+        for path in paths:
+            with open(path) as handler:
+                output = handler.read().split('\n')
+            with open(os.path.splitext(path)[0] + '.json') as handler:
+                expected = json.load(handler)
+            with self.subTest(path=os.path.basename(path)):
+                self.assertEqual(hammer.parse_info(output), expected)
+
     def test_parse_json_list(self):
         """Can parse a list in json"""
         self.assertEqual(
@@ -0,0 +1,267 @@
+"""Tests for module ``robottelo.cli.hammer_session``."""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import time
+
+from robottelo import ssh
+from robottelo.cli import hammer_session
+from unittest import mock
+from unittest2 import TestCase, skipUnless
+
+FAKE_HAMMER = u'''\
+require 'json'
+puts(JSON.generate('args' => ARGV, 'lang' => ENV['LANG']))
+'''
+
+
+class MockSessionServer(object):
+    """Answer the session requests the way the session script does, running
+    ``handler`` with the request arguments and environment.
+    """
+
+    def __init__(self, handler, ready=True):
+        self.handler = handler
+        self.user = None
+        self.requests = []
+        self.lines = [json.dumps({'ready': ready}).encode('utf-8') + b'\n']
+
+    def write(self, data):
+        request = json.loads(data.decode('utf-8'))
+        if 'command' not in request:
+            self.user = request
+            return
+        self.requests.append(request)
+        response = self.handler(request['command'], request['env'])
+        if response is not None:
+            self.lines.append(json.dumps(response).encode('utf-8') + b'\n')
+
+    def flush(self):
+        pass
+
+    def readline(self):
+        return self.lines.pop(0) if self.lines else b''
+
+
+class MockChannel(object):
+    def __init__(self, server):
+        self.server = server
+        self.closed = False
+        self.command = None
+
+    def settimeout(self, timeout):
+        self.timeout = timeout
+
+    def exec_command(self, command):
+        self.command = command
+
+    def makefile(self, mode):
+        return self.server
+
+    def exit_status_ready(self):
+        return self.closed
+
+    def recv_stderr_ready(self):
+        return False
+
+    def close(self):
+        self.closed = True
+
+
+class MockClient(object):
+    def __init__(self, channel):
+        self.channel = channel
+        self.uploaded = {}
+        self.closed = False
+
+    def open_sftp(self):
+        client = self
+
+        class MockSFTP(object):
+            def putfo(self, handler, path):
+                client.uploaded[path] = handler.read()
+
+            def close(self):
+                pass
+
+        return MockSFTP()
+
+    def get_transport(self):
+        return mock.Mock(open_session=lambda: self.channel)
+
+    def close(self):
+        self.closed = True
+
+
+class HammerSessionTestCase(TestCase):
+    """Tests for module ``robottelo.cli.hammer_session``."""
+
+    def setUp(self):
+        patcher = mock.patch('robottelo.cli.hammer_session.settings')
+        settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        settings.server.hostname = 'example.com'
+        settings.ssh_client.command_timeout = 300
+        self.addCleanup(hammer_session.close_sessions)
+
+    def mock_client(self, server):
+        channel = MockChannel(server)
+        client = MockClient(channel)
+        patcher = mock.patch(
+            'robottelo.cli.hammer_session.ssh.get_client',
+            return_value=client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return client
+
+    def test_execute(self):
+        def handler(args, env):
+            return {'return_code': 0, 'stdout': u'ID,Name\n1,foo\n',
+                    'stderr': u''}
+
+        server = MockSessionServer(handler)
+        client = self.mock_client(server)
+        command = u'-v --output=csv org list --search="name = \\"foo\\""'
+        result = hammer_session.execute(
+            command, 'admin', 'changeme', output_format='csv',
+            env={'LANG': 'en_US'})
+        self.assertIsInstance(result, ssh.SSHCommandResult)
+        self.assertEqual(result.return_code, 0)
+        self.assertEqual(result.stdout, [{'id': '1', 'name': 'foo'}])
+        # the credentials are sent once, when the session starts
+        self.assertEqual(
+            server.user, {'user': 'admin', 'password': 'changeme'})
+        self.assertEqual(
+            server.requests, [{'command': command, 'env': {'LANG': 'en_US'}}])
+        self.assertIn(hammer_session.REMOTE_SCRIPT_PATH, client.uploaded)
+        self.assertEqual(client.channel.command, hammer_session.START_COMMAND)
+
+    def test_session_is_reused(self):
+        def handler(args, env):
+            return {'return_code': 70, 'stdout': u'', 'stderr': u'error'}
+
+        server = MockSessionServer(handler)
+        self.mock_client(server)
+        for _ in range(3):
+            result = hammer_session.execute(u'org list', 'admin', 'changeme')
+            self.assertEqual(result.return_code, 70)
+            self.assertEqual(result.stderr, u'error')
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(len(hammer_session._sessions), 1)
+
+    def test_unavailable_session(self):
+        server = MockSessionServer(None, ready=False)
+        self.mock_client(server)
+        self.assertIsNone(
+            hammer_session.execute(u'org list', 'admin', 'changeme'))
+        self.assertIn('example.com', hammer_session._unavailable)
+        self.assertIsNone(
+            hammer_session.execute(u'org list', 'admin', 'changeme'))
+        self.assertEqual(server.requests, [])
+        # a session is started again after the retry interval
+        hammer_session._unavailable['example.com'] = time.time() - 1
+        self.mock_client(MockSessionServer(lambda args, env: {
+            'return_code': 0, 'stdout': u'', 'stderr': u''}))
+        self.assertIsNotNone(
+            hammer_session.execute(u'org list', 'admin', 'changeme'))
+        self.assertNotIn('example.com', hammer_session._unavailable)
+
+    def test_sessions_by_user(self):
+        server = MockSessionServer(lambda args, env: {
+            'return_code': 0, 'stdout': u'', 'stderr': u''})
+        self.mock_client(server)
+        hammer_session.execute(u'org list', 'admin', 'changeme')
+        session = hammer_session.get_session('admin', 'changeme')
+        self.assertEqual((session.user, session.password),
+                         ('admin', 'changeme'))
+        self.assertIsNot(hammer_session.get_session('viewer', 'secret'),
+                         session)
+
+    def test_session_died_while_running(self):
+        server = MockSessionServer(lambda args, env: None)
+        client = self.mock_client(server)
+        with self.assertRaises(hammer_session.HammerSessionError) as context:
+            hammer_session.execute(u'org create', 'admin', 'changeme')
+        self.assertTrue(context.exception.sent)
+        self.assertTrue(client.channel.closed)
+        self.assertTrue(client.closed)
+
+    def test_session_died_before_running(self):
+        def handler(args, env):
+            raise socket.error('Socket is closed')
+
+        server = MockSessionServer(handler)
+        client = self.mock_client(server)
+        self.assertIsNone(
+            hammer_session.execute(u'org list', 'admin', 'changeme'))
+        self.assertTrue(client.channel.closed)
+
+    def test_timeout(self):
+        def handler(args, env):
+            raise socket.timeout()
+
+        server = MockSessionServer(handler)
+        client = self.mock_client(server)
+        with self.assertRaises(ssh.SSHCommandTimeoutError):
+            hammer_session.execute(
+                u'org list', 'admin', 'changeme', timeout=1)
+        self.assertTrue(client.channel.closed)
+
+
+@skipUnless(shutil.which('ruby') and shutil.which('bash'),
+            'the session script needs ruby and bash')
+class SessionScriptTestCase(TestCase):
+    """Run the session script locally with a fake hammer printing its
+    arguments.
+    """
+
+    def setUp(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        script = os.path.join(tmp_dir, 'session.rb')
+        hammer = os.path.join(tmp_dir, 'hammer')
+        with open(script, 'w') as handler:
+            handler.write(hammer_session.SESSION_SCRIPT)
+        with open(hammer, 'w') as handler:
+            handler.write(FAKE_HAMMER)
+        self.process = subprocess.Popen(
+            ['ruby', script, hammer], stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.addCleanup(self.process.wait)
+        self.addCleanup(self.process.stdin.close)
+        self.addCleanup(self.process.stdout.close)
+        self.addCleanup(self.process.stderr.close)
+        self.write({'user': 'admin', 'password': 'chan ge'})
+        self.assertEqual(self.read(), {'ready': True})
+
+    def write(self, data):
+        self.process.stdin.write(json.dumps(data).encode('utf-8') + b'\n')
+        self.process.stdin.flush()
+
+    def read(self):
+        return json.loads(self.process.stdout.readline().decode('utf-8'))
+
+    def test_arguments_split_by_shell(self):
+        self.write({
+            'command': u'-v org list --search="name = \\"a b\\"" '
+                       u'--id $SESSION_TEST_ID --name `echo foo` '
+                       u"--description '$HOME' --empty ''",
+            'env': {'LANG': 'en_US', 'SESSION_TEST_ID': '42'},
+        })
+        response = self.read()
+        self.assertEqual(response['return_code'], 0)
+        self.assertEqual(json.loads(response['stdout']), {
+            'args': ['-u', 'admin', '-p', 'chan ge', '-v', 'org', 'list',
+                     '--search=name = "a b"', '--id', '42', '--name', 'foo',
+                     '--description', '$HOME', '--empty', ''],
+            'lang': 'en_US',
+        })
+
+    def test_invalid_arguments(self):
+        self.write({'command': u'org list --name "unterminated', 'env': {}})
+        response = self.read()
+        self.assertNotEqual(response['return_code'], 0)
+        self.assertIn('unexpected EOF', response['stderr'])
@@ -0,0 +1,185 @@
+"""Tests for module ``robottelo.lock_metrics``."""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from robottelo import lock_metrics
+from robottelo.decorators.func_locker import (
+    FunctionLockerTimeoutError,
+    file_lock,
+    file_semaphore,
+)
+from unittest import mock
+from unittest2 import TestCase
+
+
+def make_record(lock, worker, start, wait, hold, outcome='acquired'):
+    return {
+        'lock': lock,
+        'kind': 'lock',
+        'worker': worker,
+        'pid': 1,
+        'start': start,
+        'wait': wait,
+        'hold': hold,
+        'outcome': outcome,
+    }
+
+
+class LockMetricsTestCase(TestCase):
+    """Tests for module ``robottelo.lock_metrics``."""
+
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        self.file_path = os.path.join(self.metrics_dir, 'file.lock')
+        patcher = mock.patch('robottelo.lock_metrics.settings')
+        settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        settings.performance.lock_metrics = True
+        settings.performance.lock_metrics_dir = self.metrics_dir
+
+    def test_lock_records(self):
+        acquired = threading.Event()
+
+        def hold():
+            with file_lock(self.file_path):
+                acquired.set()
+                time.sleep(0.2)
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        acquired.wait()
+        with file_lock(self.file_path):
+            pass
+        thread.join()
+
+        records = lock_metrics.load_records()
+        self.assertEqual(len(records), 2)
+        for record in records:
+            self.assertEqual(record['lock'], self.file_path)
+            self.assertEqual(record['kind'], 'lock')
+            self.assertEqual(record['outcome'], 'acquired')
+            self.assertEqual(record['pid'], os.getpid())
+        # the holder record is saved first
+        self.assertGreaterEqual(records[0]['hold'], 0.2)
+        self.assertGreater(records[1]['wait'], 0.1)
+
+    def test_semaphore_records(self):
+        file_paths = [
+            os.path.join(self.metrics_dir, 'sem.{0}.lock'.format(index))
+            for index in range(2)
+        ]
+        with file_semaphore(file_paths, name='sem'):
+            pass
+        record, = lock_metrics.load_records()
+        self.assertEqual(record['lock'], 'sem')
+        self.assertEqual(record['kind'], 'semaphore')
+
+    def test_timeout_record(self):
+        acquired = threading.Event()
+        release = threading.Event()
+
+        def hold():
+            with file_lock(self.file_path):
+                acquired.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        acquired.wait()
+        try:
+            with self.assertRaises(FunctionLockerTimeoutError):
+                with file_lock(self.file_path, timeout=0.1):
+                    pass
+        finally:
+            release.set()
+            thread.join()
+        outcomes = [
+            record['outcome'] for record in lock_metrics.load_records()]
+        self.assertEqual(outcomes, ['timeout', 'acquired'])
+
+    def test_error_record(self):
+        with self.assertRaises(ValueError):
+            with file_lock(self.file_path):
+                raise ValueError('error in the locked block')
+        record, = lock_metrics.load_records()
+        # the lock was acquired, the error happened while holding it
+        self.assertEqual(record['outcome'], 'acquired')
+
+    def test_takeover_record(self):
+        process = subprocess.Popen(['true'])
+        process.wait()
+        with open('{0}.lease'.format(self.file_path), 'w') as handler:
+            json.dump({
+                'id': 'stale',
+                'host': 'example.com',
+                'pid': process.pid,
+                'thread': 'MainThread',
+                'acquired': time.time() - 100,
+                'expires': time.time() - 1,
+            }, handler)
+        with mock.patch('robottelo.decorators.func_locker.logger'):
+            with file_lock(self.file_path, timeout=5):
+                pass
+        record, = lock_metrics.load_records()
+        self.assertEqual(record['outcome'], 'takeover')
+        self.assertEqual(
+            record['previous_holder'],
+            '{0}@example.com'.format(process.pid)
+        )
+
+    def test_disabled(self):
+        lock_metrics.settings.performance.lock_metrics = False
+        with file_lock(self.file_path):
+            pass
+        self.assertEqual(lock_metrics.load_records(), [])
+
+    def test_aggregate_and_rank(self):
+        records = [
+            make_record('a', 'gw0', 0, 1, 1),
+            make_record('a', 'gw1', 0, 3, 1, 'timeout'),
+            make_record('b', 'gw0', 0, 0, 2),
+            make_record('c', 'gw1', 0, 5, 1, 'takeover'),
+        ]
+        stats = lock_metrics.aggregate(records)
+        self.assertEqual(stats['a']['count'], 2)
+        self.assertEqual(stats['a']['wait'], 4)
+        self.assertEqual(stats['a']['max'], 3)
+        self.assertEqual(stats['a']['timeout'], 1)
+        self.assertEqual(stats['a']['workers'], ['gw0', 'gw1'])
+        self.assertEqual(stats['c']['takeover'], 1)
+        self.assertEqual(lock_metrics.rank(stats), ['c', 'a', 'b'])
+
+    def test_timeline(self):
+        records = [
+            make_record('a', 'gw0', 0, 0, 5),
+            make_record('a', 'gw1', 0, 5, 5),
+            make_record('a', 'gw2', 0, 10, 0, 'timeout'),
+        ]
+        lines = lock_metrics.format_timeline(records, ['a'], width=10)
+        lines = lines.splitlines()
+        self.assertEqual(lines[1], 'a')
+        self.assertEqual(lines[2], '  gw0      |######    |')
+        self.assertEqual(lines[3], '  gw1      |.....#####|')
+        self.assertEqual(lines[4], '  gw2      |.........x|')
+
+    def test_write_report(self):
+        self.assertEqual(lock_metrics.write_report(), '')
+        for index in range(2):
+            with file_lock(self.file_path):
+                pass
+        report = lock_metrics.write_report()
+        self.assertIn(self.file_path[-60:], report)
+        with open(os.path.join(
+                self.metrics_dir, lock_metrics.REPORT_FILE_NAME)) as handler:
+            stats = json.load(handler)
+        self.assertEqual(stats[self.file_path]['count'], 2)
+        self.assertTrue(os.path.exists(os.path.join(
+            self.metrics_dir, lock_metrics.TIMELINE_FILE_NAME)))
+        lock_metrics.clear()
+        self.assertEqual(lock_metrics.load_records(), [])
@@ -1,10 +1,17 @@
 """Tests for module ``robottelo.ssh``."""
 # (too-many-public-methods) pylint: disable=R0904
+import io
 import os
 import paramiko
+import shutil
 import six
+import subprocess
+import tempfile
+import threading
+import time
 
 from robottelo import ssh
+from robottelo.cli import hammer
 from unittest2 import TestCase
 
 if six.PY2:
@@ -17,6 +24,10 @@ class MockChannel(object):
     def __init__(self, ret, status_ready=True):
         self.ret = ret
         self.status_ready = status_ready
+        self.status_event = threading.Event()
+        if status_ready:
+            self.status_event.set()
+        self.closed = False
 
     def recv_exit_status(self):
         return self.ret
@@ -24,16 +35,132 @@ class MockChannel(object):
     def exit_status_ready(self):
         return self.status_ready
 
+    def close(self):
+        self.closed = True
+
+
+class MockSession(object):
+    def __init__(self, ret=0, stdout=b'', stderr=b''):
+        self.ret = ret
+        self.stdout = stdout
+        self.stderr = stderr
+        self.cmd = None
+        self.closed = False
+
+    def settimeout(self, timeout):
+        pass
+
+    def exec_command(self, cmd):
+        self.cmd = cmd
+        self._stdout = io.BytesIO(self.stdout)
+        self._stderr = io.BytesIO(self.stderr)
+
+    @staticmethod
+    def _ready(stream):
+        return stream.tell() < len(stream.getvalue())
+
+    def recv_ready(self):
+        return self._ready(self._stdout)
+
+    def recv_stderr_ready(self):
+        return self._ready(self._stderr)
+
+    def recv(self, nbytes):
+        return self._stdout.read(nbytes)
+
+    def recv_stderr(self, nbytes):
+        return self._stderr.read(nbytes)
+
+    @property
+    def eof_received(self):
+        return not (self.recv_ready() or self.recv_stderr_ready())
+
+    def recv_exit_status(self):
+        return self.ret
+
+    def close(self):
+        self.closed = True
+
+
+class MockTransport(object):
+    def __init__(self, active=True):
+        self.active = active
+        self.session = MockSession()
+
+    def is_active(self):
+        return self.active
+
+    def send_ignore(self):
+        if not self.active:
+            raise EOFError()
+
+    def open_session(self, timeout=None):
+        return self.session
+
 
 class MockStdout(object):
-    def __init__(self, cmd, ret):
+    def __init__(self, cmd, ret, status_ready=True):
         self.cmd = cmd
-        self.channel = MockChannel(ret=ret)
+        self.channel = MockChannel(ret=ret, status_ready=status_ready)
 
     def read(self):
         return self.cmd
 
 
+class MockSFTPFile(object):
+    """Local file exposing the ``paramiko.SFTPFile`` transfer methods."""
+    def __init__(self, path, mode):
+        self.handler = open(path, mode)
+
+    def __getattr__(self, name):
+        return getattr(self.handler, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.handler.close()
+
+    def set_pipelined(self, pipelined=True):
+        pass
+
+    def prefetch(self, file_size=None):
+        pass
+
+
+class MockSFTPClient(object):
+    """``paramiko.SFTPClient`` working on the local file system."""
+    def __init__(self):
+        self.opened = []
+        self.closed = False
+
+    def stat(self, path):
+        return os.stat(path)
+
+    def open(self, path, mode='r'):
+        self.opened.append((path, mode))
+        return MockSFTPFile(path, mode)
+
+    def listdir_attr(self, path):
+        return [
+            mock.Mock(filename=name, st_mode=os.stat(
+                os.path.join(path, name)).st_mode)
+            for name in os.listdir(path)
+        ]
+
+    def close(self):
+        self.closed = True
+
+
+def local_execute_command(cmd, connection, output_format=None, **kwargs):
+    """Run the command locally instead of on the ssh connection."""
+    process = subprocess.Popen(
+        cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stdout, stderr = process.communicate()
+    return ssh.SSHCommandResult(
+        stdout.decode('utf-8'), stderr.decode('utf-8'), process.returncode)
+
+
 class MockSSHClient(object):
     """A mock ``paramiko.SSHClient`` object."""
     def __init__(self):
@@ -53,6 +180,9 @@ class MockSSHClient(object):
         self.key_filename = None
         self.password = None
         self.ret_code = 0
+        self.status_ready = True
+        self.transport = MockTransport()
+        self.sftp_sessions = []
 
     def set_missing_host_key_policy(self, policy):  # pylint:disable=W0613
         """A no-op stub method."""
@@ -81,17 +211,29 @@ class MockSSHClient(object):
     def close(self):
         """A no-op stub method."""
         self.close_ += 1
+        self.transport.active = False
+
+    def get_transport(self):
+        return self.transport
+
+    def open_sftp(self):
+        self.sftp = MockSFTPClient()
+        self.sftp_sessions.append(self.sftp)
+        return self.sftp
 
     def exec_command(self, cmd, *args, **kwargs):
         return (
             self.ret_code,
-            MockStdout(cmd, self.ret_code),
-            MockStdout('', self.ret_code)
+            MockStdout(cmd, self.ret_code, self.status_ready),
+            MockStdout('', self.ret_code, self.status_ready)
         )
 
 
 class SSHTestCase(TestCase):
     """Tests for module ``robottelo.ssh``."""
+    def tearDown(self):
+        ssh.close_pooled_connections()
+
     @mock.patch('robottelo.ssh.settings')
     def test_get_connection_key(self, settings):
         """Test method ``get_connection`` using key file to connect to the
@@ -113,6 +255,8 @@ class SSHTestCase(TestCase):
         settings.server.ssh_key = key_filename
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
         with ssh.get_connection() as connection:  # pylint:disable=W0212
             self.assertEqual(connection.set_missing_host_key_policy_, 1)
             self.assertEqual(connection.connect_, 1)
@@ -142,6 +286,8 @@ class SSHTestCase(TestCase):
         settings.server.ssh_password = 'test_password'
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
         with ssh.get_connection() as connection:  # pylint:disable=W0212
             self.assertEqual(connection.set_missing_host_key_policy_, 1)
             self.assertEqual(connection.connect_, 1)
@@ -216,6 +362,8 @@ class SSHTestCase(TestCase):
         settings.server.ssh_password = 'test_password'
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
         ssh.add_authorized_key('ssh-rsa xxxx user@host')
 
     @mock.patch('robottelo.ssh.settings')
@@ -227,6 +375,8 @@ class SSHTestCase(TestCase):
         settings.server.ssh_password = 'test_password'
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
 
         with ssh.get_connection() as connection:  # pylint:disable=W0212
             ret = ssh.execute_command('ls -la', connection)
@@ -242,6 +392,8 @@ class SSHTestCase(TestCase):
         settings.server.ssh_password = 'test_password'
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
 
         with ssh.get_connection() as connection:  # pylint:disable=W0212
             ret = ssh.execute_command(
@@ -249,6 +401,23 @@ class SSHTestCase(TestCase):
             self.assertEqual(ret.stdout, u'ls -la')
             self.assertIsInstance(ret, ssh.SSHCommandResult)
 
+    @mock.patch('robottelo.ssh.settings')
+    def test_execute_command_timeout(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+
+        with ssh.get_connection() as connection:  # pylint:disable=W0212
+            connection.status_ready = False
+            start = time.time()
+            with self.assertRaises(ssh.SSHCommandTimeoutError):
+                ssh.execute_command('sleep 10', connection, timeout=0.1)
+            self.assertLess(time.time() - start, 1)
+
     @mock.patch('robottelo.ssh.settings')
     def test_command(self, settings):
         ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
@@ -258,6 +427,8 @@ class SSHTestCase(TestCase):
         settings.server.ssh_password = 'test_password'
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
 
         ret = ssh.command('ls -la')
         self.assertEqual(ret.stdout, [u'ls -la'])
@@ -272,6 +443,8 @@ class SSHTestCase(TestCase):
         settings.server.ssh_password = 'test_password'
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
 
         ret = ssh.command('ls -la', output_format='plain')
         self.assertEqual(ret.stdout, u'ls -la')
@@ -286,6 +459,8 @@ class SSHTestCase(TestCase):
         settings.server.ssh_password = 'test_password'
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
 
         ret = ssh.command('a,b,c\n1,2,3', output_format='csv')
         self.assertEqual(ret.stdout, [{u'a': u'1', u'b': u'2', u'c': u'3'}])
@@ -300,11 +475,382 @@ class SSHTestCase(TestCase):
         settings.server.ssh_password = 'test_password'
         settings.ssh_client.command_timeout = 300
         settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
 
         ret = ssh.command('{"a": 1, "b": true}', output_format='json')
         self.assertEqual(ret.stdout, {u'a': u'1', u'b': True})
         self.assertIsInstance(ret, ssh.SSHCommandResult)
 
+    @mock.patch('robottelo.ssh.settings')
+    def test_command_reuses_pooled_connection(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
+        before = ssh.get_pool_stats()
+
+        with ssh.get_pooled_connection() as first:
+            pass
+        with ssh.get_pooled_connection() as second:
+            pass
+        ssh.command('ls -la')
+
+        self.assertIs(first, second)
+        self.assertEqual(second.connect_, 1)
+        self.assertEqual(second.close_, 0)
+        stats = ssh.get_pool_stats()
+        self.assertEqual(stats['misses'] - before['misses'], 1)
+        self.assertEqual(stats['hits'] - before['hits'], 2)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_pooled_connection_reconnects_dead_transport(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
+        before = ssh.get_pool_stats()
+
+        with ssh.get_pooled_connection() as first:
+            pass
+        first.transport.active = False
+        with ssh.get_pooled_connection() as second:
+            pass
+
+        self.assertIsNot(first, second)
+        self.assertEqual(first.close_, 1)
+        stats = ssh.get_pool_stats()
+        self.assertEqual(stats['reconnects'] - before['reconnects'], 1)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_pooled_connection_keys_and_limits(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 1
+        settings.ssh_client.connection_pool_idle_timeout = 60
+
+        with ssh.get_pooled_connection(hostname='host1') as first:
+            pass
+        with ssh.get_pooled_connection(hostname='host2') as second:
+            pass
+        self.assertIsNot(first, second)
+        # pool size is 1 so the connection to host1 is evicted
+        self.assertEqual(first.close_, 1)
+        self.assertEqual(second.close_, 0)
+
+        settings.ssh_client.connection_pool_idle_timeout = -1
+        with ssh.get_pooled_connection(hostname='host2') as third:
+            pass
+        # the connection to host2 was idle for too long
+        self.assertIsNot(second, third)
+        self.assertEqual(second.close_, 1)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_pooled_connection_checkout_limit(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 1
+        settings.ssh_client.connection_pool_idle_timeout = 60
+        clients = []
+
+        def use_connection():
+            with ssh.get_pooled_connection() as connection:
+                clients.append(connection)
+
+        with ssh.get_pooled_connection() as first:
+            # a nested checkout in the same thread is not limited
+            with ssh.get_pooled_connection() as nested:
+                self.assertIsNot(nested, first)
+            thread = threading.Thread(target=use_connection)
+            thread.start()
+            thread.join(0.2)
+            # the other thread waits for the connection to be returned
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(clients, [])
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(clients), 1)
+        self.assertIn(clients[0], (first, nested))
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_pooled_connection_disabled(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient  # pylint:disable=W0212
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 0
+
+        with ssh.get_pooled_connection() as connection:
+            pass
+        self.assertEqual(connection.close_, 1)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_stream_command(self, settings):
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
+        client = MockSSHClient()
+        client.transport.session = MockSession(
+            ret=0,
+            stdout=b'a,b\n[Rails] noise\n\x1b[32m1\x1b[0m,""\n3,4\n',
+            stderr=b'\x1b[31mwarning\x1b[0m',
+        )
+        ssh._call_paramiko_sshclient = lambda: client
+
+        stream = ssh.stream_command('hammer --output csv list')
+        self.assertIsInstance(stream, ssh.SSHCommandStream)
+        self.assertEqual(
+            list(hammer.iter_csv(stream)),
+            [{u'a': u'1', u'b': u''}, {u'a': u'3', u'b': u'4'}]
+        )
+        self.assertEqual(stream.return_code, 0)
+        self.assertEqual(stream.stderr, u'warning')
+        self.assertEqual(client.transport.session.cmd,
+                         'hammer --output csv list')
+        self.assertTrue(client.transport.session.closed)
+        with self.assertRaises(RuntimeError):
+            list(stream)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_stream_command_stop_early(self, settings):
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
+        client = MockSSHClient()
+        client.transport.session = MockSession(stdout=b'1\n2\n3\n')
+        ssh._call_paramiko_sshclient = lambda: client
+
+        lines = iter(ssh.stream_command('seq 3', output_format='plain'))
+        self.assertEqual(next(lines), u'1')
+        lines.close()
+        self.assertTrue(client.transport.session.closed)
+        # the connection is returned to the pool
+        self.assertEqual(client.close_, 0)
+        with ssh.get_pooled_connection() as connection:
+            self.assertIs(connection, client)
+
+    @mock.patch('robottelo.ssh.command')
+    def test_run_on_hosts(self, command):
+        def run(cmd, hostname, **kwargs):
+            if hostname == 'broken':
+                raise ssh.SSHCommandTimeoutError(cmd)
+            return ssh.SSHCommandResult(
+                stdout=[hostname], return_code=int(hostname == 'failing'))
+        command.side_effect = run
+
+        results = ssh.run_on_hosts(
+            'hostname', ['host1', 'failing', 'host2'], timeout=30)
+        self.assertEqual(list(results), ['host1', 'failing', 'host2'])
+        self.assertEqual(results['host2'].stdout, ['host2'])
+        self.assertEqual(results['failing'].return_code, 1)
+        self.assertEqual(command.call_count, 3)
+        self.assertEqual(command.call_args[1]['timeout'], 30)
+
+        results = ssh.run_on_hosts(
+            {'host1': 'ls /tmp', 'host2': 'ls /root'},
+            timeout={'host1': 10, 'host2': 20},
+        )
+        calls = {
+            call[1]['hostname']: (call[0][0], call[1]['timeout'])
+            for call in command.call_args_list[-2:]
+        }
+        self.assertEqual(
+            calls, {'host1': ('ls /tmp', 10), 'host2': ('ls /root', 20)})
+
+    @mock.patch('robottelo.ssh.command')
+    def test_run_on_hosts_errors(self, command):
+        def run(cmd, hostname, **kwargs):
+            if hostname == 'broken':
+                raise ssh.SSHCommandTimeoutError(cmd)
+            return ssh.SSHCommandResult(
+                stdout=[hostname], return_code=int(hostname == 'failing'))
+        command.side_effect = run
+
+        with self.assertRaises(ssh.SSHMultiHostError) as context:
+            ssh.run_on_hosts('hostname', ['host1', 'broken', 'failing'])
+        self.assertEqual(list(context.exception.results), ['host1', 'failing'])
+        self.assertIsInstance(
+            context.exception.errors['broken'], ssh.SSHCommandTimeoutError)
+
+        with self.assertRaises(ssh.SSHMultiHostError) as context:
+            ssh.run_on_hosts(
+                'hostname', ['failing'] + ['host{0}'.format(i)
+                                           for i in range(50)],
+                max_workers=1, fail_fast=True,
+            )
+        self.assertEqual(context.exception.errors, {})
+        self.assertEqual(
+            context.exception.results['failing'].return_code, 1)
+        self.assertLess(len(context.exception.results), 51)
+
+    @mock.patch('robottelo.ssh.command')
+    def test_run_on_hosts_fail_fast_does_not_wait(self, command):
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def run(cmd, hostname, **kwargs):
+            if hostname == 'slow':
+                release.wait(10)
+            return ssh.SSHCommandResult(
+                stdout=[hostname], return_code=int(hostname == 'failing'))
+        command.side_effect = run
+
+        start = time.time()
+        with self.assertRaises(ssh.SSHMultiHostError) as context:
+            ssh.run_on_hosts('hostname', ['slow', 'failing'], fail_fast=True)
+        self.assertLess(time.time() - start, 5)
+        self.assertEqual(list(context.exception.results), ['failing'])
+
+    @mock.patch('robottelo.ssh.settings')
+    @mock.patch('robottelo.ssh.command')
+    def test_run_on_hosts_default_host(self, command, settings):
+        settings.server.hostname = 'example.com'
+        command.return_value = ssh.SSHCommandResult(stdout=[], return_code=0)
+        results = ssh.run_on_hosts('hostname')
+        self.assertEqual(list(results), ['example.com'])
+        self.assertEqual(command.call_args[1]['hostname'], 'example.com')
+
+    @mock.patch('robottelo.ssh.execute_command', local_execute_command)
+    @mock.patch('robottelo.ssh.settings')
+    def test_upload_files(self, settings):
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
+        client = MockSSHClient()
+        ssh._call_paramiko_sshclient = lambda: client
+        local_dir = tempfile.mkdtemp()
+        remote_dir = os.path.join(tempfile.mkdtemp(), 'remote')
+        self.addCleanup(shutil.rmtree, local_dir)
+        self.addCleanup(shutil.rmtree, os.path.dirname(remote_dir))
+        contents = {
+            'same.txt': b'same contents',
+            'partial.txt': b'0123456789' * 1000,
+            'new.txt': b'new contents',
+            'ignored.rpm': b'not a text file',
+        }
+        for name, content in contents.items():
+            with open(os.path.join(local_dir, name), 'wb') as handler:
+                handler.write(content)
+        os.makedirs(remote_dir)
+        with open(os.path.join(remote_dir, 'same.txt'), 'wb') as handler:
+            handler.write(contents['same.txt'])
+        with open(os.path.join(remote_dir, 'partial.txt'), 'wb') as handler:
+            handler.write(contents['partial.txt'][:4000])
+
+        ssh.upload_files(local_dir, remote_dir, max_workers=2)
+
+        self.assertEqual(
+            sorted(os.listdir(remote_dir)),
+            ['new.txt', 'partial.txt', 'same.txt']
+        )
+        for name in os.listdir(remote_dir):
+            with open(os.path.join(remote_dir, name), 'rb') as handler:
+                self.assertEqual(handler.read(), contents[name])
+        opened = {
+            os.path.basename(path): mode
+            for sftp in client.sftp_sessions for path, mode in sftp.opened
+        }
+        self.assertEqual(opened, {'partial.txt': 'r+b', 'new.txt': 'wb'})
+        self.assertTrue(all(sftp.closed for sftp in client.sftp_sessions))
+
+    @mock.patch('robottelo.ssh.execute_command', local_execute_command)
+    @mock.patch('robottelo.ssh.settings')
+    def test_download_file(self, settings):
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 4
+        settings.ssh_client.connection_pool_idle_timeout = 60
+        client = MockSSHClient()
+        ssh._call_paramiko_sshclient = lambda: client
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        remote_file = os.path.join(tmp_dir, 'remote.log')
+        local_file = os.path.join(tmp_dir, 'local.log')
+        with open(remote_file, 'wb') as handler:
+            handler.write(b'line\n' * 1000)
+        with open(local_file, 'wb') as handler:
+            handler.write(b'line\n' * 10)
+
+        ssh.download_file(remote_file, local_file)
+        self.assertEqual(client.sftp.opened, [(remote_file, 'rb')])
+        with open(local_file, 'rb') as handler:
+            self.assertEqual(handler.read(), b'line\n' * 1000)
+
+        # the file is up to date, no need to download it again
+        ssh.download_file(remote_file, local_file)
+        self.assertEqual(client.sftp.opened, [])
+
+        local_dir = os.path.join(tmp_dir, 'downloaded')
+        ssh.download_files(tmp_dir, local_dir, file_search='*.log')
+        self.assertEqual(
+            sorted(os.listdir(local_dir)), ['local.log', 'remote.log'])
+
+    @mock.patch('robottelo.ssh.execute_command', local_execute_command)
+    def test_execute_command_batch(self):
+        cmds = [
+            'cd /; pwd',
+            'printf "no trailing new line"',
+            'echo error >&2; exit 3',
+            'pwd',
+            'printf "a,b\\n1,2\\n"',
+        ]
+        results = ssh.execute_command_batch(
+            cmds, None, output_format='plain', stop_on_failure=False)
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0].stdout, u'/\n')
+        self.assertEqual(results[1].stdout, u'no trailing new line')
+        self.assertEqual(results[2].stdout, u'')
+        self.assertEqual(results[2].stderr, u'error\n')
+        self.assertEqual(results[2].return_code, 3)
+        # each command runs in its own subshell
+        self.assertEqual(results[3].stdout, u'{0}\n'.format(os.getcwd()))
+        self.assertEqual(
+            [result.return_code for result in results], [0, 0, 3, 0, 0])
+
+        results = ssh.execute_command_batch(cmds, None)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0].stdout, [u'/', u''])
+        self.assertEqual(results[2].return_code, 3)
+
+        results = ssh.execute_command_batch(
+            cmds[-1:], None, output_format='csv')
+        self.assertEqual(results[0].stdout, [{u'a': u'1', u'b': u'2'}])
+
     def test_call_paramiko_client(self):
         self.assertIsInstance(
             ssh._call_paramiko_sshclient(),
@@ -0,0 +1,64 @@
+"""Tests for module ``robottelo.ssh_aio``."""
+import asyncio
+import threading
+
+from robottelo import ssh, ssh_aio
+from unittest import mock
+from unittest2 import TestCase
+
+
+class SSHAioTestCase(TestCase):
+    """Tests for module ``robottelo.ssh_aio``."""
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        asyncio.set_event_loop(None)
+        self.loop.close()
+
+    @mock.patch('robottelo.ssh.command')
+    def test_command(self, command):
+        command.return_value = ssh.SSHCommandResult(
+            stdout=['a,b', '1,2'], output_format='csv')
+        result = self.loop.run_until_complete(
+            ssh_aio.command('ls', hostname='example.com', timeout=10))
+        self.assertEqual(result.stdout, [{'a': '1', 'b': '2'}])
+        command.assert_called_once_with(
+            'ls',
+            hostname='example.com',
+            output_format=None,
+            username=None,
+            password=None,
+            key_filename=None,
+            timeout=10,
+            connection_timeout=None,
+        )
+
+    @mock.patch('robottelo.ssh.command')
+    def test_command_concurrently(self, command):
+        """Commands are run in executor threads and overlap."""
+        barrier = threading.Barrier(3, timeout=5)
+
+        def run(cmd, **kwargs):
+            barrier.wait()
+            return ssh.SSHCommandResult(stdout=cmd)
+        command.side_effect = run
+
+        results = self.loop.run_until_complete(asyncio.gather(
+            *[ssh_aio.command(str(i)) for i in range(3)]))
+        self.assertEqual([result.stdout for result in results],
+                         ['0', '1', '2'])
+
+    @mock.patch('robottelo.ssh.download_file')
+    @mock.patch('robottelo.ssh.upload_file')
+    def test_transfer_files(self, upload_file, download_file):
+        self.loop.run_until_complete(
+            ssh_aio.upload_file('local', 'remote', hostname='example.com'))
+        upload_file.assert_called_once_with(
+            'local', 'remote', key_filename=None, hostname='example.com')
+        self.loop.run_until_complete(
+            ssh_aio.download_file('remote', 'local'))
+        download_file.assert_called_once_with(
+            'remote', local_file='local', hostname=None)
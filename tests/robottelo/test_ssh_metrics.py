@@ -0,0 +1,116 @@
+"""Tests for module ``robottelo.ssh_metrics``."""
+import json
+import os
+import shutil
+import tempfile
+
+from robottelo import ssh, ssh_metrics
+from tests.robottelo.test_ssh import MockSession, MockSSHClient
+from unittest import mock
+from unittest2 import TestCase
+
+
+class SSHMetricsTestCase(TestCase):
+    """Tests for module ``robottelo.ssh_metrics``."""
+
+    def setUp(self):
+        self.metrics_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.metrics_dir)
+        patcher = mock.patch('robottelo.ssh_metrics.settings')
+        settings = patcher.start()
+        self.addCleanup(patcher.stop)
+        settings.performance.ssh_metrics = True
+        settings.performance.ssh_metrics_dir = self.metrics_dir
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(ssh_metrics.percentile(values, 50), 50)
+        self.assertEqual(ssh_metrics.percentile(values, 95), 95)
+        self.assertEqual(ssh_metrics.percentile(values, 99), 99)
+        self.assertEqual(ssh_metrics.percentile([3], 99), 3)
+        self.assertEqual(ssh_metrics.percentile([], 50), 0.0)
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_command_records(self, settings):
+        ssh._call_paramiko_sshclient = MockSSHClient
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 0
+        with ssh_metrics.tags(command_base='org', command_sub='list'):
+            ssh.command(b'hammer organization list')
+        ssh.command('ls -la')
+
+        records = ssh_metrics.load_records()
+        self.assertEqual(len(records), 2)
+        self.assertEqual(
+            [ssh_metrics.command_type(record) for record in records],
+            ['hammer org list', 'ls']
+        )
+        for record in records:
+            self.assertEqual(record['host'], 'example.com')
+            self.assertEqual(record['status'], 'ok')
+            self.assertGreater(record['bytes'], 0)
+            for phase in ssh_metrics.PHASES:
+                self.assertGreaterEqual(record[phase], 0)
+            self.assertGreaterEqual(
+                record['total'],
+                sum(record[phase] for phase in ssh_metrics.PHASES)
+            )
+
+    @mock.patch('robottelo.ssh.settings')
+    def test_stream_command_records(self, settings):
+        settings.server.hostname = 'example.com'
+        settings.server.ssh_username = 'nobody'
+        settings.server.ssh_key = None
+        settings.server.ssh_password = 'test_password'
+        settings.ssh_client.command_timeout = 300
+        settings.ssh_client.connection_timeout = 10
+        settings.ssh_client.connection_pool_size = 0
+        client = MockSSHClient()
+        client.transport.session = MockSession(
+            stdout=b'a,b\n1,2\n', stderr=b'warning')
+        ssh._call_paramiko_sshclient = lambda: client
+        with ssh_metrics.tags(command_base='org', command_sub='list'):
+            stream = ssh.stream_command('hammer --output csv org list')
+        # the record is saved once the stream is consumed, with the tags of
+        # the thread which created it
+        self.assertEqual(ssh_metrics.load_records(), [])
+        self.assertEqual(list(stream), [u'a,b', u'1,2'])
+
+        record, = ssh_metrics.load_records()
+        self.assertEqual(ssh_metrics.command_type(record), 'hammer org list')
+        self.assertEqual(record['host'], 'example.com')
+        self.assertEqual(record['status'], 'ok')
+        self.assertEqual(record['bytes'], len(b'a,b\n1,2\nwarning'))
+
+    def test_write_report(self):
+        records = [
+            {'command': 'hammer', 'command_base': 'org', 'command_sub': 'info',
+             'host': 'sat', 'total': float(total), 'connect': 0.5,
+             'parse': 0.1, 'bytes': 10, 'status': 'ok'}
+            for total in range(1, 101)
+        ]
+        records.append({'command': 'rpm', 'host': 'vm', 'total': 2.0,
+                        'bytes': 0, 'status': 'SSHCommandTimeoutError'})
+        path = os.path.join(self.metrics_dir, 'ssh_metrics_1.jsonl')
+        with open(path, 'w') as handler:
+            for record in records:
+                handler.write(json.dumps(record) + '\n')
+
+        report = ssh_metrics.write_report()
+        self.assertIn('hammer org info', report)
+        with open(os.path.join(
+                self.metrics_dir, ssh_metrics.REPORT_FILE_NAME)) as handler:
+            stats = json.load(handler)
+        self.assertEqual(stats['hammer org info']['count'], 100)
+        self.assertEqual(stats['hammer org info']['p95'], 95.0)
+        self.assertEqual(stats['hammer org info']['connect'], 50.0)
+        self.assertEqual(stats['rpm']['failures'], 1)
+        self.assertEqual(stats['rpm']['hosts'], ['vm'])
+
+        ssh_metrics.clear()
+        self.assertEqual(ssh_metrics.load_records(), [])